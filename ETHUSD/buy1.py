@@ -1,9 +1,9 @@
 import sys
 import os
-import time
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import ccxt
 import dontshare as d
+from order_manager import OrderManager
 
 def place_bid_and_sell(api_key: str, api_secret: str):
     """
@@ -31,32 +31,24 @@ def place_bid_and_sell(api_key: str, api_secret: str):
 
         print(f"Buying {volume} ETH")
 
+        # Fills come from the executions stream instead of polling fetch_order
+        orders = OrderManager(exchange)
+        orders.start_background()
+
         # Place a limit buy order at the current bid price
-        buy_order = exchange.create_limit_buy_order('ETH/USD', volume, current_bid_price)
-        print("Limit Buy Order Placed:", buy_order)
+        buy_order = orders.submit_sync('ETH/USD', 'limit', 'buy', volume, current_bid_price)
+        print("Limit Buy Order Placed:", buy_order.as_dict())
 
-        # Wait for the buy order to fill
-        order_id = buy_order['id']
+        # Wait for the buy order to fill, it is canceled if not filled in time
         timeout = 300  # Timeout in seconds (e.g., 5 minutes)
-        interval = 10  # Check every 10 seconds
-        elapsed_time = 0
-
-        while elapsed_time < timeout:
-            order_status = exchange.fetch_order(order_id, 'ETH/USD')['status']
-            if order_status == 'closed':
-                print("Buy order filled.")
-                break
-            elif order_status == 'canceled':
-                print("Buy order was canceled.")
-                return
-            else:
-                print(f"Order status: {order_status}. Waiting for it to fill...")
-                time.sleep(interval)
-                elapsed_time += interval
-
-        if order_status != 'closed':
-            print("Buy order not filled within the timeout period. Canceling order...")
-            exchange.cancel_order(order_id, 'ETH/USD')
+        order_status = orders.wait_sync(buy_order.id, timeout=timeout)['status']
+        if order_status == 'closed':
+            print("Buy order filled.")
+        elif order_status == 'canceled':
+            print("Buy order canceled, it was not filled within the timeout period.")
+        else:
+            print(f"Buy order ended with status {order_status}.")
+        orders.stop_sync()
 
         # If the order was filled, place the sell order
         if order_status == 'closed':
@@ -1,9 +1,14 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from backtesting import Backtest, Strategy
 from backtesting.lib import crossover
 from ta.trend import ADXIndicator
 import pandas as pd
-import ccxt
 from datetime import datetime, timedelta
+from ohlcv_store import OHLCVStore
+from backfill import backfill_ohlcv
+from intrabar import resolve_trades
 
 class HighLowBreakLongOnly(Strategy):
     adx_period = 28
@@ -28,49 +33,37 @@ class HighLowBreakLongOnly(Strategy):
                          tp=self.data.Close[-1] * (1 + self.stop_loss_pct * self.risk_reward_ratio))
 
 
-def fetch_ohlcv_kraken(symbol: str, timeframe: str, since: int):
-    """Fetch historical OHLCV data from Kraken using CCXT."""
-    exchange = ccxt.kraken({
-        'rateLimit': 1200,
-        'enableRateLimit': True
-    })
-
-    ohlcv = exchange.fetch_ohlcv(symbol, timeframe, since)
-    df = pd.DataFrame(ohlcv, columns=['timestamp', 'Open', 'High', 'Low', 'Close', 'Volume'])  # Capitalize column names
-    df['datetime'] = pd.to_datetime(df['timestamp'], unit='ms')
-    df.set_index('datetime', inplace=True)
-    df.drop(columns=['timestamp'], inplace=True)
-    return df
-
+# Define the desired date range
+start_date = '2024-01-01'
+end_date = '2024-12-08'
 
-# Load CSV data
+# Seed the store from the CSV on first run
+store = OHLCVStore()
 csv_path = '/Users/ethansung/quant/memebot/Data/ETHUSD_240.csv'
-csv_data = pd.read_csv(csv_path)
-csv_data['datetime'] = pd.to_datetime(csv_data['datetime'], unit='s')  # Convert timestamp
-csv_data.set_index('datetime', inplace=True)
-csv_data.sort_index(inplace=True)
-
-# Get the last timestamp from the CSV data
-last_csv_timestamp = int(csv_data.index[-1].timestamp() * 1000)  # Convert to milliseconds
+if not store.has('ETHUSD', '240'):
+    store.ingest_csv(csv_path, 'ETHUSD', '240')
 
-# Fetch API data starting from the end of the CSV data
+# Page through Kraken from the last stored bar until now, appending only new closed bars
 symbol = 'ETH/USD'
 timeframe = '4h'
-api_data = fetch_ohlcv_kraken(symbol, timeframe, last_csv_timestamp)
+backfill_ohlcv(symbol, timeframe, store=store)
 
-# Combine CSV and API data
-combined_data = pd.concat([csv_data, api_data])
-combined_data = combined_data[~combined_data.index.duplicated(keep='last')]  # Remove duplicates
-combined_data.sort_index(inplace=True)  # Ensure the data is sorted by datetime
-
-# Filter data for the desired date range
-start_date = '2024-01-01'
-end_date = '2024-12-08'
-filtered_data = combined_data.loc[start_date:end_date]
+# Load only the desired date range
+filtered_data = store.read(symbol, '240', start_date, end_date)
 
 # Define and run the backtest
 backtest = Backtest(filtered_data, HighLowBreakLongOnly, cash=100000, commission=.0025)
 output = backtest.run()
 
 print(output)
+
+# Settle 4h bars that reached both the stop and the target from stored 1 minute bars
+if store.has(symbol, '1'):
+    minutes = store.read(symbol, '1', start_date, end_date)
+    trades = resolve_trades(output['_trades'], filtered_data, minutes, commission=.0025)
+    resolved = trades[trades['Resolved'].notna()]
+    print(f"\n{len(resolved)} ambiguous exits resolved from minute data:")
+    print(resolved[['EntryTime', 'ExitTime', 'IntrabarExitTime', 'Resolved', 'ExitPrice', 'PnL']])
+    print(f"Total PnL: {output['_trades']['PnL'].sum():.2f} -> {trades['PnL'].sum():.2f}")
+
 print("done")
\ No newline at end of file
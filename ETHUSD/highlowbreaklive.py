@@ -2,16 +2,20 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import ccxt
+import numpy as np
 import pandas as pd
-from ta.trend import ADXIndicator
 from backtesting.lib import crossover
-import dontshare as d
-import time
+from collections import deque
 from datetime import datetime, timedelta
 import logging
 from typing import Optional
 import signal
 import threading
+from clock import SystemClock
+from incremental import IncrementalADX
+from ohlcv_store import OHLCVStore
+from order_manager import OrderManager
+from runtime import Strategy
 
 # Set up logging
 logging.basicConfig(
@@ -33,6 +37,8 @@ class TradingConfig:
     
     trade_amount_eth = 0.002  
     timeframe = '4h'
+    store_timeframe = '240'  # Same bars in the OHLCVStore
+    seed_limit = 720  # Most candles Kraken returns, used to seed the ADX without stored bars
     symbol = 'ETH/USD'
     max_slippage = 0.002
     order_timeout = 60  
@@ -43,7 +49,7 @@ class TradingConfig:
     min_data_points = 20
 
 class TradeState:
-    def __init__(self):
+    def __init__(self, now: Optional[datetime] = None):
         self.in_trade = False
         self.current_position = None
         self.entry_price = None
@@ -52,22 +58,99 @@ class TradeState:
         self.daily_loss = 0
         self.daily_trades = 0
         self.last_trade_time = None
-        self.last_reset_time = datetime.now()
+        self.last_reset_time = now or datetime.now()
+
+def kraken_exchange():
+    import dontshare as d  # API keys, only needed when trading live
+    return ccxt.kraken({
+        'apiKey': d.kraken_api_key,
+        'secret': d.kraken_secret_key,
+        'enableRateLimit': True,
+    })
+
+def load_adx_state(path: Optional[str]) -> Optional[IncrementalADX]:
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        state = IncrementalADX.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Could not load ADX state from {path}, reseeding: {e}")
+        return None
+    if state.period != TradingConfig.adx_period:
+        logger.info("ADX period changed since the state was saved, reseeding")
+        return None
+    return state
+
+def candles_frame(candles) -> pd.DataFrame:
+    """fetch_ohlcv rows as a DataFrame indexed by datetime, built only where a frame is needed."""
+    df = pd.DataFrame(candles, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    df['timestamp'] = df['timestamp'].astype('int64')
+    df.index = pd.to_datetime(df['timestamp'], unit='ms').rename('datetime')
+    return df
+
+def history_frame(ohlcv: list, store: Optional[OHLCVStore], symbol: str, store_timeframe: str) -> pd.DataFrame:
+    """Stored bars followed by fetch_ohlcv rows (last one still forming, dropped) as high/low/close."""
+    frames = []
+    if store is not None and store.has(symbol, store_timeframe):
+        stored = store.read(symbol, store_timeframe, columns=['High', 'Low', 'Close'])
+        frames.append(stored.rename(columns=str.lower))
+    if ohlcv:
+        frames.append(candles_frame(ohlcv)[['high', 'low', 'close']].iloc[:-1])
+    if not frames:
+        return pd.DataFrame(columns=['high', 'low', 'close'])
+    history = pd.concat(frames)
+    return history[~history.index.duplicated(keep='last')].sort_index()
+
+class ArmedEntry:
+    """An entry decided in advance, waiting for the price to cross its trigger."""
+
+    def __init__(self, trigger: float, amount: float, expires: int):
+        self.trigger = trigger
+        self.limit_price = trigger * (1 + TradingConfig.max_slippage)
+        self.stop_loss = trigger * (1 - TradingConfig.stop_loss_pct)
+        self.take_profit = trigger * (1 + TradingConfig.stop_loss_pct * TradingConfig.risk_reward_ratio)
+        self.amount = amount
+        self.expires = expires  # Epoch ms the forming candle ends, the trigger is only valid before
+
+def breakout_trigger(candles, adx: float) -> Optional[float]:
+    """
+    Price the forming candle has to trade above for the entry to fire, or None.
+
+    crossover(close, high.shift(2)) fires on the forming candle t when close[t-1] < high[t-3]
+    and close[t] > high[t-2]. Once candle t-1 has closed, the first condition and high[t-2]
+    are known, so the whole signal reduces to price > high[t-2]. The ADX filter uses the ADX
+    of the last closed candle.
+
+    Parameters:
+        candles (sequence): The last three or more closed candles as dicts with 'high' and 'close'.
+        adx (float): ADX on the last closed candle.
+    """
+    if len(candles) < 3 or not TradingConfig.adx_low < adx < TradingConfig.adx_high:
+        return None
+    if candles[-1]['close'] < candles[-3]['high']:
+        return candles[-2]['high']
+    return None
 
 class TradingBot:
-    def __init__(self):
-        self.exchange = ccxt.kraken({
-            'apiKey': d.kraken_api_key,
-            'secret': d.kraken_secret_key,
-            'enableRateLimit': True,
-        })
-        self.trade_state = TradeState()
+    def __init__(self, exchange=None, clock=None, handle_signals: bool = True,
+                 store: Optional[OHLCVStore] = None, state_path: Optional[str] = None,
+                 orders: Optional[OrderManager] = None):
+        # Any object with the ccxt methods used below works, e.g. replay.ReplayExchange
+        self.exchange = exchange if exchange is not None else kraken_exchange()
+        # Running OrderManager to wait on fills with, otherwise fetch_order is polled
+        self.orders = orders
+        self.clock = clock or SystemClock()
+        self.store = store
+        self.state_path = state_path
+        self.adx_state = self.load_adx_state()
+        self.trade_state = TradeState(self.clock.now())
         self.running = True
         self.is_shutting_down = False
         self.stop_event = threading.Event()
 
-        signal.signal(signal.SIGINT, self.handle_shutdown)
-        signal.signal(signal.SIGTERM, self.handle_shutdown)
+        if handle_signals:
+            signal.signal(signal.SIGINT, self.handle_shutdown)
+            signal.signal(signal.SIGTERM, self.handle_shutdown)
 
     def wake_up_api(self, retries=2, delay=5) -> bool:
         for attempt in range(retries):
@@ -79,7 +162,7 @@ class TradingBot:
                 logger.error(f"Failed to wake up API on attempt {attempt + 1}: {e}")
                 if attempt < retries - 1:
                     logger.info(f"Retrying in {delay} seconds...")
-                    time.sleep(delay)
+                    self.clock.sleep(delay)
         logger.error("API wake-up failed after multiple attempts")
         return False
 
@@ -92,7 +175,8 @@ class TradingBot:
         self.stop_event.set()
         self.close_all_positions()
 
-    def fetch_data(self) -> Optional[pd.DataFrame]:
+    def fetch_candles(self) -> Optional[np.ndarray]:
+        """The last 101 candles as a float array of [timestamp, open, high, low, close, volume] rows, validated."""
         try:
             ohlcv = self.exchange.fetch_ohlcv(
                 TradingConfig.symbol,
@@ -104,29 +188,22 @@ class TradingBot:
                 logger.error(f"Invalid data: Insufficient data points ({len(ohlcv) if ohlcv else 0})")
                 return None
 
-            df = pd.DataFrame(
-                ohlcv,
-                columns=['timestamp', 'open', 'high', 'low', 'close', 'volume']
-            )
+            candles = np.asarray(ohlcv, dtype='float64')
+            if candles.ndim != 2 or candles.shape[1] != 6:
+                logger.error(f"Invalid data: Unexpected candle shape {candles.shape}")
+                return None
 
-            if df.isnull().any().any():
+            if np.isnan(candles).any():
                 logger.error("Invalid data: Missing values detected")
                 return None
 
-            invalid_candles = (
-                (df['high'] < df['low']) | 
-                (df['high'] < df['open']) | 
-                (df['high'] < df['close']) |
-                (df['low'] > df['open']) | 
-                (df['low'] > df['close'])
-            )
+            open_, high, low, close = candles[:, 1], candles[:, 2], candles[:, 3], candles[:, 4]
+            invalid_candles = (high < low) | (high < open_) | (high < close) | (low > open_) | (low > close)
             if invalid_candles.any():
                 logger.error(f"Invalid data: Detected {invalid_candles.sum()} candles with invalid OHLC relationships")
                 return None
 
-            df['datetime'] = pd.to_datetime(df['timestamp'], unit='ms')
-            df.set_index('datetime', inplace=True)
-            return df
+            return candles
         except ccxt.BaseError as e:
             logger.error(f"Exchange error when fetching data: {str(e)}")
             return None
@@ -134,6 +211,59 @@ class TradingBot:
             logger.error(f"Unexpected error fetching data: {str(e)}")
             return None
 
+    def fetch_data(self) -> Optional[pd.DataFrame]:
+        candles = self.fetch_candles()
+        return None if candles is None else candles_frame(candles)
+
+    def load_adx_state(self) -> Optional[IncrementalADX]:
+        return load_adx_state(self.state_path)
+
+    def fetch_history(self) -> pd.DataFrame:
+        """Closed candles to seed the ADX from: stored bars, then as many as the exchange returns."""
+        try:
+            ohlcv = self.exchange.fetch_ohlcv(TradingConfig.symbol, timeframe=TradingConfig.timeframe,
+                                              limit=TradingConfig.seed_limit)
+        except Exception as e:
+            logger.error(f"Error fetching history to seed ADX: {e}")
+            ohlcv = []
+        return history_frame(ohlcv, self.store, TradingConfig.symbol, TradingConfig.store_timeframe)
+
+    def update_adx(self, candles: np.ndarray) -> float:
+        """
+        Brings the incremental ADX up to the last closed candle and returns its value on the
+        still-forming last row of candles (from fetch_candles), as if it closed now.
+        """
+        closed = candles[:-1]
+        timestamps = closed[:, 0].astype('int64')
+        state = self.adx_state
+        start = 0
+        if state is not None and state.last_timestamp is not None:
+            start = int(np.searchsorted(timestamps, state.last_timestamp, side='right'))
+            # Candles missed while the bot was down for longer than the fetched window
+            if state.last_timestamp < timestamps[0]:
+                logger.warning("Saved ADX state is older than the fetched candles, reseeding")
+                state = None
+
+        if state is None:
+            history = self.fetch_history()
+            fetched = candles_frame(closed)[['high', 'low', 'close']]
+            history = pd.concat([history[history.index < fetched.index[0]], fetched])
+            state = IncrementalADX(TradingConfig.adx_period).seed(history)
+            logger.info(f"Seeded ADX from {len(history)} candles")
+        else:
+            for timestamp, high, low, close in zip(timestamps[start:].tolist(), closed[start:, 2].tolist(),
+                                                   closed[start:, 3].tolist(), closed[start:, 4].tolist()):
+                state.update(timestamp, high, low, close)
+
+        if not state.ready:
+            logger.warning(f"ADX still warming up ({state.count} of {2 * TradingConfig.adx_period} candles)")
+        if self.state_path and (state is not self.adx_state or start < len(closed)):
+            state.save(self.state_path)
+        self.adx_state = state
+
+        _, _, high, low, close, _ = candles[-1].tolist()
+        return state.preview(high, low, close)
+
     def execute_trade(self, side: str, price: float) -> bool:
         if not self.wake_up_api() or side == 'sell' or price <= 0:
             return False
@@ -149,32 +279,40 @@ class TradingBot:
             stop_loss = price * (1 - TradingConfig.stop_loss_pct)
             take_profit = price * (1 + TradingConfig.stop_loss_pct * TradingConfig.risk_reward_ratio)
 
-            entry_order = self.exchange.create_order(
-                symbol=TradingConfig.symbol,
-                type='limit',
-                side=side,
-                amount=eth_amount,
-                price=price
-            )
-
-            start_time = time.time()
-            while time.time() - start_time < TradingConfig.order_timeout:
-                order_status = self.exchange.fetch_order(entry_order['id'])
-                if order_status['status'] == 'closed':
-                    break
-                time.sleep(2)
-
-            if order_status['status'] != 'closed':
-                self.exchange.cancel_order(entry_order['id'])
-                logger.warning("Order cancelled due to timeout")
-                return False
+            if self.orders is not None:
+                entry_order = self.orders.submit_sync(TradingConfig.symbol, 'limit', side, eth_amount, price)
+                # Cancels the order if it has not filled by the timeout
+                order_status = self.orders.wait_sync(entry_order.id, timeout=TradingConfig.order_timeout)
+                if order_status['status'] != 'closed':
+                    logger.warning("Order cancelled due to timeout")
+                    return False
+            else:
+                entry_order = self.exchange.create_order(
+                    symbol=TradingConfig.symbol,
+                    type='limit',
+                    side=side,
+                    amount=eth_amount,
+                    price=price
+                )
+
+                start_time = self.clock.time()
+                while self.clock.time() - start_time < TradingConfig.order_timeout:
+                    order_status = self.exchange.fetch_order(entry_order['id'])
+                    if order_status['status'] == 'closed':
+                        break
+                    self.clock.sleep(2)
+
+                if order_status['status'] != 'closed':
+                    self.exchange.cancel_order(entry_order['id'])
+                    logger.warning("Order cancelled due to timeout")
+                    return False
 
             self.trade_state.in_trade = True
             self.trade_state.entry_price = price
             self.trade_state.stop_loss = stop_loss
             self.trade_state.take_profit = take_profit
             self.trade_state.daily_trades += 1
-            self.trade_state.last_trade_time = datetime.now()
+            self.trade_state.last_trade_time = self.clock.now()
 
             logger.info(f"{side.upper()} order executed: Entry ${price:.2f}, SL ${stop_loss:.2f}, TP ${take_profit:.2f}")
             return True
@@ -184,21 +322,21 @@ class TradingBot:
             return False
 
     def run_strategy(self):
-        df = self.fetch_data()
-        if df is None or len(df) < TradingConfig.min_data_points:
+        candles = self.fetch_candles()
+        if candles is None or len(candles) < TradingConfig.min_data_points:
             logger.warning("Insufficient data to run strategy")
             return
 
-        current_price = df['close'].iloc[-1]
-        adx = ADXIndicator(df['high'], df['low'], df['close'], TradingConfig.adx_period).adx()
-        current_adx = adx.iloc[-1]
+        current_price = float(candles[-1, 4])
+        current_adx = self.update_adx(candles)
 
         if TradingConfig.adx_low < current_adx < TradingConfig.adx_high:
-            if crossover(df['close'], df['high'].shift(2)):
+            # crossover(close, high.shift(2)) only looks at the last two closes and the highs two bars before them
+            if crossover(candles[-2:, 4], candles[-4:-2, 2]):
                 self.execute_trade('buy', current_price)
 
     def next_candle_time(self) -> datetime:
-        now = datetime.utcnow()
+        now = self.clock.utcnow()
         next_candle = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=4 - now.hour % 4)
         return next_candle
 
@@ -208,10 +346,10 @@ class TradingBot:
             try:
                 next_candle = self.next_candle_time()
                 wake_up_time = next_candle - timedelta(minutes=1)
-                wait_time = (wake_up_time - datetime.utcnow()).total_seconds()
+                wait_time = (wake_up_time - self.clock.utcnow()).total_seconds()
 
                 logger.info(f"Waiting to wake up API in {wait_time / 60:.2f} minutes...")
-                self.stop_event.wait(timeout=wait_time)
+                self.clock.wait(self.stop_event, wait_time)
 
                 if not self.running:
                     break
@@ -224,8 +362,169 @@ class TradingBot:
                 self.run_strategy()
             except Exception as e:
                 logger.error(f"Error in main loop: {e}")
-                time.sleep(60)
+                self.clock.sleep(60)
+
+class HighLowBreakStrategy(Strategy):
+    """
+    TradingBot's ADX breakout as a runtime.Strategy.
+
+    Instead of waking a minute before the close and fetching candles, it acts on each closed
+    candle from the shared feed: one O(1) ADX update, the crossover of close over high two
+    bars back, and an order through the shared OrderManager.
+
+    With trigger=True it arms the entry instead: after each closed candle it works out the
+    price the next candle must trade above (breakout_trigger), checks the cached balance and
+    precomputes the limit price, stop loss and take profit. Each public trade is then only
+    compared against the armed price, and the order is sent the moment one trades above it,
+    within the candle rather than at its close. Nothing between the candle close and the
+    order waits on REST: the balance is refreshed in the background after each candle and
+    each fill, and start() arms the forming candle so a restart does not sit out a bar.
+    """
+
+    def __init__(self, symbol: str = TradingConfig.symbol, timeframe: str = TradingConfig.timeframe,
+                 amount: float = TradingConfig.trade_amount_eth, store: Optional[OHLCVStore] = None,
+                 state_path: Optional[str] = None, trigger: bool = False, name: Optional[str] = None):
+        super().__init__(name or f"HighLowBreak {symbol} {timeframe}")
+        self.trigger = trigger
+        self.trades = trigger  # Ticks to fire the armed entry on
+        self.armed = None
+        self.quote_balance = None  # Free quote currency, refreshed off the entry path
+        self.fired = []        # (trade timestamp ms, trigger, trade price) for every fired entry
+        self.symbol = symbol
+        self.symbols = (symbol,)
+        self.timeframe = timeframe
+        self.interval = int(pd.Timedelta(timeframe).total_seconds() // 60)
+        self.amount = amount
+        self.store = store
+        self.state_path = state_path
+        self.adx_state = None
+        self.candles = deque(maxlen=4)  # Closed candles the crossover looks at
+        self.trade_state = TradeState()
+
+    async def start(self):
+        try:
+            ohlcv = await self.exchange.fetch_ohlcv(self.symbol, timeframe=self.timeframe, limit=TradingConfig.seed_limit)
+        except Exception as e:
+            self.logger.error(f"Error fetching history to seed ADX: {e}")
+            ohlcv = []
+        history = history_frame(ohlcv, self.store, self.symbol, str(self.interval))
+        timestamps = (pd.DatetimeIndex(history.index).as_unit('ms').asi8).tolist()
+
+        state = load_adx_state(self.state_path)
+        # A saved state can only catch up from candles the exchange still returns
+        if state is not None and ohlcv and state.last_timestamp is not None and state.last_timestamp >= ohlcv[0][0]:
+            for timestamp, row in zip(timestamps, history.itertuples()):
+                if timestamp > state.last_timestamp:
+                    state.update(timestamp, row.high, row.low, row.close)
+        else:
+            state = IncrementalADX(TradingConfig.adx_period).seed(history)
+            self.logger.info(f"Seeded ADX from {len(history)} candles")
+        self.adx_state = state
+        self.save_state()
+
+        for timestamp, row in zip(timestamps[-4:], history.iloc[-4:].itertuples()):
+            self.candles.append({'timestamp': timestamp, 'high': row.high, 'close': row.close})
+
+        if self.trigger and self.candles:
+            await self.refresh_balance()
+            self.arm(state.adx, self.candles[-1]['timestamp'] + 2 * self.interval * 60_000)
+
+    def save_state(self):
+        if self.state_path:
+            self.adx_state.save(self.state_path)
+
+    async def on_candle(self, candle: dict):
+        if self.adx_state.last_timestamp is not None and candle['timestamp'] <= self.adx_state.last_timestamp:
+            return
+        adx = self.adx_state.update(candle['timestamp'], candle['high'], candle['low'], candle['close'])
+        self.candles.append(candle)
+        self.save_state()
+        if self.trigger:
+            self.arm(adx, candle['timestamp'] + 2 * self.interval * 60_000)
+            self.runtime.spawn(self.refresh_balance())
+            return
+        if len(self.candles) < 4:
+            return
+
+        # crossover(close, high.shift(2)) on the last two closed candles
+        closes = [c['close'] for c in self.candles]
+        highs = [c['high'] for c in self.candles]
+        if TradingConfig.adx_low < adx < TradingConfig.adx_high and closes[-2] < highs[-4] and closes[-1] > highs[-3]:
+            await self.enter(candle['close'])
+
+    def arm(self, adx: float, expires: int):
+        """Arms (or clears) the entry for the forming candle, everything but the price check."""
+        self.armed = None
+        trigger = breakout_trigger(self.candles, adx)
+        if trigger is None or not self.balance_ok(self.quote_balance):
+            return
+        self.armed = ArmedEntry(trigger, self.amount, expires)
+        self.logger.info(f"Armed: buy above ${trigger:.2f}, limit ${self.armed.limit_price:.2f}, "
+                         f"SL ${self.armed.stop_loss:.2f}, TP ${self.armed.take_profit:.2f}")
+
+    async def on_trade(self, trade: dict):
+        armed = self.armed
+        if armed is None or trade['price'] <= armed.trigger or trade['timestamp'] >= armed.expires:
+            return
+        self.armed = None
+        order = await self.orders.submit(self.symbol, 'limit', 'buy', armed.amount, armed.limit_price)
+        self.fired.append((trade['timestamp'], armed.trigger, trade['price']))
+        # Wait for the fill off this strategy's queue, ticks keep flowing meanwhile
+        self.runtime.spawn(self.confirm(order.id, armed))
+
+    async def confirm(self, order_id: str, armed: ArmedEntry):
+        result = await self.orders.wait(order_id, timeout=TradingConfig.order_timeout)
+        if result['status'] != 'closed':
+            self.logger.warning("Order cancelled due to timeout")
+            return
+        self.record_entry(result['average'] or armed.limit_price, armed.stop_loss, armed.take_profit)
+        await self.refresh_balance()
+
+    async def refresh_balance(self) -> Optional[float]:
+        """Fetches the free quote balance into quote_balance, keeps the last value on errors."""
+        try:
+            balance = await self.exchange.fetch_balance()
+            self.quote_balance = float(balance['free'].get(self.symbol.split('/')[1], 0))
+        except Exception as e:
+            self.logger.error(f"Error fetching balance: {e}")
+        return self.quote_balance
+
+    def balance_ok(self, quote_balance: Optional[float]) -> bool:
+        if quote_balance is None or quote_balance < TradingConfig.minimum_usd_balance:
+            self.logger.error(f"Insufficient {self.symbol.split('/')[1]} balance: {quote_balance}")
+            return False
+        return True
+
+    async def has_balance(self) -> bool:
+        return self.balance_ok(await self.refresh_balance())
+
+    async def enter(self, price: float) -> bool:
+        if not await self.has_balance():
+            return False
+
+        stop_loss = price * (1 - TradingConfig.stop_loss_pct)
+        take_profit = price * (1 + TradingConfig.stop_loss_pct * TradingConfig.risk_reward_ratio)
+        order = await self.orders.submit(self.symbol, 'limit', 'buy', self.amount, price)
+        result = await self.orders.wait(order.id, timeout=TradingConfig.order_timeout)
+        if result['status'] != 'closed':
+            self.logger.warning("Order cancelled due to timeout")
+            return False
+        self.record_entry(price, stop_loss, take_profit)
+        return True
+
+    def record_entry(self, price: float, stop_loss: float, take_profit: float):
+        self.trade_state.in_trade = True
+        self.trade_state.entry_price = price
+        self.trade_state.stop_loss = stop_loss
+        self.trade_state.take_profit = take_profit
+        self.trade_state.daily_trades += 1
+        self.trade_state.last_trade_time = datetime.now()
+        self.logger.info(f"BUY order executed: Entry ${price:.2f}, SL ${stop_loss:.2f}, TP ${take_profit:.2f}")
 
 if __name__ == "__main__":
-    bot = TradingBot()
+    exchange = kraken_exchange()
+    orders = OrderManager(exchange)
+    orders.start_background()
+    bot = TradingBot(exchange=exchange, store=OHLCVStore(), orders=orders,
+                     state_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'adx_state.json'))
     bot.run()
@@ -1,13 +1,15 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
 from backtesting import Backtest, Strategy
 from backtesting.lib import crossover
-from ta.trend import ADXIndicator
-import pandas as pd
-import ccxt
 from datetime import datetime, timedelta
-import multiprocessing
-
-# Set the multiprocessing start method to 'fork'
-multiprocessing.set_start_method('fork')
+import logging
+from ohlcv_store import OHLCVStore
+from backfill import backfill_ohlcv
+from indicator_cache import cached_adx
+from halving import successive_halving
 
 
 class HighLowBreakLongOnly(Strategy):
@@ -18,13 +20,8 @@ class HighLowBreakLongOnly(Strategy):
     stop_loss_pct = 0.02  # 2% stop loss
 
     def init(self):
-        high = self.data.High
-        low = self.data.Low
-        close = self.data.Close
-
-        price_data = pd.DataFrame({'High': high, 'Low': low, 'Close': close})
-
-        self.adx = self.I(ADXIndicator(price_data['High'], price_data['Low'], price_data['Close'], self.adx_period).adx)
+        # Computed once per adx_period for this data, not once per optimization trial
+        self.adx = self.I(cached_adx, self.data.High, self.data.Low, self.data.Close, self.adx_period, name='ADX')
 
     def next(self):
         if self.adx[-1] > self.adx_low and self.adx[-1] < self.adx_high:
@@ -33,63 +30,82 @@ class HighLowBreakLongOnly(Strategy):
                          tp=self.data.Close[-1] * (1 + self.stop_loss_pct * self.risk_reward_ratio))
 
 
-def fetch_ohlcv_kraken(symbol: str, timeframe: str, since: int):
-    """Fetch historical OHLCV data from Kraken using CCXT."""
-    exchange = ccxt.kraken({
-        'rateLimit': 1200,
-        'enableRateLimit': True
-    })
-
-    ohlcv = exchange.fetch_ohlcv(symbol, timeframe, since)
-    df = pd.DataFrame(ohlcv, columns=['timestamp', 'Open', 'High', 'Low', 'Close', 'Volume'])  # Capitalize column names
-    df['datetime'] = pd.to_datetime(df['timestamp'], unit='ms')
-    df.set_index('datetime', inplace=True)
-    df.drop(columns=['timestamp'], inplace=True)
-    return df
-
-
-# Load CSV data
-csv_path = '/Users/ethansung/quant/memebot/Data/ETHUSD_240.csv'
-csv_data = pd.read_csv(csv_path)
-csv_data['datetime'] = pd.to_datetime(csv_data['datetime'], unit='s')  # Convert timestamp
-csv_data.set_index('datetime', inplace=True)
-csv_data.sort_index(inplace=True)
-
-# Get the last timestamp from the CSV data
-last_csv_timestamp = int(csv_data.index[-1].timestamp() * 1000)  # Convert to milliseconds
-
-# Fetch API data starting from the end of the CSV data
-symbol = 'ETH/USD'
-timeframe = '4h'
-api_data = fetch_ohlcv_kraken(symbol, timeframe, last_csv_timestamp)
-
-# Combine CSV and API data
-combined_data = pd.concat([csv_data, api_data])
-combined_data = combined_data[~combined_data.index.duplicated(keep='last')]  # Remove duplicates
-combined_data.sort_index(inplace=True)  # Ensure the data is sorted by datetime
-
-# Define the backtest
-backtest = Backtest(combined_data, HighLowBreakLongOnly, cash=100000, commission=.0025)
-
-# Print statement indicating the start of optimization
-print("Optimization is running...")
-
-# Run optimization
-results = backtest.optimize(
+PARAMS = dict(
     adx_period=range(10, 30, 1),
     adx_low=range(10, 30, 1),
     adx_high=range(20, 50, 1),
     risk_reward_ratio=[2, 3, 4, 5],
     stop_loss_pct=[0.01, 0.02, 0.03, 0.04],
-    maximize='Sharpe Ratio',
-    return_heatmap=False,
-    method='skopt'
 )
 
-# Print the results summary
-print("Optimization Summary:")
-print(results)
 
-# Print the best parameters
-print("\nBest parameters:")
-print(results['_strategy'])
\ No newline at end of file
+def adx_band(p):
+    return p.adx_low < p.adx_high
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Optimize the ADX high/low breakout strategy.')
+    parser.add_argument('--method', choices=['skopt', 'halving'], default='skopt',
+                        help='skopt: Backtest.optimize with about 200 full-history backtests. '
+                             'halving: successive halving on a sample of the grid')
+    parser.add_argument('--max-candidates', type=int, default=2000,
+                        help='Grid points sampled for the first halving rung (2000 -> 2965 backtests, '
+                             'about 300 full-history backtests of work)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    # Seed the store from the CSV on first run
+    store = OHLCVStore()
+    csv_path = '/Users/ethansung/quant/memebot/Data/ETHUSD_240.csv'
+    if not store.has('ETHUSD', '240'):
+        store.ingest_csv(csv_path, 'ETHUSD', '240')
+
+    # Page through Kraken from the last stored bar until now, appending only new closed bars
+    symbol = 'ETH/USD'
+    timeframe = '4h'
+    backfill_ohlcv(symbol, timeframe, store=store)
+    combined_data = store.read(symbol, '240')
+
+    # Print statement indicating the start of optimization
+    print("Optimization is running...")
+
+    if args.method == 'skopt':
+        backtest = Backtest(combined_data, HighLowBreakLongOnly, cash=100000, commission=.0025)
+        results = backtest.optimize(
+            **PARAMS,
+            constraint=adx_band,
+            maximize='Sharpe Ratio',
+            return_heatmap=False,
+            method='skopt'
+        )
+
+        # Print the results summary
+        print("Optimization Summary:")
+        print(results)
+
+        # Print the best parameters
+        print("\nBest parameters:")
+        print(results['_strategy'])
+    else:
+        # Score a sample of the valid grid on the most recent bars, keep the best third on a 3x
+        # longer window each rung, and only backtest the survivors on the full history
+        results = successive_halving(
+            HighLowBreakLongOnly,
+            combined_data,
+            backtest_kwargs=dict(cash=100000, commission=.0025),
+            **PARAMS,
+            constraint=adx_band,
+            maximize='Sharpe Ratio',
+            eta=3,
+            rungs=4,
+            max_candidates=args.max_candidates
+        )
+
+        # Print the results summary
+        print("Optimization Summary:")
+        print(results.head(10))
+
+        # Print the best parameters
+        print("\nBest parameters:")
+        print(results.iloc[0])
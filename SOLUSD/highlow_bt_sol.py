@@ -1,8 +1,12 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from backtesting import Backtest, Strategy
 from backtesting.lib import crossover
 from ta.trend import ADXIndicator
 import pandas as pd
 import time
+from ohlcv_store import OHLCVStore
 
 
 class HighLowBreak(Strategy):
@@ -30,17 +34,13 @@ class HighLowBreak(Strategy):
                 self.sell(sl=self.data.Close[-1] * (1 + self.stop_loss_pct),
                           tp=self.data.Close[-1] * (1 - self.stop_loss_pct * self.risk_reward_ratio))
 
-data = pd.read_csv('/home/ebsung/quanttrading/Data/SOLUSD_240.csv')
-data['datetime'] = pd.to_datetime(data['datetime'], unit='s')
-data.set_index('datetime', inplace=True)
-data.sort_index(inplace=True)
-
 # Define date range
 start_date = '2023-01-01'
 end_date = '2024-11-30'
 
-# Filter data for date range
-data = data.loc[start_date:end_date]
+# Load only the date range from the columnar store (ingests the CSV on first run)
+data = OHLCVStore().load_range('SOLUSD', '240', start_date, end_date,
+                               csv_path='/home/ebsung/quanttrading/Data/SOLUSD_240.csv')
 
 backtest = Backtest(data, HighLowBreak, cash=100000, commission=.0025)
 
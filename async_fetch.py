@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+import aiohttp
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+'''
+Concurrent OHLCV fetcher for a whole symbol universe.
+
+All requests go through one aiohttp session (one pooled, keep-alive connection set) and one
+token bucket, so refreshing the mean reversion and trend universes costs roughly the time of
+the slowest call instead of one blocking requests.get per symbol.
+'''
+
+KRAKEN_OHLC_URL = "https://api.kraken.com/0/public/OHLC"
+
+
+class TokenBucket:
+    """
+    Async token bucket. Kraken throttles public endpoints per IP at roughly one call per
+    second with a small burst allowance, the defaults stay inside that.
+    """
+
+    def __init__(self, rate: float = 1.0, capacity: float = 15):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, tokens: float = 1):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+
+def kraken_ohlc_frame(result: dict) -> pd.DataFrame:
+    """Converts a Kraken public OHLC result into a frame indexed by 'datetime' with OHLCV and Trades."""
+    pair_key = next(key for key in result if key != 'last')
+    df = pd.DataFrame(result[pair_key], columns=[
+        'Time', 'Open', 'High', 'Low', 'Close', 'VWAP', 'Volume', 'Trades'
+    ])
+    df.index = pd.DatetimeIndex(pd.to_datetime(df.pop('Time').astype('int64'), unit='s'), name='datetime')
+    df = df[['Open', 'High', 'Low', 'Close', 'Volume', 'Trades']]
+    return df.astype({'Open': 'float64', 'High': 'float64', 'Low': 'float64', 'Close': 'float64',
+                      'Volume': 'float64', 'Trades': 'int64'})
+
+
+async def fetch_ohlc(session: aiohttp.ClientSession, limiter: TokenBucket, symbol: str, interval: int,
+                     since: Optional[int] = None, retries: int = 3) -> pd.DataFrame:
+    """Fetches one symbol's OHLC page, backing off and retrying when Kraken reports a rate limit."""
+    params = {
+        'pair': symbol.replace("/", "").upper(),
+        'interval': interval  # Interval in minutes: 1, 5, 15, 30, 60, 240, 1440, 10080, 21600
+    }
+    if since is not None:
+        params['since'] = since
+
+    for attempt in range(retries + 1):
+        await limiter.acquire()
+        async with session.get(KRAKEN_OHLC_URL, params=params) as response:
+            response.raise_for_status()
+            data = await response.json()
+
+        errors = data.get('error') or []
+        if any('Rate limit' in error for error in errors) and attempt < retries:
+            delay = 2 ** attempt
+            logger.warning(f"{symbol}: rate limited, retrying in {delay}s")
+            await asyncio.sleep(delay)
+            continue
+        if errors:
+            raise ValueError(f"Kraken API Error for {symbol}: {errors}")
+        return kraken_ohlc_frame(data['result'])
+
+
+async def fetch_universe(symbols, interval: int, since: Optional[int] = None, limiter: Optional[TokenBucket] = None,
+                         max_connections: int = 32, timeout: float = 30) -> dict:
+    """
+    Fetches OHLC data for every symbol concurrently.
+
+    Parameters:
+        symbols (list): Symbols such as "POPCAT/USD".
+        interval (int): Candle interval in minutes.
+        since (int, optional): Epoch seconds to start from.
+        limiter (TokenBucket, optional): Shared rate limiter, a new one is created if not given.
+        max_connections (int): Size of the session's connection pool.
+        timeout (float): Total timeout per request in seconds.
+
+    Returns:
+        dict: symbol -> DataFrame. Symbols that failed are logged and left out.
+    """
+    limiter = limiter or TokenBucket()
+    connector = aiohttp.TCPConnector(limit=max_connections)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        results = await asyncio.gather(
+            *(fetch_ohlc(session, limiter, symbol, interval, since) for symbol in symbols),
+            return_exceptions=True
+        )
+
+    frames = {}
+    for symbol, result in zip(symbols, results):
+        if isinstance(result, Exception):
+            logger.error(f"Failed to fetch {symbol}: {result}")
+        else:
+            frames[symbol] = result
+    return frames
+
+
+def fetch_universe_sync(symbols, interval: int, **kwargs) -> dict:
+    """Blocking wrapper around fetch_universe for scripts that are not async."""
+    return asyncio.run(fetch_universe(symbols, interval, **kwargs))
@@ -0,0 +1,114 @@
+import json
+import logging
+import os
+import time
+from typing import Optional
+
+import ccxt
+import pandas as pd
+
+from ohlcv_store import OHLCVStore
+
+logger = logging.getLogger(__name__)
+
+'''
+Resumable OHLCV backfill.
+
+Kraken returns at most one page (720 candles) per fetch_ohlcv call, so a single call from a
+stale CSV leaves a gap. backfill_ohlcv follows the since cursor page by page until it reaches
+the current candle, appends only closed bars to the OHLCVStore and records the last stored
+timestamp per symbol/timeframe in a checkpoint file so the next refresh starts where this one
+stopped.
+'''
+
+CHECKPOINT_FILE = 'backfill_checkpoints.json'
+
+
+def store_timeframe(exchange, timeframe: str) -> str:
+    """Partition label for a ccxt timeframe, in minutes to match the Kraken CSV names ('4h' -> '240')."""
+    return str(exchange.parse_timeframe(timeframe) // 60)
+
+
+def _load_checkpoints(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_checkpoint(path: str, key: str, timestamp_ms: int):
+    checkpoints = _load_checkpoints(path)
+    checkpoints[key] = timestamp_ms
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoints, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def backfill_ohlcv(symbol: str, timeframe: str, store: Optional[OHLCVStore] = None, exchange=None,
+                   since: Optional[int] = None, limit: int = 720, max_pages: int = 1000) -> int:
+    """
+    Fetches every closed candle after the last stored one and appends them to the store.
+
+    Parameters:
+        symbol (str): ccxt symbol (e.g., "ETH/USD").
+        timeframe (str): ccxt timeframe (e.g., "4h").
+        store (OHLCVStore, optional): Destination store. Defaults to OHLCVStore().
+        exchange (ccxt.Exchange, optional): Exchange to fetch from. Defaults to a public Kraken client.
+        since (int, optional): Start time in ms, only used when there is no checkpoint or stored data.
+        limit (int): Candles requested per page.
+        max_pages (int): Safety cap on the number of requests.
+
+    Returns:
+        int: Number of new bars appended.
+    """
+    store = store or OHLCVStore()
+    exchange = exchange or ccxt.kraken({
+        'rateLimit': 1200,
+        'enableRateLimit': True
+    })
+
+    tf_label = store_timeframe(exchange, timeframe)
+    tf_ms = exchange.parse_timeframe(timeframe) * 1000
+    key = f"{symbol.replace('/', '').upper()}/{tf_label}"
+    checkpoint_path = os.path.join(store.root, CHECKPOINT_FILE)
+
+    # Resume from whichever is newer: the checkpoint or the last bar actually in the store
+    cursor = since
+    checkpoint = _load_checkpoints(checkpoint_path).get(key)
+    if checkpoint is not None:
+        cursor = checkpoint + tf_ms
+    last_stored = store.last_timestamp(symbol, tf_label)
+    if last_stored is not None:
+        cursor = max(cursor or 0, last_stored.value // 1_000_000 + tf_ms)
+
+    appended = 0
+    for page in range(max_pages):
+        now_ms = int(time.time() * 1000)
+        if cursor is not None and cursor + tf_ms > now_ms:
+            break  # The next candle has not closed yet
+
+        ohlcv = exchange.fetch_ohlcv(symbol, timeframe, cursor, limit)
+
+        # Only keep candles that have closed, the forming one would be frozen by the append-only store
+        closed = [candle for candle in ohlcv if candle[0] + tf_ms <= now_ms]
+        if not closed:
+            break
+
+        if cursor is not None and closed[0][0] > cursor:
+            logger.warning(f"{symbol} {timeframe}: exchange returned no bars between "
+                           f"{pd.Timestamp(cursor, unit='ms')} and {pd.Timestamp(closed[0][0], unit='ms')}")
+
+        df = pd.DataFrame(closed, columns=['timestamp', 'Open', 'High', 'Low', 'Close', 'Volume'])
+        df.index = pd.DatetimeIndex(pd.to_datetime(df.pop('timestamp'), unit='ms'), name='datetime')
+        appended += store.append(symbol, tf_label, df)
+
+        last_ms = closed[-1][0]
+        _save_checkpoint(checkpoint_path, key, last_ms)
+        logger.info(f"{symbol} {timeframe}: page {page + 1} stored through {pd.Timestamp(last_ms, unit='ms')}")
+
+        if cursor is not None and last_ms + tf_ms <= cursor:
+            break  # The cursor did not advance
+        cursor = last_ms + tf_ms
+
+    return appended
@@ -0,0 +1,175 @@
+import itertools
+import sys
+
+import numpy as np
+import pandas as pd
+
+'''
+Batched parameter grid evaluation for MeanReversionStrategy.
+
+Backtest.optimize replays the whole bar loop in Python once per parameter set. Here the SMA is
+computed once per sma_period, the buy/sell thresholds are broadcast across a parameter axis and
+every combination's position and equity are stepped forward together, one numpy operation per
+bar for the whole grid.
+
+The simulation follows backtesting.py's rules for Backtest(..., exclusive_orders=True) with the
+default order size: signals from next() fill at the next bar's open, every new order first
+closes the open trade, size is a whole number of units from the available equity, and commission
+is charged on entry and exit. Ranking metrics use the same formulas as backtesting's stats, so
+the top rows can be confirmed with a single Backtest.run.
+'''
+
+
+def sma_matrix(close: np.ndarray, periods) -> np.ndarray:
+    """Rolling means of close for each period, shape (len(periods), len(close)), NaN while warming up."""
+    # Same rolling mean as the strategy's indicator, so threshold comparisons match bit for bit
+    close = pd.Series(np.asarray(close, dtype='float64'))
+    return np.vstack([close.rolling(period).mean().to_numpy() for period in periods])
+
+
+def mean_reversion_signals(close: np.ndarray, sma: np.ndarray, buy_threshold_pct: np.ndarray,
+                           sell_threshold_pct: np.ndarray) -> np.ndarray:
+    """
+    Signals for every parameter set at once: +1 buy, -1 sell, 0 nothing.
+
+    sma has one row per parameter set, thresholds are 1d arrays of the same length.
+    """
+    buy_threshold = sma * (1 - buy_threshold_pct[:, None] / 100)
+    sell_threshold = sma * (1 + sell_threshold_pct[:, None] / 100)
+    with np.errstate(invalid='ignore'):
+        buy = close < buy_threshold
+        sell = ~buy & (close > sell_threshold)
+    return buy.astype('int8') - sell.astype('int8')
+
+
+def simulate_exclusive_orders(open_: np.ndarray, close: np.ndarray, signals: np.ndarray, start: np.ndarray,
+                              cash: float = 10_000, commission: float = 0.0025, size: float = 1 - sys.float_info.epsilon) -> dict:
+    """
+    Steps every parameter set through the bars together.
+
+    Parameters:
+        open_, close (np.ndarray): Bar prices, shape (bars,).
+        signals (np.ndarray): +1/-1/0 orders placed at each bar's close, shape (runs, bars).
+        start (np.ndarray): First bar Strategy.next runs on for each run, shape (runs,).
+        cash (float): Starting cash.
+        commission (float): Relative commission per fill.
+        size (float): Fraction of equity each order uses, backtesting.py's default is all of it.
+
+    Returns:
+        dict: 'equity' (runs, bars) and 'trades' (runs,) closed trade counts.
+    """
+    runs, bars = signals.shape
+    balance = np.full(runs, float(cash))
+    units = np.zeros(runs)
+    entry = np.zeros(runs)
+    pending = np.zeros(runs, dtype='int8')
+    trades = np.zeros(runs, dtype='int64')
+    alive = np.ones(runs, dtype=bool)
+    equity = np.full((runs, bars), float(cash))
+
+    for i in range(bars):
+        price = open_[i]
+        fill = (pending != 0) & alive
+        if fill.any():
+            # Every new order closes the open trade first
+            closing = fill & (units != 0)
+            balance[closing] += units[closing] * (price - entry[closing]) - np.abs(units[closing]) * price * commission
+            trades[closing] += 1
+            units[fill] = 0
+
+            # Whole units sized from equity, including the commission on entry
+            new_units = np.floor(balance[fill] * size / (price * (1 + commission)))
+            units[fill] = pending[fill] * new_units
+            entry[fill] = price
+            balance[fill] -= new_units * price * commission
+
+        equity[:, i] = balance + units * (close[i] - entry)
+
+        # Out of money, backtesting.py stops the run and holds equity at 0
+        broke = alive & (equity[:, i] <= 0)
+        if broke.any():
+            alive[broke] = False
+            units[broke] = 0
+            balance[broke] = 0
+            equity[broke, i:] = 0
+
+        pending = np.where(alive & (i >= start), signals[:, i], 0).astype('int8')
+
+    return {'equity': equity, 'trades': trades}
+
+
+def backtesting_stats(equity: np.ndarray, index: pd.DatetimeIndex) -> pd.DataFrame:
+    """Return, drawdown and the daily-return based Sharpe/Sortino of backtesting.py for many equity curves."""
+    day = index.normalize()
+    day_last = np.flatnonzero(np.append(day[1:] != day[:-1], True))
+    daily = equity[:, day_last]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        day_returns = daily[:, 1:] / daily[:, :-1] - 1
+        day_returns = np.nan_to_num(day_returns, nan=0.0, posinf=0.0, neginf=0.0)
+
+        # geometric_mean() returns 0 when any return is <= -100%
+        growth = day_returns + 1
+        valid = (growth > 0).all(axis=1) & (growth.shape[1] > 0)
+        gmean = np.where(valid, np.exp(np.log(np.where(growth > 0, growth, 1)).mean(axis=1)) - 1, 0)
+
+        have_weekends = index.dayofweek.to_series().between(5, 6).mean() > 2 / 7 * .6
+        annual_days = 365 if have_weekends else 252
+        annual_return = (1 + gmean) ** annual_days - 1
+        ddof = 1 if day_returns.shape[1] > 1 else 0
+        variance = day_returns.var(axis=1, ddof=ddof) if day_returns.shape[1] else np.full(len(equity), np.nan)
+        volatility = np.sqrt((variance + (1 + gmean) ** 2) ** annual_days - (1 + gmean) ** (2 * annual_days))
+        sharpe = annual_return / np.where(volatility == 0, np.nan, volatility)
+        downside = np.sqrt(np.mean(np.clip(day_returns, -np.inf, 0) ** 2, axis=1)) * np.sqrt(annual_days)
+        sortino = annual_return / downside
+
+        drawdown = 1 - equity / np.maximum.accumulate(equity, axis=1)
+        max_drawdown = np.nan_to_num(drawdown).max(axis=1)
+
+    return pd.DataFrame({
+        'Equity Final [$]': equity[:, -1],
+        'Return [%]': (equity[:, -1] - equity[:, 0]) / equity[:, 0] * 100,
+        'Return (Ann.) [%]': annual_return * 100,
+        'Volatility (Ann.) [%]': volatility * 100,
+        'Sharpe Ratio': sharpe,
+        'Sortino Ratio': sortino,
+        'Max. Drawdown [%]': -max_drawdown * 100,
+    })
+
+
+def optimize_mean_reversion(data: pd.DataFrame, sma_period, buy_threshold_pct, sell_threshold_pct,
+                            cash: float = 10_000, commission: float = 0.0025,
+                            maximize: str = 'Sharpe Ratio') -> pd.DataFrame:
+    """
+    Evaluates every MeanReversionStrategy parameter combination in one vectorized pass.
+
+    Parameters:
+        data (pd.DataFrame): OHLCV bars indexed by datetime, as passed to Backtest.
+        sma_period, buy_threshold_pct, sell_threshold_pct: Iterables of values to try.
+        cash (float): Starting cash.
+        commission (float): Relative commission per fill.
+        maximize (str): Column to rank by, highest first.
+
+    Returns:
+        pd.DataFrame: One row per combination with its parameters and stats, best first.
+    """
+    periods = list(sma_period)
+    grid = np.array(list(itertools.product(range(len(periods)), buy_threshold_pct, sell_threshold_pct)), dtype='float64')
+    period_row = grid[:, 0].astype('int64')
+
+    close = data['Close'].to_numpy(dtype='float64')
+    open_ = data['Open'].to_numpy(dtype='float64')
+
+    # One SMA per distinct period, shared by every threshold pair through the row index
+    sma = sma_matrix(close, periods)[period_row]
+    signals = mean_reversion_signals(close, sma, grid[:, 1], grid[:, 2])
+
+    # Strategy.next only starts once the SMA has a value, +1 bar like Backtest.run
+    start = np.array(periods)[period_row]
+    result = simulate_exclusive_orders(open_, close, signals, start, cash=cash, commission=commission)
+
+    stats = backtesting_stats(result['equity'], pd.DatetimeIndex(data.index))
+    stats.insert(0, 'sell_threshold_pct', grid[:, 2])
+    stats.insert(0, 'buy_threshold_pct', grid[:, 1])
+    stats.insert(0, 'sma_period', start)
+    stats['# Trades'] = result['trades']
+    return stats.sort_values(maximize, ascending=False, na_position='last').reset_index(drop=True)
@@ -0,0 +1,303 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import gc
+import json
+import platform
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+'''
+Benchmarks for the repo's hot paths.
+
+Each case times one hot path on the bundled Data/XBTUSDT_*.csv files or on synthetic minute
+bars (a seeded random walk, --years of them), then runs it once more under tracemalloc for the
+peak Python/numpy allocation. Results (seconds, peak MB, bars/s) go to benchmarks/results.json
+and a table to bench_output.txt. Later runs flag every case slower than the stored baseline *
+(1 + --tolerance) and exit with status 1.
+
+Timings only compare on the same machine, so no baseline is committed. The first run, when
+benchmarks/baseline.json does not exist yet, is saved as the baseline. --save-baseline records
+a new one, e.g. after an intended change in speed.
+
+    python benchmarks/bench.py                      # run everything, compare to the baseline
+    python benchmarks/bench.py -k adx -k volbreak   # only cases whose name contains a pattern
+    python benchmarks/bench.py --save-baseline      # record a new baseline
+
+Cases whose module cannot be imported here are skipped.
+'''
+
+REPO = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DATA = os.path.join(REPO, 'Data')
+RESULTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results.json')
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+REPORT_PATH = os.path.join(REPO, 'bench_output.txt')
+
+CASES = []
+
+
+def case(name: str):
+    """Registers a benchmark. The function does its setup and returns (bars, callable to time)."""
+    def register(setup):
+        CASES.append((name, setup))
+        return setup
+    return register
+
+
+def synthetic_minutes(years: float = 2, seed: int = 0) -> pd.DataFrame:
+    """Random-walk 1 minute OHLCV bars indexed by datetime."""
+    rng = np.random.default_rng(seed)
+    n = int(years * 365 * 24 * 60)
+    close = 20_000 * np.exp(np.cumsum(rng.normal(0, 0.0008, n)))
+    open_ = np.append(close[0], close[:-1])
+    spread = np.abs(rng.normal(0, 0.0005, n)) * close
+    return pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) + spread,
+        'Low': np.minimum(open_, close) - spread,
+        'Close': close,
+        'Volume': rng.gamma(2.0, 0.5, n),
+    }, index=pd.date_range('2020-01-01', periods=n, freq='1min', name='datetime'))
+
+
+_synthetic = {}
+
+
+def minutes(years: float) -> pd.DataFrame:
+    if years not in _synthetic:
+        _synthetic[years] = synthetic_minutes(years)
+    return _synthetic[years]
+
+
+def xbt_hourly() -> pd.DataFrame:
+    from ohlcv_loader import parse_ohlcv
+    return parse_ohlcv(os.path.join(DATA, 'XBTUSDT_60.csv'))
+
+
+@case('csv_read_csv_xbt60')
+def bench_read_csv(args):
+    path = os.path.join(DATA, 'XBTUSDT_60.csv')
+    bars = sum(1 for _ in open(path)) - 1
+    return bars, lambda: pd.read_csv(path)
+
+
+@case('csv_parse_ohlcv_xbt60')
+def bench_parse_ohlcv(args):
+    from ohlcv_loader import parse_ohlcv
+    path = os.path.join(DATA, 'XBTUSDT_60.csv')
+    bars = sum(1 for _ in open(path)) - 1
+    return bars, lambda: parse_ohlcv(path)
+
+
+@case('csv_parse_ohlcv_synthetic_1m')
+def bench_parse_synthetic(args):
+    from ohlcv_loader import parse_ohlcv
+    df = minutes(args.years)
+    path = os.path.join(args.tmpdir, 'synthetic_1m.csv')
+    if not os.path.exists(path):
+        out = df.reset_index()
+        out['datetime'] = out['datetime'].astype('int64') // 10 ** 9
+        out.to_csv(path, index=False)
+    return len(df), lambda: parse_ohlcv(path)
+
+
+@case('support_resistance_full')
+def bench_support_resistance(args):
+    from levels import support_resistance
+    df = minutes(args.years)
+    rows = [{'price_high': h, 'price_low': l} for h, l in zip(df['High'].tolist(), df['Low'].tolist())]
+    return len(rows), lambda: sum(1 for _ in support_resistance(rows))
+
+
+@case('support_resistance_window')
+def bench_support_resistance_window(args):
+    from levels import support_resistance
+    df = minutes(args.years)
+    rows = [{'price_high': h, 'price_low': l} for h, l in zip(df['High'].tolist(), df['Low'].tolist())]
+    return len(rows), lambda: sum(1 for _ in support_resistance(rows, window=20))
+
+
+@case('volbreak_backtest_xbt60')
+def bench_volbreak(args):
+    from volbreak import backtest_strategy, calculate_relative_volume
+    df = calculate_relative_volume(xbt_hourly().rename(columns=str.lower).reset_index())
+    return len(df), lambda: backtest_strategy(df)
+
+
+@case('volbreak_backtest_fast_synthetic_1m')
+def bench_volbreak_fast(args):
+    from volbreak import backtest_strategy_fast, calculate_relative_volume
+    df = calculate_relative_volume(minutes(args.years).rename(columns=str.lower).reset_index())
+    return len(df), lambda: backtest_strategy_fast(df)
+
+
+@case('sma_strategy_next_xbt60')
+def bench_sma_strategy(args):
+    from backtesting import Backtest
+    from smaopt import SMAStrategy
+    # SMAStrategy.next recomputes both SMAs over the whole history every bar, keep it short
+    data = xbt_hourly().iloc[-args.sma_bars:]
+    backtest = Backtest(data, SMAStrategy, cash=1_000_000, commission=.002)
+    return len(data), lambda: backtest.run()
+
+
+@case('adx_ta_synthetic_1m')
+def bench_adx_ta(args):
+    from ta.trend import ADXIndicator
+    df = minutes(args.years)
+    return len(df), lambda: ADXIndicator(df['High'], df['Low'], df['Close'], 14).adx()
+
+
+@case('adx_cached_synthetic_1m')
+def bench_adx_cached(args):
+    import indicator_cache
+    df = minutes(args.years)
+    high, low, close = (df[c].to_numpy() for c in ['High', 'Low', 'Close'])
+
+    def run():
+        indicator_cache.clear()
+        return indicator_cache.cached_adx(high, low, close, 14)
+    return len(df), run
+
+
+@case('adx_incremental_synthetic_1m')
+def bench_adx_incremental(args):
+    from incremental import IncrementalADX
+    df = minutes(args.years)
+    rows = list(zip(df['High'].tolist(), df['Low'].tolist(), df['Close'].tolist()))
+
+    def run():
+        adx = IncrementalADX(14)
+        for high, low, close in rows:
+            adx.update(None, high, low, close)
+        return adx.adx
+    return len(rows), run
+
+
+def measure(func, repeat: int) -> dict:
+    """Best wall time over repeat runs, then one run under tracemalloc for the peak allocation."""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': min(times), 'peak_mb': peak / 2 ** 20}
+
+
+def run_cases(args) -> dict:
+    results = {}
+    for name, setup in CASES:
+        if args.k and not any(pattern in name for pattern in args.k):
+            continue
+        try:
+            bars, func = setup(args)
+        except ImportError as e:
+            print(f"{name:40s} skipped ({e})")
+            results[name] = {'skipped': str(e)}
+            continue
+        result = measure(func, args.repeat)
+        result['bars'] = bars
+        result['bars_per_second'] = bars / result['seconds'] if result['seconds'] else float('inf')
+        results[name] = result
+        print(f"{name:40s} {result['seconds']:10.4f}s {result['peak_mb']:10.1f} MB {result['bars_per_second']:14,.0f} bars/s")
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Names of the cases that got slower than the baseline by more than tolerance."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if 'seconds' not in result or not before or 'seconds' not in before:
+            continue
+        if result['seconds'] > before['seconds'] * (1 + tolerance):
+            regressions.append(name)
+    return regressions
+
+
+def report(results: dict, baseline: dict, regressions: list) -> str:
+    lines = [f"{'case':40s} {'seconds':>10s} {'baseline':>10s} {'change':>8s} {'peak MB':>10s} {'bars/s':>14s}"]
+    for name, result in results.items():
+        if 'skipped' in result:
+            lines.append(f"{name:40s} skipped: {result['skipped']}")
+            continue
+        before = baseline.get(name, {}).get('seconds')
+        change = f"{(result['seconds'] / before - 1) * 100:+7.1f}%" if before else '       -'
+        before = f"{before:10.4f}" if before else '         -'
+        flag = '  REGRESSION' if name in regressions else ''
+        lines.append(f"{name:40s} {result['seconds']:10.4f} {before} {change} "
+                     f"{result['peak_mb']:10.1f} {result['bars_per_second']:14,.0f}{flag}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the repo's hot paths.")
+    parser.add_argument('-k', action='append', help='Only run cases whose name contains this (repeatable)')
+    parser.add_argument('--years', type=float, default=2, help='Years of synthetic minute bars')
+    parser.add_argument('--sma-bars', type=int, default=3000, help='Hourly bars for the SMAStrategy case')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case, the best one is kept')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown against the baseline')
+    parser.add_argument('--save-baseline', action='store_true', help='Store this run as the baseline')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        args.tmpdir = tmpdir
+        results = run_cases(args)
+
+    baseline = {}
+    if not os.path.exists(BASELINE_PATH):
+        print("No baseline yet, saving this run as the baseline")
+        args.save_baseline = True
+    else:
+        with open(BASELINE_PATH) as f:
+            stored = json.load(f)
+        if stored.get('years') == args.years:
+            baseline = stored['results']
+        else:
+            print(f"Baseline was recorded with --years {stored.get('years')}, not comparing")
+    regressions = compare(results, baseline, args.tolerance)
+
+    record = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'years': args.years,
+        'results': results,
+    }
+    with open(RESULTS_PATH, 'w') as f:
+        json.dump(record, f, indent=2)
+    if args.save_baseline:
+        if baseline:
+            # Keep baseline entries for cases not run this time
+            record['results'] = {**baseline, **results}
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(record, f, indent=2)
+        print(f"Baseline saved to {BASELINE_PATH}")
+
+    text = report(results, baseline, regressions)
+    with open(REPORT_PATH, 'w') as f:
+        f.write(text + '\n')
+    print('\n' + text)
+
+    if regressions and not args.save_baseline:
+        print(f"\n{len(regressions)} regression(s) over {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+'''
+Clocks for the live bots.
+
+Bots read the time and sleep through a clock object instead of calling time/datetime directly,
+so the same bot code runs in real time with SystemClock and at replay speed with
+SimulatedClock, where sleeping just moves the simulated time forward.
+'''
+
+
+class SystemClock:
+    """Wall-clock time."""
+
+    def time(self) -> float:
+        return time.time()
+
+    def now(self) -> datetime:
+        return datetime.now()
+
+    def utcnow(self) -> datetime:
+        return datetime.utcnow()
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+    def wait(self, event, timeout: float) -> bool:
+        """Blocks until event is set or timeout passes, returns whether the event was set."""
+        return event.wait(timeout=timeout)
+
+
+class SimulatedClock:
+    """Manually advanced UTC time, sleeping returns immediately after moving the clock."""
+
+    def __init__(self, start: datetime):
+        self.current = start
+
+    def set(self, when: datetime):
+        self.current = when
+
+    def time(self) -> float:
+        return self.current.replace(tzinfo=timezone.utc).timestamp()
+
+    def now(self) -> datetime:
+        return self.current
+
+    def utcnow(self) -> datetime:
+        return self.current
+
+    def sleep(self, seconds: float):
+        self.current += timedelta(seconds=max(0.0, seconds))
+
+    def wait(self, event, timeout: float) -> bool:
+        if not event.is_set():
+            self.sleep(timeout)
+        return event.is_set()
@@ -1,9 +1,9 @@
-import pandas as pd
 import numpy as np
 from hmmlearn import hmm
 import matplotlib.pyplot as plt
 from sklearn.preprocessing import StandardScaler
 import time
+from ohlcv_loader import load_ohlcv
 
 # Hidden markov model ... < RNN recurrent neural network... only on one day, and one persons features...
 # Andrew Ng
@@ -13,18 +13,12 @@ print("Starting Bitcoin HMM analysis...")
 # Load and preprocess data
 def load_and_preprocess_data(file_path):
     print(f"Loading data from {file_path}...")
-    # Read CSV with custom column names, no header
-    df = pd.read_csv(file_path)
+    # Detects the CSV layout and reuses the parsed cache when the file has not changed
+    df = load_ohlcv(file_path, lowercase=True)
 
     # Print column names for debugging
     print("Column names in the CSV:", df.columns)
 
-    print("Converting datetime column to human-readable format...")
-    df['datetime'] = pd.to_datetime(df['datetime'], unit='s')
-
-    print("Setting datetime index...")
-    df.set_index('datetime', inplace=True)
-
     print("Calculating returns and volatility...")
     df['Returns'] = df['close'].pct_change()
     df['Volatility'] = df['Returns'].rolling(window=24).std()
@@ -0,0 +1,94 @@
+import logging
+import math
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from result_cache import ResultCache
+from shm_optimizer import evaluate, param_grid
+
+logger = logging.getLogger(__name__)
+
+'''
+Successive-halving optimizer for large parameter grids.
+
+Points that break the constraint are dropped before anything runs. The remaining points, or a
+random sample of max_candidates of them, are scored on a short window of the most recent bars,
+only the best 1/eta of them move up to a window eta times longer, and so on until the survivors
+are backtested on the full history. Most candidates are only ever run on a small slice of the
+data, which is where the time goes.
+
+With n first-rung candidates the rungs run n, n/eta, n/eta^2, ... backtests on windows of
+len(data)/eta^(rungs-1), ..., len(data) bars, so each rung costs about n/eta^(rungs-1)
+full-history backtests. For example 2000 candidates, eta=3 and rungs=4 are 2000 + 667 + 223 + 75
+= 2965 backtests, about 300 full-history backtests of work. Without max_candidates rung 0 runs the
+whole constrained grid, which for a large grid is far slower than a sampled search.
+'''
+
+
+def rung_windows(data: pd.DataFrame, rungs: int, eta: int, min_bars: int = 200) -> list:
+    """Trailing windows for each rung, eta times longer each time and ending with the full data."""
+    windows = []
+    for rung in range(rungs):
+        bars = max(min_bars, int(math.ceil(len(data) / eta ** (rungs - 1 - rung))))
+        windows.append(data.iloc[-bars:])
+    return windows
+
+
+def successive_halving(strategy, data: pd.DataFrame, backtest_kwargs: Optional[dict] = None,
+                       maximize: str = 'Sharpe Ratio', constraint=None, eta: int = 3, rungs: int = 3,
+                       min_bars: int = 200, processes: Optional[int] = None, mp_context: Optional[str] = None,
+                       cache: Optional[ResultCache] = None, max_candidates: Optional[int] = None,
+                       seed: int = 0, **params) -> pd.DataFrame:
+    """
+    Optimizes strategy over the params grid with successive halving.
+
+    Parameters:
+        strategy (type): backtesting.Strategy subclass, importable by the workers.
+        data (pd.DataFrame): OHLCV bars indexed by datetime.
+        backtest_kwargs (dict, optional): Keyword arguments for Backtest (cash, commission, ...).
+        maximize (str): Stats key to rank by, highest first. NaN scores rank last.
+        constraint (callable, optional): Receives the params as attributes, return False to skip.
+        eta (int): Keep the best 1/eta of each rung and make the next window eta times longer.
+        rungs (int): Number of rungs, the last one uses all of data.
+        min_bars (int): Shortest window, so indicators have time to warm up.
+        processes, mp_context, cache: Passed through to shm_optimizer.evaluate.
+        max_candidates (int, optional): Score a random sample of this many grid points on the first
+            rung instead of the whole grid.
+        seed (int): Seed for that sample, so a rerun picks the same points and can use the cache.
+        **params: Iterables of values for each strategy parameter.
+
+    Returns:
+        pd.DataFrame: The final rung's results on the full data, best first.
+    """
+    candidates = param_grid(constraint, **params)
+    logger.info(f"{len(candidates)} candidates after constraints")
+    if max_candidates is not None and len(candidates) > max_candidates:
+        picked = np.random.default_rng(seed).choice(len(candidates), max_candidates, replace=False)
+        candidates = [candidates[i] for i in np.sort(picked)]
+        logger.info(f"Sampled {len(candidates)} of them for the first rung")
+
+    backtests, bars_run = 0, 0
+
+    results = pd.DataFrame(columns=list(params))
+    for rung, window in enumerate(rung_windows(data, rungs, eta, min_bars)):
+        rows = evaluate(strategy, window, candidates, backtest_kwargs, processes, mp_context, cache)
+        backtests += len(candidates)
+        bars_run += len(candidates) * len(window)
+        if not rows:
+            return pd.DataFrame(columns=list(params))
+
+        results = pd.DataFrame(rows)
+        score = pd.to_numeric(results[maximize], errors='coerce').fillna(-np.inf)
+        results = results.iloc[np.argsort(-score.to_numpy(), kind='stable')].reset_index(drop=True)
+        results.insert(0, 'Rung', rung)
+        logger.info(f"Rung {rung}: {len(results)} candidates on {len(window)} bars "
+                    f"({window.index[0]} to {window.index[-1]}), best {maximize} {results[maximize].iloc[0]}")
+
+        if rung < rungs - 1:
+            keep = max(1, int(math.ceil(len(results) / eta)))
+            candidates = results.head(keep)[list(params)].to_dict('records')
+
+    logger.info(f"{backtests} backtests, about {bars_run / len(data):.0f} full-history backtests of work")
+    return results
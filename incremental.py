@@ -0,0 +1,226 @@
+import json
+import math
+import os
+from collections import deque
+from typing import Optional
+
+import pandas as pd
+
+'''
+Incremental indicators for the live bots.
+
+Each indicator is seeded once from stored history, then updated with one closed bar at a time
+in O(1), and can be written to JSON and restored after a restart. IncrementalADX follows
+ta.trend.ADXIndicator's Wilder smoothing step for step (the same sums, divisions and seeding
+means), so after seeding from the full history its ADX is the value ta, and therefore the
+backtest, computes for that bar, instead of an ADX recomputed on the last 101 candles.
+
+preview(...) gives the value the indicator would have if a still-forming candle closed now,
+without changing the state, which is what a bot woken just before the close needs.
+
+    adx = IncrementalADX(28)
+    adx.seed(store.read('ETHUSD', '240'))
+    adx.update(timestamp, high, low, close)      # every closed candle
+    adx.save('adx_state.json')
+'''
+
+
+class IncrementalADX:
+    """Wilder ADX, +DI and -DI, matching ta.trend.ADXIndicator on the same history."""
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.count = 0                 # Bars seen
+        self.last_timestamp = None     # Epoch ms of the last bar
+        self.prev_high = None
+        self.prev_low = None
+        self.prev_close = None
+        self.tr_sum = 0.0              # Wilder smoothed true range, directional movement
+        self.plus_sum = 0.0
+        self.minus_sum = 0.0
+        self.dx_seed = []              # First period DX values, averaged to start ADX
+        self.adx = 0.0                 # 0 while warming up, like ta
+        self.plus_di = 0.0
+        self.minus_di = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= 2 * self.period
+
+    def _step(self, high: float, low: float, close: float):
+        """The state after one more bar, as a tuple, without storing it."""
+        count = self.count + 1
+        tr_sum, plus_sum, minus_sum = self.tr_sum, self.plus_sum, self.minus_sum
+        dx_seed, adx, plus_di, minus_di = self.dx_seed, self.adx, self.plus_di, self.minus_di
+        window = float(self.period)
+
+        if count > 1:
+            true_range = max(high, self.prev_close) - min(low, self.prev_close)
+            up = high - self.prev_high
+            down = self.prev_low - low
+            plus_dm = up if up > down and up > 0 else 0.0
+            minus_dm = down if down > up and down > 0 else 0.0
+
+            # Bar index count - 1, the first bar has no true range
+            bar = count - 1
+            if bar <= self.period:
+                tr_sum += true_range
+                plus_sum += plus_dm
+                minus_sum += minus_dm
+            else:
+                tr_sum = tr_sum - (tr_sum / window) + true_range
+                plus_sum = plus_sum - (plus_sum / window) + plus_dm
+                minus_sum = minus_sum - (minus_sum / window) + minus_dm
+
+            if bar >= self.period:
+                plus_di = 100 * (plus_sum / tr_sum) if tr_sum != 0 else 0.0
+                minus_di = 100 * (minus_sum / tr_sum) if tr_sum != 0 else 0.0
+                total = plus_di + minus_di
+                dx = 100 * abs((plus_di - minus_di) / total) if total != 0 else 0.0
+
+                if bar < 2 * self.period:
+                    dx_seed = dx_seed + [dx]
+                    if bar == 2 * self.period - 1:
+                        adx = float(pd.Series(dx_seed).to_numpy().mean())
+                else:
+                    adx = ((adx * (self.period - 1)) + dx) / window
+
+        return count, tr_sum, plus_sum, minus_sum, dx_seed, adx, plus_di, minus_di
+
+    def update(self, timestamp: Optional[int], high: float, low: float, close: float) -> float:
+        """Adds one closed bar and returns the ADX on it."""
+        (self.count, self.tr_sum, self.plus_sum, self.minus_sum,
+         self.dx_seed, self.adx, self.plus_di, self.minus_di) = self._step(high, low, close)
+        if self.count >= 2 * self.period:
+            self.dx_seed = []
+        self.prev_high, self.prev_low, self.prev_close = high, low, close
+        self.last_timestamp = timestamp
+        return self.adx
+
+    def preview(self, high: float, low: float, close: float) -> float:
+        """ADX if a bar with these values closed now, the state is not changed."""
+        return self._step(high, low, close)[5]
+
+    def seed(self, bars: pd.DataFrame) -> 'IncrementalADX':
+        """Feeds every row of an OHLC frame indexed by datetime (any column case)."""
+        bars = bars.rename(columns=str.lower)
+        timestamps = pd.DatetimeIndex(bars.index).as_unit('ms').asi8
+        for timestamp, high, low, close in zip(timestamps.tolist(), bars['high'].tolist(),
+                                               bars['low'].tolist(), bars['close'].tolist()):
+            self.update(timestamp, high, low, close)
+        return self
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, state: dict) -> 'IncrementalADX':
+        indicator = cls(state['period'])
+        indicator.__dict__.update(state)
+        return indicator
+
+    def save(self, path: str):
+        save_state(path, self.to_dict())
+
+    @classmethod
+    def load(cls, path: str) -> 'IncrementalADX':
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+class IncrementalSMA:
+    """Simple moving average over the last period values."""
+
+    # Re-add the window from scratch this often so rounding in the running sum cannot drift
+    RESUM_EVERY = 1000
+
+    def __init__(self, period: int):
+        self.period = period
+        self.window = deque(maxlen=period)
+        self.total = 0.0
+        self.updates = 0
+        self.last_timestamp = None
+
+    @property
+    def value(self) -> float:
+        return self.total / self.period if len(self.window) == self.period else float('nan')
+
+    def update(self, timestamp: Optional[int], value: float) -> float:
+        if len(self.window) == self.period:
+            self.total -= self.window[0]
+        self.window.append(value)
+        self.total += value
+        self.updates += 1
+        if self.updates % self.RESUM_EVERY == 0:
+            self.total = math.fsum(self.window)
+        self.last_timestamp = timestamp
+        return self.value
+
+    def preview(self, value: float) -> float:
+        if len(self.window) < self.period - 1:
+            return float('nan')
+        dropped = self.window[0] if len(self.window) == self.period else 0.0
+        return (self.total - dropped + value) / self.period
+
+    def to_dict(self) -> dict:
+        return {'period': self.period, 'window': list(self.window), 'updates': self.updates,
+                'last_timestamp': self.last_timestamp}
+
+    @classmethod
+    def from_dict(cls, state: dict) -> 'IncrementalSMA':
+        indicator = cls(state['period'])
+        indicator.window.extend(state['window'])
+        indicator.total = math.fsum(indicator.window)
+        indicator.updates = state['updates']
+        indicator.last_timestamp = state['last_timestamp']
+        return indicator
+
+
+class RollingExtreme:
+    """Rolling max (or min) over the last window values with a monotonic deque."""
+
+    def __init__(self, window: int, mode: str = 'max'):
+        if mode not in ('max', 'min'):
+            raise ValueError("mode must be 'max' or 'min'")
+        self.window = window
+        self.mode = mode
+        self.index = 0
+        self.queue = deque()  # (index, value), values monotonic from the front
+        self.last_timestamp = None
+
+    def _dominates(self, new: float, old: float) -> bool:
+        return new >= old if self.mode == 'max' else new <= old
+
+    @property
+    def value(self) -> float:
+        return self.queue[0][1] if self.queue else float('nan')
+
+    def update(self, timestamp: Optional[int], value: float) -> float:
+        while self.queue and self._dominates(value, self.queue[-1][1]):
+            self.queue.pop()
+        self.queue.append((self.index, value))
+        while self.queue[0][0] <= self.index - self.window:
+            self.queue.popleft()
+        self.index += 1
+        self.last_timestamp = timestamp
+        return self.value
+
+    def to_dict(self) -> dict:
+        return {'window': self.window, 'mode': self.mode, 'index': self.index,
+                'queue': [list(item) for item in self.queue], 'last_timestamp': self.last_timestamp}
+
+    @classmethod
+    def from_dict(cls, state: dict) -> 'RollingExtreme':
+        indicator = cls(state['window'], state['mode'])
+        indicator.index = state['index']
+        indicator.queue.extend(tuple(item) for item in state['queue'])
+        indicator.last_timestamp = state['last_timestamp']
+        return indicator
+
+
+def save_state(path: str, state: dict):
+    """Writes indicator state as JSON, atomically so a crash never leaves half a file."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
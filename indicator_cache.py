@@ -0,0 +1,169 @@
+import hashlib
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from ta.trend import ADXIndicator
+
+'''
+Memoized indicators shared across optimization runs.
+
+Backtest.optimize calls Strategy.init once per parameter set, but an indicator only depends on
+the data and its own parameters. Results are keyed by a fingerprint of the input arrays, the
+indicator name and its parameters, and kept in a module level dict. Warming the cache in the
+parent before optimize forks its workers hands every worker the same copy-on-write pages, and
+setting INDICATOR_CACHE_DIR (or calling set_cache_dir) also persists each series as .npy so
+spawned workers and later runs load it instead of recomputing.
+
+After register_base(full_history), an indicator requested on a contiguous slice of that history
+(e.g. one walk-forward fold) is computed once on the full history and sliced, so overlapping
+folds share one series and each fold's indicators are already warmed up by the bars before it.
+
+Inside a Strategy:
+
+    self.adx = self.I(cached_adx, self.data.High, self.data.Low, self.data.Close, self.adx_period, name='ADX')
+'''
+
+_memory = {}
+_bases = []
+_cache_dir = os.environ.get('INDICATOR_CACHE_DIR')
+
+
+def set_cache_dir(path: Optional[str]):
+    """Persist indicators under path (None keeps them in memory only). Exported so spawned workers see it."""
+    global _cache_dir
+    _cache_dir = path
+    if path:
+        os.makedirs(path, exist_ok=True)
+        os.environ['INDICATOR_CACHE_DIR'] = path
+    else:
+        os.environ.pop('INDICATOR_CACHE_DIR', None)
+
+
+def clear():
+    _memory.clear()
+    _bases.clear()
+
+
+def register_base(data: pd.DataFrame):
+    """Registers a full history so indicators on slices of it are computed on the whole and sliced."""
+    index = pd.DatetimeIndex(data.index).as_unit('ns').asi8
+    columns = {name: data[name].to_numpy(dtype='float64') for name in data.columns}
+    _bases.append((index, columns))
+
+
+def _from_base(name: str, func, arrays, params: dict) -> Optional[np.ndarray]:
+    # backtesting.py data arrays carry their datetime index and column name
+    index = getattr(arrays[0], '_opts', {}).get('index')
+    if index is None or not _bases or len(arrays[0]) == 0:
+        return None
+    timestamps = pd.DatetimeIndex(index[:len(arrays[0])]).as_unit('ns').asi8
+
+    for base_index, columns in _bases:
+        start = int(np.searchsorted(base_index, timestamps[0]))
+        stop = start + len(timestamps)
+        if stop > len(base_index) or base_index[start] != timestamps[0] or base_index[stop - 1] != timestamps[-1]:
+            continue
+        base_arrays = []
+        for array in arrays:
+            column = columns.get(getattr(array, 'name', None))
+            if column is None or not np.array_equal(column[start:stop], array):
+                break
+            base_arrays.append(column)
+        else:
+            return cached(name, func, *base_arrays, **params)[start:stop]
+    return None
+
+
+def fingerprint(*arrays) -> str:
+    """Hash of the arrays' contents, shapes and dtypes."""
+    digest = hashlib.blake2b(digest_size=16)
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        digest.update(array.data)
+    return digest.hexdigest()
+
+
+def cached(name: str, func, *arrays, **params) -> np.ndarray:
+    """
+    Returns func(*arrays, **params), computing it only once per data fingerprint and parameters.
+
+    Parameters:
+        name (str): Indicator name, part of the cache key.
+        func (callable): Computes the indicator from the arrays and params, returning an array or Series.
+        *arrays: Input data arrays, hashed for the key.
+        **params: Indicator parameters, part of the key.
+
+    Returns:
+        np.ndarray: The indicator values. Treat as read-only, the same array is handed to every caller.
+    """
+    from_base = _from_base(name, func, arrays, params)
+    if from_base is not None:
+        return from_base
+
+    param_key = '_'.join(f"{key}={params[key]}" for key in sorted(params))
+    key = (fingerprint(*arrays), name, param_key)
+
+    values = _memory.get(key)
+    if values is not None:
+        return values
+
+    path = None
+    if _cache_dir:
+        path = os.path.join(_cache_dir, f"{key[0]}_{name}_{param_key}.npy")
+        if os.path.exists(path):
+            values = np.load(path)
+
+    if values is None:
+        values = np.asarray(func(*arrays, **params), dtype='float64')
+        if path:
+            tmp_path = path + f'.{os.getpid()}.tmp.npy'
+            np.save(tmp_path, values)
+            os.replace(tmp_path, path)
+
+    values.setflags(write=False)
+    _memory[key] = values
+    return values
+
+
+def _adx(high, low, close, period):
+    return ADXIndicator(pd.Series(high), pd.Series(low), pd.Series(close), period).adx()
+
+
+def _sma(close, period):
+    return pd.Series(close).rolling(period).mean()
+
+
+def _rvol(volume, window):
+    volume = pd.Series(volume)
+    return volume / volume.rolling(window=window).mean()
+
+
+def cached_adx(high, low, close, period: int) -> np.ndarray:
+    return cached('adx', _adx, high, low, close, period=int(period))
+
+
+def cached_sma(close, period: int) -> np.ndarray:
+    return cached('sma', _sma, close, period=int(period))
+
+
+def cached_rvol(volume, window: int = 20) -> np.ndarray:
+    return cached('rvol', _rvol, volume, window=int(window))
+
+
+def warm_adx(data: pd.DataFrame, periods):
+    """Computes ADX for every period up front, call before optimize so forked workers inherit it."""
+    high = data['High'].to_numpy()
+    low = data['Low'].to_numpy()
+    close = data['Close'].to_numpy()
+    for period in periods:
+        cached_adx(high, low, close, period)
+
+
+def warm_sma(data: pd.DataFrame, periods):
+    """Computes the Close SMA for every period up front."""
+    close = data['Close'].to_numpy()
+    for period in periods:
+        cached_sma(close, period)
@@ -0,0 +1,140 @@
+import logging
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+'''
+Intrabar stop-loss / take-profit resolution from 1 minute bars.
+
+When one 4h bar trades through both a trade's sl and tp, backtesting.py cannot tell which was
+hit first and always assumes the stop. MinuteIndex maps every parent bar to its range of minute
+bars with one searchsorted over the parent bar starts, so looking inside a bar is two array
+slices. resolve_trades only looks inside the exit bars that were actually ambiguous (stop and
+target both in range, open between them), which is a tiny fraction of the minute data, and
+rewrites those trades' exit price, commission, PnL and ReturnPct when the target came first.
+
+Only the trade itself is corrected. With all-in sizing the later trades' sizes would change
+too, so treat the corrected PnL as the intrabar-accurate outcome of each trade.
+
+    minutes = OHLCVStore().read('ETHUSD', '1', start_date, end_date)
+    trades = resolve_trades(stats['_trades'], bars, minutes, commission=.0025)
+'''
+
+
+class MinuteIndex:
+    """Minute bars grouped by the parent bar they fall in."""
+
+    def __init__(self, minutes: pd.DataFrame, parent_index: pd.DatetimeIndex,
+                 parent_duration: Optional[pd.Timedelta] = None):
+        self.times = pd.DatetimeIndex(minutes.index).as_unit('ns').asi8
+        self.high = minutes['High'].to_numpy(dtype='float64')
+        self.low = minutes['Low'].to_numpy(dtype='float64')
+
+        starts = pd.DatetimeIndex(parent_index).as_unit('ns').asi8
+        if parent_duration is None:
+            parent_duration = pd.Series(pd.DatetimeIndex(parent_index)).diff().median()
+        ends = np.append(starts[1:], starts[-1] + pd.Timedelta(parent_duration).value)
+
+        # starts[i]:stops[i] are the minutes inside parent bar i
+        self.starts = np.searchsorted(self.times, starts, side='left')
+        self.stops = np.searchsorted(self.times, ends, side='left')
+
+    def minutes(self, bar: int) -> slice:
+        return slice(self.starts[bar], self.stops[bar])
+
+    def first_touch(self, bar: int, sl: float, tp: float, is_long: bool = True):
+        """
+        Which of sl and tp the minute bars inside parent bar touched first.
+
+        Returns:
+            tuple: ('SL' or 'TP', epoch ns of the minute) or (None, None) when neither was
+                   touched or no minute bars cover the bar. A minute that spans both still
+                   counts as the stop, like backtesting.py.
+        """
+        window = self.minutes(bar)
+        high = self.high[window]
+        low = self.low[window]
+        if is_long:
+            stop_hit, target_hit = low <= sl, high >= tp
+        else:
+            stop_hit, target_hit = high >= sl, low <= tp
+
+        first_stop = np.argmax(stop_hit) if stop_hit.any() else len(high)
+        first_target = np.argmax(target_hit) if target_hit.any() else len(high)
+        if first_stop == first_target == len(high):
+            return None, None
+        if first_stop <= first_target:
+            return 'SL', self.times[window][first_stop]
+        return 'TP', self.times[window][first_target]
+
+
+def ambiguous_exits(trades: pd.DataFrame, bars: pd.DataFrame) -> np.ndarray:
+    """Mask of trades stopped out on a bar whose range also reached the take profit."""
+    exit_bar = trades['ExitBar'].to_numpy(dtype='int64')
+    sl = trades['SL'].to_numpy(dtype='float64')
+    tp = trades['TP'].to_numpy(dtype='float64')
+    long = trades['Size'].to_numpy() > 0
+    open_ = bars['Open'].to_numpy(dtype='float64')[exit_bar]
+    high = bars['High'].to_numpy(dtype='float64')[exit_bar]
+    low = bars['Low'].to_numpy(dtype='float64')[exit_bar]
+
+    with np.errstate(invalid='ignore'):
+        stopped = trades['ExitPrice'].to_numpy(dtype='float64') == sl
+        # An open beyond either level settles the bar, only an open between them is ambiguous
+        both_long = long & (low <= sl) & (high >= tp) & (open_ > sl) & (open_ < tp)
+        both_short = ~long & (high >= sl) & (low <= tp) & (open_ < sl) & (open_ > tp)
+    return stopped & (both_long | both_short)
+
+
+def resolve_trades(trades: pd.DataFrame, bars: pd.DataFrame, minutes: pd.DataFrame,
+                   commission: float = 0.0) -> pd.DataFrame:
+    """
+    Re-settles backtesting.py trades whose exit bar reached both sl and tp using minute bars.
+
+    Parameters:
+        trades (pd.DataFrame): stats['_trades'] from Backtest.run.
+        bars (pd.DataFrame): The bars the backtest ran on.
+        minutes (pd.DataFrame): 1 minute OHLC bars covering (some of) the same period.
+        commission (float): The Backtest's relative commission, to re-price the exit fill.
+
+    Returns:
+        pd.DataFrame: A copy of trades with corrected exits and a 'Resolved' column: 'SL' or
+                      'TP' for the ambiguous trades that minute data settled, None otherwise.
+    """
+    trades = trades.copy()
+    trades['Resolved'] = None
+    trades['IntrabarExitTime'] = pd.NaT
+    if trades.empty:
+        return trades
+
+    candidates = np.flatnonzero(ambiguous_exits(trades, bars))
+    index = MinuteIndex(minutes, bars.index)
+    scanned = 0
+    for row in candidates:
+        trade = trades.iloc[row]
+        bar = int(trade['ExitBar'])
+        window = index.minutes(bar)
+        scanned += window.stop - window.start
+        hit, when = index.first_touch(bar, trade['SL'], trade['TP'], trade['Size'] > 0)
+        if hit is None:
+            continue
+
+        column = trades.columns.get_loc
+        trades.iloc[row, column('Resolved')] = hit
+        trades.iloc[row, column('IntrabarExitTime')] = pd.Timestamp(when)
+        if hit == 'TP':
+            size, entry = trade['Size'], trade['EntryPrice']
+            exit_price = trade['TP']
+            commissions = trade['Commission'] + abs(size) * (exit_price - trade['ExitPrice']) * commission
+            trades.iloc[row, column('ExitPrice')] = exit_price
+            trades.iloc[row, column('Commission')] = commissions
+            trades.iloc[row, column('PnL')] = size * (exit_price - entry) - commissions
+            trades.iloc[row, column('ReturnPct')] = (np.sign(size) * (exit_price / entry - 1)
+                                                     - commissions / (abs(size) * entry))
+
+    logger.info(f"{len(candidates)} ambiguous exits, {(trades['Resolved'] == 'TP').sum()} hit the target first, "
+                f"{scanned} of {len(minutes)} minute bars scanned")
+    return trades
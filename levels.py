@@ -0,0 +1,54 @@
+from collections import deque
+from typing import Optional
+
+'''
+Support and resistance levels, kept apart from nice_funcs so they can be used (and
+benchmarked) without the exchange clients and API keys nice_funcs sets up on import.
+'''
+
+
+def support_resistance(rows, window: Optional[int] = None):
+    """
+    Yields (support, resistance) for each row in a single pass, using only the rows before it.
+
+    Parameters:
+        rows (iterable): CoinAPI OHLCV entries with "price_high" and "price_low".
+        window (int, optional): Only look back this many rows. Defaults to the full history.
+
+    Returns:
+        generator of (support, resistance) tuples, (None, None) for the first row.
+    """
+    if window is None:
+        # Running extremes over everything seen so far
+        resistance = None
+        support = None
+        for row in rows:
+            yield support, resistance
+            high = row["price_high"]
+            low = row["price_low"]
+            resistance = high if resistance is None or high > resistance else resistance
+            support = low if support is None or low < support else support
+        return
+
+    if window < 1:
+        raise ValueError("window must be at least 1")
+
+    # Monotonic deques of (index, price) so each row is pushed and popped at most once
+    highs = deque()
+    lows = deque()
+    for i, row in enumerate(rows):
+        while highs and highs[0][0] < i - window:
+            highs.popleft()
+        while lows and lows[0][0] < i - window:
+            lows.popleft()
+
+        yield (lows[0][1] if lows else None), (highs[0][1] if highs else None)
+
+        high = row["price_high"]
+        low = row["price_low"]
+        while highs and highs[-1][1] <= high:
+            highs.pop()
+        highs.append((i, high))
+        while lows and lows[-1][1] >= low:
+            lows.pop()
+        lows.append((i, low))
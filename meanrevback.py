@@ -20,9 +20,9 @@ PYTH/USD
 
 '''
 
-import pandas as pd
-import requests
 from backtesting import Backtest, Strategy
+from async_fetch import fetch_universe_sync
+from indicator_cache import cached_sma
 
 # Adjusted parameters for a proper mean reversion strategy
 symbols_data = {
@@ -46,8 +46,8 @@ class MeanReversionStrategy(Strategy):
     sell_threshold_pct = 7.0  # Default sell threshold
 
     def init(self):
-        # Calculate SMA using the sma_period parameter
-        self.sma = self.I(lambda x: pd.Series(x).rolling(self.sma_period).mean(), self.data.Close)
+        # Calculate SMA using the sma_period parameter, shared across runs with the same data and period
+        self.sma = self.I(cached_sma, self.data.Close, self.sma_period, name='SMA')
 
     def next(self):
         # Calculate thresholds
@@ -62,38 +62,6 @@ class MeanReversionStrategy(Strategy):
         elif self.data.Close[-1] > sell_threshold:
             self.sell()
 
-# Function to fetch OHLCV data from Kraken
-def fetch_ohlcv_from_kraken(symbol, interval):
-    # Map symbol to Kraken format
-    symbol = symbol.replace("/", "").upper()
-    url = f"https://api.kraken.com/0/public/OHLC"
-    params = {
-        'pair': symbol,
-        'interval': interval  # Interval in minutes: 1, 5, 15, 30, 60, 240, 1440, 10080, 21600
-    }
-
-    response = requests.get(url, params=params)
-    response.raise_for_status()  # Raise an error for bad HTTP responses
-
-    data = response.json()
-    if 'error' in data and data['error']:
-        raise ValueError(f"Kraken API Error: {data['error']}")
-
-    pair_key = list(data['result'].keys())[0]  # Get the first key (symbol-specific data)
-    ohlcv_data = data['result'][pair_key]
-
-    # Convert data to DataFrame
-    df = pd.DataFrame(ohlcv_data, columns=[
-        'Time', 'Open', 'High', 'Low', 'Close', 'Volume', 'VWAP', 'Trades'
-    ])
-    df['Time'] = pd.to_datetime(df['Time'], unit='s')
-    df.set_index('Time', inplace=True)
-
-    # Keep only the relevant columns for backtesting
-    df = df[['Open', 'High', 'Low', 'Close', 'Volume']].astype(float)
-
-    return df
-
 # Backtest function
 def backtest_strategy(data, symbol):
     thresholds = symbols_data.get(symbol, {'buy_threshold_pct': 0.0, 'sell_threshold_pct': 0.0})
@@ -122,18 +90,20 @@ def backtest_strategy(data, symbol):
     return stats
 
 if __name__ == "__main__":
-    symbol = "POPCAT/USD"  # Symbol to trade
     interval = 240  # 4-hour interval
 
-    try:
-        # Fetch data from Kraken
-        historical_data = fetch_ohlcv_from_kraken(symbol, interval)
+    # Fetch every symbol from Kraken at once, through one session and rate limiter
+    universe = fetch_universe_sync(list(symbols_data), interval)
+
+    for symbol, historical_data in universe.items():
+        try:
+            historical_data = historical_data[['Open', 'High', 'Low', 'Close', 'Volume']]
 
-        # Print the first few rows for debugging
-        print("Fetched Data:")
-        print(historical_data.head())
+            # Print the first few rows for debugging
+            print(f"Fetched Data for {symbol}:")
+            print(historical_data.head())
 
-        # Backtest the strategy
-        stats = backtest_strategy(historical_data, symbol)
-    except Exception as e:
-        print(f"Error: {e}")
\ No newline at end of file
+            # Backtest the strategy
+            stats = backtest_strategy(historical_data, symbol)
+        except Exception as e:
+            print(f"Error: {e}")
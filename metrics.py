@@ -0,0 +1,134 @@
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+'''
+Performance metrics for many equity curves at once.
+
+Everything takes a runs x bars equity matrix (a single curve is one row) and reduces along the
+bar axis, so a grid search can score thousands of curves in a few numpy calls. Sharpe and
+Sortino are computed from bar-to-bar returns, not from equity levels, and are annualized with
+periods_per_year when it is given (see periods_per_year() for a bar index). Trade statistics
+take a runs x trades P&L matrix padded with NaN.
+'''
+
+
+def periods_per_year(index) -> float:
+    """Bars per year from the median spacing of a datetime index."""
+    spacing = pd.Series(pd.DatetimeIndex(index)).diff().median()
+    return pd.Timedelta(days=365.25) / spacing
+
+
+def bar_returns(equity: np.ndarray) -> np.ndarray:
+    """Simple returns between consecutive bars, shape (runs, bars - 1)."""
+    equity = np.atleast_2d(np.asarray(equity, dtype='float64'))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return equity[:, 1:] / equity[:, :-1] - 1
+
+
+def sharpe_ratio(returns: np.ndarray, periods_per_year: Optional[float] = None) -> np.ndarray:
+    """Mean over standard deviation of the returns, NaN for flat curves."""
+    returns = np.atleast_2d(returns)
+    if returns.shape[1] < 2:
+        return np.full(len(returns), np.nan)
+    with np.errstate(invalid='ignore'):
+        std = returns.std(axis=1, ddof=1)
+        sharpe = returns.mean(axis=1) / np.where(std == 0, np.nan, std)
+    return sharpe * np.sqrt(periods_per_year) if periods_per_year else sharpe
+
+
+def sortino_ratio(returns: np.ndarray, periods_per_year: Optional[float] = None) -> np.ndarray:
+    """Mean return over the downside deviation (root mean square of the negative returns)."""
+    returns = np.atleast_2d(returns)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        downside = np.sqrt(np.mean(np.minimum(returns, 0) ** 2, axis=1))
+        sortino = returns.mean(axis=1) / np.where(downside == 0, np.nan, downside)
+    return sortino * np.sqrt(periods_per_year) if periods_per_year else sortino
+
+
+def max_drawdown(equity: np.ndarray) -> np.ndarray:
+    """Deepest fall from a running peak in percent (negative, 0 for curves that never fall)."""
+    equity = np.atleast_2d(np.asarray(equity, dtype='float64'))
+    peak = np.maximum.accumulate(equity, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdown = np.divide(equity, peak, out=peak)
+        return np.minimum(np.nanmin(drawdown, axis=1) - 1, 0) * 100
+
+
+def max_drawdown_duration(equity: np.ndarray) -> np.ndarray:
+    """Longest stretch in bars spent below a previous peak."""
+    equity = np.atleast_2d(np.asarray(equity, dtype='float64'))
+    bars = np.arange(equity.shape[1])
+    at_peak = equity >= np.maximum.accumulate(equity, axis=1)
+    # Position of the last peak at or before every bar, the distance to it is the time underwater
+    last_peak = np.maximum.accumulate(np.where(at_peak, bars, 0), axis=1)
+    return (bars - last_peak).max(axis=1)
+
+
+def equity_metrics(equity: np.ndarray, periods_per_year: Optional[float] = None) -> pd.DataFrame:
+    """
+    Return, risk and win metrics for every equity curve.
+
+    Parameters:
+        equity (np.ndarray): Equity curves, shape (runs, bars), the first bar is the starting equity.
+        periods_per_year (float, optional): Bars per year, annualizes return, Sharpe, Sortino and Calmar.
+
+    Returns:
+        pd.DataFrame: One row per run.
+    """
+    equity = np.atleast_2d(np.asarray(equity, dtype='float64'))
+    returns = bar_returns(equity)
+    drawdown = max_drawdown(equity)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        total_return = equity[:, -1] / equity[:, 0] - 1
+        if periods_per_year and returns.shape[1]:
+            growth = 1 + total_return
+            annual_return = np.where(growth > 0, np.abs(growth) ** (periods_per_year / returns.shape[1]) - 1, -1)
+        else:
+            annual_return = total_return
+        calmar = annual_return * 100 / np.where(drawdown == 0, np.nan, -drawdown)
+
+        moved = returns != 0
+        bars_moved = moved.sum(axis=1)
+        bar_win_rate = (returns > 0).sum(axis=1) / np.where(bars_moved == 0, np.nan, bars_moved) * 100
+
+    return pd.DataFrame({
+        'Equity Final': equity[:, -1],
+        'Return [%]': total_return * 100,
+        'Return (Ann.) [%]': annual_return * 100,
+        'Sharpe Ratio': sharpe_ratio(returns, periods_per_year),
+        'Sortino Ratio': sortino_ratio(returns, periods_per_year),
+        'Calmar Ratio': calmar,
+        'Max. Drawdown [%]': drawdown,
+        'Max. Drawdown Duration': max_drawdown_duration(equity),
+        'Win Rate (Bars) [%]': bar_win_rate,
+    })
+
+
+def trade_stats(pnl: np.ndarray) -> pd.DataFrame:
+    """
+    Win statistics for every run from a runs x trades matrix of per-trade P&L or returns, NaN padded.
+
+    Returns:
+        pd.DataFrame: One row per run with trade count, win rate, average win/loss and profit factor.
+    """
+    pnl = np.atleast_2d(np.asarray(pnl, dtype='float64'))
+    traded = ~np.isnan(pnl)
+    wins = np.where(traded & (pnl > 0), pnl, 0)
+    losses = np.where(traded & (pnl <= 0), pnl, 0)
+    count = traded.sum(axis=1)
+    win_count = (traded & (pnl > 0)).sum(axis=1)
+    loss_count = count - win_count
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return pd.DataFrame({
+            '# Trades': count,
+            'Wins': win_count,
+            'Losses': loss_count,
+            'Win Rate [%]': win_count / np.where(count == 0, np.nan, count) * 100,
+            'Avg. Win': wins.sum(axis=1) / np.where(win_count == 0, np.nan, win_count),
+            'Avg. Loss': losses.sum(axis=1) / np.where(loss_count == 0, np.nan, loss_count),
+            'Profit Factor': wins.sum(axis=1) / np.where(losses.sum(axis=1) == 0, np.nan, -losses.sum(axis=1)),
+        })
@@ -6,6 +6,8 @@ import ccxt
 from datetime import datetime, timedelta, timezone
 import requests
 import csv
+from typing import Optional
+from levels import support_resistance
 
 
 kraken = ccxt.kraken({
@@ -14,16 +16,21 @@ kraken = ccxt.kraken({
     'enableRateLimit': True,
 })
 
-def fetch_ohlcv(symbol: str, api_key: str, timeframe: str, start_date: str):
+def fetch_ohlcv(symbol: str, api_key: str, timeframe: str, start_date: str, window: Optional[int] = None):
     """
     Fetches OHLCV data for a specified symbol, timeframe, and start date from CoinAPI,
     calculates support and resistance, and saves the data to a CSV file.
 
+    Support and resistance are computed in one streaming pass and each row is written
+    to the CSV as soon as it is produced.
+
     Parameters:
         symbol (str): The trading symbol (e.g., "BINANCE_SPOT_ETH_BTC").
         api_key (str): Your CoinAPI API key.
         timeframe (str): The time period for OHLCV data (e.g., "1HRS", "1DAY").
         start_date (str): The start date in ISO 8601 format (e.g., "2023-03-01T00:00:00").
+        window (int, optional): Rolling lookback in candles for support and resistance.
+            Defaults to None, which uses all candles up to the current point.
 
     Returns:
         None
@@ -44,36 +51,14 @@ def fetch_ohlcv(symbol: str, api_key: str, timeframe: str, start_date: str):
             # Prepare the output CSV file
             filename = f"{symbol}_{timeframe}.csv"
 
-            # Initialize lists for resistance and support
-            resistance_levels = []
-            support_levels = []
-
-            # Calculate resistance and support dynamically
-            for i in range(len(data)):
-                # Consider data up to the current point
-                past_data = data[:i]
-                
-                if past_data:
-                    # Calculate resistance as the maximum high up to the current point
-                    resistance = max(d["price_high"] for d in past_data)
-                    # Calculate support as the minimum low up to the current point
-                    support = min(d["price_low"] for d in past_data)
-                else:
-                    # Default values for the first data point
-                    resistance = None
-                    support = None
-                
-                resistance_levels.append(resistance)
-                support_levels.append(support)
-
-            # Write data to the CSV file
+            # Write data to the CSV file as support and resistance are calculated
             with open(filename, mode="w", newline="", encoding="utf-8") as file:
                 writer = csv.writer(file)
                 # Write the header
                 writer.writerow(["datetime", "open", "high", "low", "close", "volume", "support", "resistance"])
-                
+
                 # Write the rows
-                for entry, resistance, support in zip(data, resistance_levels, support_levels):
+                for entry, (support, resistance) in zip(data, support_resistance(data, window)):
                     writer.writerow([
                         entry.get("time_period_start"),
                         entry.get("price_open"),
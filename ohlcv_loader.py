@@ -0,0 +1,132 @@
+import os
+import pickle
+
+import pandas as pd
+
+'''
+One loader for every OHLCV CSV layout in the repo:
+
+    epoch  datetime,Open,High,Low,Close,Volume,Trades   (Kraken exports, e.g. Data/XBTUSDT_60.csv)
+    date   Date,Open,High,Low,Close,Volume              (e.g. Data/XBTUSDT_1h.csv, XBTUSDT_1m.csv)
+    lower  datetime,open,high,low,close,volume,...      (nice_funcs.fetch_ohlcv output, data.py inputs)
+
+The layout is detected from the header, the file is parsed with explicit dtypes and the
+normalized frame is cached in a pickle sidecar next to the CSV. The sidecar records the CSV's
+mtime and size, so editing or replacing the CSV invalidates it automatically.
+'''
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+CACHE_SUFFIX = '.cache.pkl'
+
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    CSV_ENGINE = 'c'
+
+
+def detect_layout(path: str) -> dict:
+    """Reads the header and first row of a CSV and returns how to parse it."""
+    with open(path, newline='', encoding='utf-8') as f:
+        header = f.readline().strip().split(',')
+        first_row = f.readline().strip().split(',')
+
+    lookup = {name.lower(): name for name in header}
+    time_column = next((lookup[name] for name in ('datetime', 'date', 'timestamp', 'time') if name in lookup), None)
+    if time_column is None:
+        raise ValueError(f"No datetime column found in {path}: {header}")
+
+    missing = [name for name in PRICE_COLUMNS if name.lower() not in lookup]
+    if missing:
+        raise ValueError(f"Missing OHLCV columns in {path}: {missing}")
+
+    # Epoch timestamps are plain integers, seconds or milliseconds depending on the source
+    first_value = first_row[header.index(time_column)] if len(first_row) == len(header) else ''
+    unit = None
+    if first_value.isdigit():
+        unit = 'ms' if int(first_value) > 10 ** 11 else 's'
+
+    return {
+        'time_column': time_column,
+        'unit': unit,
+        'columns': {lookup[name.lower()]: name for name in PRICE_COLUMNS},
+        'trades_column': lookup.get('trades'),
+        'header': header,
+    }
+
+
+def parse_ohlcv(path: str) -> pd.DataFrame:
+    """Parses an OHLCV CSV of any supported layout into a frame indexed by 'datetime'."""
+    layout = detect_layout(path)
+    time_column = layout['time_column']
+
+    dtypes = {source: 'float64' for source in layout['columns']}
+    if layout['trades_column']:
+        dtypes[layout['trades_column']] = 'int64'
+    dtypes[time_column] = 'int64' if layout['unit'] else 'string'
+
+    df = pd.read_csv(path, usecols=list(dtypes), dtype=dtypes, engine=CSV_ENGINE)
+
+    if layout['unit']:
+        index = pd.to_datetime(df[time_column].to_numpy(), unit=layout['unit'])
+    else:
+        index = pd.to_datetime(df[time_column], format='ISO8601', utc=True).dt.tz_localize(None)
+
+    rename = dict(layout['columns'])
+    if layout['trades_column']:
+        rename[layout['trades_column']] = 'Trades'
+    df = df.drop(columns=[time_column]).rename(columns=rename)
+    df.index = pd.DatetimeIndex(index, name='datetime').as_unit('ns')
+
+    columns = PRICE_COLUMNS + (['Trades'] if layout['trades_column'] else [])
+    df = df[columns]
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
+    return df
+
+
+def _file_key(path: str) -> tuple:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_ohlcv(path: str, lowercase: bool = False, use_cache: bool = True) -> pd.DataFrame:
+    """
+    Loads an OHLCV CSV, using the parsed-data sidecar when it is still valid.
+
+    Parameters:
+        path (str): Path to the CSV file.
+        lowercase (bool): Return open/high/low/close/volume columns instead of the
+            backtesting.py Open/High/Low/Close/Volume names.
+        use_cache (bool): Read and write the sidecar cache.
+
+    Returns:
+        pd.DataFrame: Bars indexed by 'datetime'.
+    """
+    cache_path = path + CACHE_SUFFIX
+    key = _file_key(path)
+    df = None
+
+    if use_cache and os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                cached = pickle.load(f)
+            if cached.get('key') == key:
+                df = cached['frame']
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            df = None
+
+    if df is None:
+        df = parse_ohlcv(path)
+        if use_cache:
+            try:
+                tmp_path = cache_path + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    pickle.dump({'key': key, 'frame': df}, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, cache_path)
+            except OSError:
+                pass  # Read-only data directories still load, just without the cache
+
+    if lowercase:
+        df = df.rename(columns=str.lower)
+    return df
@@ -0,0 +1,173 @@
+import json
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from ohlcv_loader import parse_ohlcv
+
+'''
+Columnar OHLCV store.
+
+Each symbol/timeframe pair is its own partition directory holding one raw binary file per
+column plus a small meta.json. Timestamps are stored as int64 epoch nanoseconds, prices and
+volume as float64. Writes only ever append to the end of the column files, and reads memory
+map the timestamp column and binary search it so only the requested date range is loaded.
+
+    Data/store/ETHUSD/240/timestamp.bin
+    Data/store/ETHUSD/240/Open.bin
+    ...
+    Data/store/ETHUSD/240/meta.json
+'''
+
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Data', 'store')
+
+COLUMNS = {
+    'Open': 'float64',
+    'High': 'float64',
+    'Low': 'float64',
+    'Close': 'float64',
+    'Volume': 'float64',
+    'Trades': 'int64',
+}
+
+
+class OHLCVStore:
+    def __init__(self, root: str = DEFAULT_ROOT):
+        self.root = root
+
+    def partition_path(self, symbol: str, timeframe: str) -> str:
+        # 'ETH/USD' and 'ETHUSD' share the same partition
+        return os.path.join(self.root, symbol.replace('/', '').upper(), str(timeframe))
+
+    def has(self, symbol: str, timeframe: str) -> bool:
+        return os.path.exists(os.path.join(self.partition_path(symbol, timeframe), 'meta.json'))
+
+    def _read_meta(self, path: str) -> dict:
+        with open(os.path.join(path, 'meta.json')) as f:
+            return json.load(f)
+
+    def _write_meta(self, path: str, meta: dict):
+        # Write then rename so a crash mid-append never exposes a half written row count
+        tmp_path = os.path.join(path, 'meta.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(path, 'meta.json'))
+
+    def rows(self, symbol: str, timeframe: str) -> int:
+        if not self.has(symbol, timeframe):
+            return 0
+        return self._read_meta(self.partition_path(symbol, timeframe))['rows']
+
+    def _column(self, path: str, name: str, dtype: str, rows: int) -> np.ndarray:
+        if rows == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(path, f'{name}.bin'), dtype=dtype, mode='r', shape=(rows,))
+
+    def last_timestamp(self, symbol: str, timeframe: str) -> Optional[pd.Timestamp]:
+        """Returns the timestamp of the newest stored bar, or None if the partition is empty."""
+        rows = self.rows(symbol, timeframe)
+        if rows == 0:
+            return None
+        path = self.partition_path(symbol, timeframe)
+        return pd.Timestamp(int(self._column(path, 'timestamp', 'int64', rows)[-1]), unit='ns')
+
+    def append(self, symbol: str, timeframe: str, df: pd.DataFrame) -> int:
+        """
+        Appends bars to a partition, skipping any that are not newer than the last stored bar.
+
+        Parameters:
+            symbol (str): Trading symbol (e.g., "ETH/USD" or "ETHUSD").
+            timeframe (str): Timeframe label used for the partition (e.g., "240", "4h").
+            df (pd.DataFrame): Bars indexed by datetime with Open, High, Low, Close, Volume
+                and optionally Trades columns.
+
+        Returns:
+            int: Number of bars written.
+        """
+        path = self.partition_path(symbol, timeframe)
+        os.makedirs(path, exist_ok=True)
+
+        if self.has(symbol, timeframe):
+            meta = self._read_meta(path)
+        else:
+            columns = {name: dtype for name, dtype in COLUMNS.items() if name in df.columns}
+            meta = {'rows': 0, 'columns': columns}
+
+        df = df[~df.index.duplicated(keep='last')].sort_index()
+        timestamps = pd.DatetimeIndex(df.index).as_unit('ns').asi8
+
+        last = self.last_timestamp(symbol, timeframe)
+        if last is not None:
+            new = timestamps > last.value
+            df = df[new]
+            timestamps = timestamps[new]
+
+        if len(df) == 0:
+            return 0
+
+        # Sources such as ccxt do not report trade counts, store 0 for those bars
+        if 'Trades' in meta['columns'] and 'Trades' not in df.columns:
+            df = df.assign(Trades=0)
+        missing = [name for name in meta['columns'] if name not in df.columns]
+        if missing:
+            raise ValueError(f"Bars are missing stored columns: {missing}")
+
+        # Truncate any bytes left past the committed row count by an interrupted append
+        rows = meta['rows']
+        with open(os.path.join(path, 'timestamp.bin'), 'ab') as f:
+            f.truncate(rows * 8)
+            f.write(timestamps.astype('int64').tobytes())
+        for name, dtype in meta['columns'].items():
+            values = df[name].to_numpy(dtype=dtype)
+            with open(os.path.join(path, f'{name}.bin'), 'ab') as f:
+                f.truncate(rows * np.dtype(dtype).itemsize)
+                f.write(values.tobytes())
+
+        meta['rows'] = rows + len(df)
+        self._write_meta(path, meta)
+        return len(df)
+
+    def read(self, symbol: str, timeframe: str, start=None, end=None, columns=None) -> pd.DataFrame:
+        """
+        Reads bars for a partition, loading only the rows between start and end.
+
+        start and end follow DataFrame.loc semantics, so end='2024-11-30' includes the whole day.
+        """
+        path = self.partition_path(symbol, timeframe)
+        if not self.has(symbol, timeframe):
+            raise FileNotFoundError(f"No stored bars for {symbol} {timeframe} in {self.root}")
+
+        meta = self._read_meta(path)
+        rows = meta['rows']
+        timestamps = self._column(path, 'timestamp', 'int64', rows)
+
+        # Search a range that is guaranteed to cover the request, then let .loc trim it exactly
+        lo = 0
+        hi = rows
+        if start is not None:
+            lo = int(np.searchsorted(timestamps, pd.Timestamp(start).value, side='left'))
+        if end is not None:
+            upper = pd.Timestamp(end) + pd.Timedelta(days=1)
+            hi = int(np.searchsorted(timestamps, upper.value, side='right'))
+
+        index = pd.DatetimeIndex(np.array(timestamps[lo:hi]).view('datetime64[ns]'), name='datetime')
+        names = columns if columns is not None else list(meta['columns'])
+        data = {
+            name: np.array(self._column(path, name, meta['columns'][name], rows)[lo:hi])
+            for name in names
+        }
+        return pd.DataFrame(data, index=index).loc[start:end]
+
+    def ingest_csv(self, csv_path: str, symbol: str, timeframe: str) -> int:
+        """Appends an OHLCV CSV of any layout ohlcv_loader understands to the store."""
+        return self.append(symbol, timeframe, parse_ohlcv(csv_path))
+
+    def load_range(self, symbol: str, timeframe: str, start=None, end=None, csv_path: Optional[str] = None) -> pd.DataFrame:
+        """Reads a date range, ingesting csv_path first if the partition does not exist yet."""
+        if not self.has(symbol, timeframe):
+            if csv_path is None:
+                raise FileNotFoundError(f"No stored bars for {symbol} {timeframe} and no CSV to ingest")
+            self.ingest_csv(csv_path, symbol, timeframe)
+        return self.read(symbol, timeframe, start, end)
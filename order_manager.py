@@ -0,0 +1,421 @@
+import asyncio
+import inspect
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Optional
+
+import aiohttp
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+'''
+Asyncio order tracking for the live bots.
+
+OrderManager tracks any number of orders at once. Order updates come from Kraken's private
+websocket executions channel. When the stream is down, the manager polls instead, with one
+fetch_open_orders call per symbol for all tracked orders. The poll interval doubles while
+nothing changes and resets when something does. Each submitted order gets a future that
+resolves, with the ccxt-style order dict, once the order is filled, canceled, expired or
+rejected, so a strategy awaits its fills instead of sleeping in a fetch_order loop.
+
+Every order records submit -> ack latency (create_order returned, or the stream reported the
+order, whichever was first) and ack -> fill latency. latency_frame() returns them all.
+
+    orders = OrderManager(exchange)
+    asyncio.ensure_future(orders.run())
+    order = await orders.submit('ETH/USD', 'limit', 'buy', 0.002, 3500)
+    result = await orders.wait(order.id, timeout=60)
+
+Blocking bots can run the manager on a background thread with start_background() and use
+submit_sync / wait_sync. The exchange may be a ccxt sync client (calls run in a worker
+thread), a ccxt.async_support client, or a stand-in such as replay.ReplayExchange.
+'''
+
+KRAKEN_AUTH_WS_URL = "wss://ws-auth.kraken.com/v2"
+
+TERMINAL = ('closed', 'canceled', 'expired', 'rejected')
+
+# Kraken websocket v2 order_status -> ccxt status
+WS_STATUS = {
+    'pending_new': 'open',
+    'new': 'open',
+    'partially_filled': 'open',
+    'filled': 'closed',
+    'canceled': 'canceled',
+    'expired': 'expired',
+}
+
+
+class TrackedOrder:
+    def __init__(self, id: str, symbol: str, side: str, amount: float, price: Optional[float],
+                 submitted_at: Optional[float] = None):
+        self.id = id
+        self.symbol = symbol
+        self.side = side
+        self.amount = amount
+        self.price = price
+        self.status = 'open'
+        self.filled = 0.0
+        self.average = None
+        self.submitted_at = submitted_at  # time.monotonic() readings
+        self.acked_at = None
+        self.done_at = None
+        self.done_source = None           # 'stream' or 'rest'
+        self.future = asyncio.get_running_loop().create_future()
+
+    @property
+    def submit_to_ack(self) -> Optional[float]:
+        if self.submitted_at is None or self.acked_at is None:
+            return None
+        return self.acked_at - self.submitted_at
+
+    @property
+    def ack_to_fill(self) -> Optional[float]:
+        if self.status != 'closed' or self.acked_at is None or self.done_at is None:
+            return None
+        return self.done_at - self.acked_at
+
+    def as_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'symbol': self.symbol,
+            'side': self.side,
+            'amount': self.amount,
+            'price': self.price,
+            'status': self.status,
+            'filled': self.filled,
+            'average': self.average,
+        }
+
+
+class OrderManager:
+    def __init__(self, exchange, stream: bool = True, ws_url: str = KRAKEN_AUTH_WS_URL, poll_interval: float = 2.0,
+                 max_poll_interval: float = 30.0, idle_timeout: float = 30, max_backoff: float = 30,
+                 early_ttl: float = 5.0):
+        """
+        Parameters:
+            exchange: ccxt client (sync or async) or a stand-in with the same methods.
+            stream (bool): Follow the private executions websocket. Needs an exchange that can
+                issue websocket tokens (Kraken's GetWebSocketsToken), otherwise only polls.
+            ws_url (str): Private websocket endpoint.
+            poll_interval (float): First poll interval in seconds while the stream is down.
+            max_poll_interval (float): Longest poll interval, also how often orders are
+                reconciled by polling while the stream is up.
+            idle_timeout (float): Reconnect when the stream is silent this long.
+            max_backoff (float): Longest wait between stream reconnect attempts.
+            early_ttl (float): Seconds to keep stream events for order ids not tracked yet, in
+                case create_order has not returned. Events for orders placed elsewhere expire.
+        """
+        self.exchange = exchange
+        self.stream = stream and hasattr(exchange, 'privatePostGetWebSocketsToken')
+        self.ws_url = ws_url
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.idle_timeout = idle_timeout
+        self.max_backoff = max_backoff
+        self.early_ttl = early_ttl
+
+        self.orders = {}
+        self.stream_connected = False
+        self.polls = 0
+        self._early = OrderedDict()  # Stream events that arrived before create_order returned, oldest first
+        self._interval = poll_interval
+        self._wakeup = None
+        self._running = False
+        self._ws = None
+        self._loop = None
+
+    async def _call(self, name: str, *args, **kwargs):
+        method = getattr(self.exchange, name)
+        if inspect.iscoroutinefunction(method):
+            return await method(*args, **kwargs)
+        return await asyncio.to_thread(method, *args, **kwargs)
+
+    # Orders
+
+    async def submit(self, symbol: str, type: str, side: str, amount: float, price: Optional[float] = None,
+                     params: Optional[dict] = None) -> TrackedOrder:
+        """Places an order and starts tracking it."""
+        submitted_at = time.monotonic()
+        response = await self._call('create_order', symbol, type, side, amount, price, params or {})
+        order = TrackedOrder(str(response['id']), symbol, side, amount, price, submitted_at)
+        order.acked_at = time.monotonic()
+        self.orders[order.id] = order
+
+        for received_at, data in self._early.pop(order.id, []):
+            self._apply_execution(order, data, received_at)
+        self._apply_rest(order, response, source='rest')
+        self._interval = self.poll_interval
+        return order
+
+    def track(self, response: dict) -> TrackedOrder:
+        """Tracks an order placed elsewhere, from its ccxt order dict."""
+        order = TrackedOrder(str(response['id']), response.get('symbol'), response.get('side'),
+                             response.get('amount'), response.get('price'))
+        self.orders[order.id] = order
+        self._apply_rest(order, response, source='rest')
+        self._interval = self.poll_interval
+        return order
+
+    async def wait(self, order_id: str, timeout: Optional[float] = None, cancel_on_timeout: bool = True) -> dict:
+        """
+        Waits for an order to finish.
+
+        Returns:
+            dict: The order as a ccxt-style dict. After a timeout it is canceled (if
+                  cancel_on_timeout) and returned as it stands, status 'canceled' unless it
+                  filled in the meantime.
+        """
+        order = self.orders[order_id]
+        try:
+            return await asyncio.wait_for(asyncio.shield(order.future), timeout)
+        except asyncio.TimeoutError:
+            if cancel_on_timeout:
+                return await self.cancel(order_id)
+            return order.as_dict()
+
+    async def cancel(self, order_id: str) -> dict:
+        order = self.orders[order_id]
+        if order.status in TERMINAL:
+            return order.as_dict()
+        try:
+            response = await self._call('cancel_order', order_id, order.symbol)
+        except Exception as e:
+            # Most often the order filled or was canceled a moment before, check its state
+            logger.warning(f"Cancel of {order_id} failed, checking its state: {e}")
+            response = await self._call('fetch_order', order_id, order.symbol)
+        if response and response.get('status'):
+            self._apply_rest(order, response, source='rest')
+        else:
+            self._finish(order, 'canceled', 'rest')
+        return order.as_dict()
+
+    def _finish(self, order: TrackedOrder, status: str, source: str):
+        order.status = status
+        if order.done_at is None:
+            order.done_at = time.monotonic()
+            order.done_source = source
+        if not order.future.done():
+            order.future.set_result(order.as_dict())
+
+    def _apply_rest(self, order: TrackedOrder, response: dict, source: str):
+        if response.get('filled') is not None:
+            order.filled = float(response['filled'])
+        if response.get('average') is not None:
+            order.average = float(response['average'])
+        status = response.get('status')
+        if status in TERMINAL:
+            self._finish(order, status, source)
+
+    # Executions stream
+
+    def handle_execution(self, message: dict):
+        """Applies one decoded message from the executions channel."""
+        if message.get('channel') != 'executions':
+            return
+        seen = set()
+        for data in message.get('data', []):
+            order_id = data.get('order_id')
+            seen.add(order_id)
+            order = self.orders.get(order_id)
+            if order is None:
+                self._buffer_early(order_id, data)
+                continue
+            self._apply_execution(order, data)
+
+        if message.get('type') == 'snapshot':
+            # Tracked orders missing from the snapshot of open orders finished while disconnected
+            if any(o.status == 'open' and o.id not in seen for o in self.orders.values()):
+                self._poll_now()
+
+    def _buffer_early(self, order_id: str, data: dict):
+        now = time.monotonic()
+        # Ids still untracked after early_ttl belong to orders placed elsewhere (manually, another process)
+        while self._early and now - next(iter(self._early.values()))[-1][0] > self.early_ttl:
+            self._early.popitem(last=False)
+        self._early.setdefault(order_id, []).append((now, data))
+        self._early.move_to_end(order_id)
+
+    def _apply_execution(self, order: TrackedOrder, data: dict, received_at: Optional[float] = None):
+        received_at = received_at or time.monotonic()
+        if order.acked_at is None or received_at < order.acked_at:
+            order.acked_at = received_at
+        if data.get('cum_qty') is not None:
+            order.filled = float(data['cum_qty'])
+        if data.get('avg_price') is not None:
+            order.average = float(data['avg_price'])
+        status = WS_STATUS.get(data.get('order_status'))
+        if status in TERMINAL:
+            self._finish(order, status, 'stream')
+
+    async def _websocket_token(self) -> str:
+        response = await self._call('privatePostGetWebSocketsToken')
+        return response['result']['token']
+
+    async def _run_stream(self):
+        backoff = 1.0
+        async with aiohttp.ClientSession() as session:
+            while self._running:
+                try:
+                    token = await self._websocket_token()
+                    async with session.ws_connect(self.ws_url, heartbeat=self.idle_timeout / 2) as ws:
+                        self._ws = ws
+                        await ws.send_str(json.dumps({'method': 'subscribe', 'params': {
+                            'channel': 'executions', 'token': token, 'snap_orders': True, 'snap_trades': False}}))
+                        # Polling stays at poll_interval until Kraken acknowledges the subscription
+                        ack_deadline = time.monotonic() + self.idle_timeout
+                        while self._running:
+                            msg = await ws.receive(timeout=self.idle_timeout)
+                            if msg.type != aiohttp.WSMsgType.TEXT:
+                                logger.warning(f"Executions stream closed: {msg.extra or ws.exception()}")
+                                break
+                            message = json.loads(msg.data)
+                            if message.get('method') == 'subscribe':
+                                if not message.get('success'):
+                                    raise RuntimeError(f"Executions subscription rejected: {message.get('error')}")
+                                self.stream_connected = True
+                                backoff = 1.0
+                                logger.info("Executions stream subscribed")
+                            elif not self.stream_connected and time.monotonic() > ack_deadline:
+                                raise RuntimeError("Executions subscription was not acknowledged")
+                            self.handle_execution(message)
+                except Exception as e:
+                    logger.warning(f"Executions stream error: {e}")
+                finally:
+                    self._ws = None
+                    if self.stream_connected:
+                        self.stream_connected = False
+                        self._poll_now()
+
+                if self._running:
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, self.max_backoff)
+
+    # Polling fallback
+
+    async def poll_once(self) -> bool:
+        """One batched poll of every tracked open order, returns whether any of them changed."""
+        open_orders = [order for order in self.orders.values() if order.status == 'open']
+        if not open_orders:
+            return False
+        self.polls += 1
+        changed = False
+        missing = []
+        by_symbol = defaultdict(list)
+        for order in open_orders:
+            by_symbol[order.symbol].append(order)
+
+        for symbol, orders in by_symbol.items():
+            still_open = {str(o['id']): o for o in await self._call('fetch_open_orders', symbol)}
+            for order in orders:
+                if order.id in still_open:
+                    before = order.filled
+                    self._apply_rest(order, still_open[order.id], source='rest')
+                    changed |= order.filled != before
+                else:
+                    missing.append(order)
+
+        # Orders no longer open: look up how they ended
+        if missing:
+            if getattr(self.exchange, 'has', {}).get('fetchOrdersByIds'):
+                responses = await self._call('fetch_orders_by_ids', [order.id for order in missing])
+            else:
+                responses = [await self._call('fetch_order', order.id, order.symbol) for order in missing]
+            for order, response in zip(missing, responses):
+                self._apply_rest(order, response, source='rest')
+            changed = True
+        return changed
+
+    def _poll_now(self):
+        self._interval = self.poll_interval
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run_poll(self):
+        while self._running:
+            interval = self._interval if not self.stream_connected else self.max_poll_interval
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not self._running:
+                break
+
+            try:
+                changed = await self.poll_once()
+            except Exception as e:
+                logger.error(f"Error polling orders: {e}")
+                changed = False
+            self._interval = self.poll_interval if changed else min(self._interval * 2, self.max_poll_interval)
+
+    # Running
+
+    async def run(self):
+        """Follows the executions stream and polls as a fallback until stop() is called."""
+        self._running = True
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        tasks = [asyncio.ensure_future(self._run_poll())]
+        if self.stream:
+            tasks.append(asyncio.ensure_future(self._run_stream()))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def stop(self):
+        self._running = False
+        if self._wakeup is not None:
+            self._wakeup.set()
+        if self._ws is not None:
+            await self._ws.close()
+
+    def start_background(self) -> threading.Thread:
+        """Runs the manager on its own event loop in a daemon thread, for blocking bots."""
+        started = threading.Event()
+
+        def target():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            self._loop = loop
+            loop.call_soon(started.set)
+            loop.run_until_complete(self.run())
+
+        thread = threading.Thread(target=target, name='order-manager', daemon=True)
+        thread.start()
+        started.wait()
+        return thread
+
+    def _run_sync(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def submit_sync(self, symbol: str, type: str, side: str, amount: float, price: Optional[float] = None,
+                    params: Optional[dict] = None) -> TrackedOrder:
+        return self._run_sync(self.submit(symbol, type, side, amount, price, params))
+
+    def wait_sync(self, order_id: str, timeout: Optional[float] = None, cancel_on_timeout: bool = True) -> dict:
+        return self._run_sync(self.wait(order_id, timeout, cancel_on_timeout))
+
+    def stop_sync(self):
+        self._run_sync(self.stop())
+
+    # Reporting
+
+    def latency_frame(self) -> pd.DataFrame:
+        """One row per tracked order with its status and latencies in seconds."""
+        return pd.DataFrame([{
+            'id': order.id,
+            'symbol': order.symbol,
+            'side': order.side,
+            'status': order.status,
+            'submit_to_ack': order.submit_to_ack,
+            'ack_to_fill': order.ack_to_fill,
+            'source': order.done_source,
+        } for order in self.orders.values()], columns=['id', 'symbol', 'side', 'status', 'submit_to_ack',
+                                                       'ack_to_fill', 'source'])
@@ -0,0 +1,217 @@
+import sys
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from batch_optimize import backtesting_stats
+
+'''
+Multi-symbol portfolio backtest for the mean reversion universe.
+
+Every symbol's bars are aligned on one time index as bars x symbols arrays and the
+MeanReversionStrategy rules run on all columns at once: buy when Close is buy_threshold_pct
+below the SMA, sell (go short) when it is sell_threshold_pct above it, each order filling at the
+symbol's next open and first closing that symbol's open trade, like Backtest(...,
+exclusive_orders=True). All symbols draw on one cash balance. Each order targets its symbol's
+weight of current equity in whole units, scaled down when the free equity cannot cover every
+order on that bar, and commission is charged on entry and exit.
+
+A symbol with a single column and weight 1 trades exactly like Backtest.run on that symbol.
+Symbols join the index when their history starts; missing bars are valued at the last close and
+orders wait for the symbol's next bar.
+
+    frames = fetch_universe_sync(symbols, 240)
+    result = backtest_portfolio(frames, symbols_data, sma_period=20)
+'''
+
+
+def align_bars(frames: dict) -> dict:
+    """Outer-joins each symbol's bars on one index, returning bars x symbols DataFrames per column."""
+    symbols = list(frames)
+    return {
+        column: pd.concat([frames[symbol][column].rename(symbol) for symbol in symbols], axis=1).sort_index()
+        for column in ['Open', 'High', 'Low', 'Close']
+    }
+
+
+def sma_panel(frames: dict, index: pd.DatetimeIndex, sma_period: int) -> tuple:
+    """
+    Each symbol's Close SMA over its own bars, aligned on index.
+
+    Returns:
+        tuple: (sma, tradable) bars x symbols arrays, tradable marks the bars Strategy.next
+               would run on for that symbol (after the SMA warm-up, like Backtest.run).
+    """
+    sma = np.full((len(index), len(frames)), np.nan)
+    tradable = np.zeros((len(index), len(frames)), dtype=bool)
+    for column, symbol in enumerate(frames):
+        close = frames[symbol]['Close'].astype('float64')
+        rows = index.get_indexer(close.index)
+        sma[rows, column] = close.rolling(sma_period).mean().to_numpy()
+        tradable[rows[sma_period:], column] = True
+    return sma, tradable
+
+
+def simulate_portfolio(open_: np.ndarray, close: np.ndarray, signals: np.ndarray, weights: np.ndarray,
+                       cash: float = 10_000, commission: float = 0.0025,
+                       size: float = 1 - sys.float_info.epsilon) -> dict:
+    """
+    Steps every symbol through the bars together with one shared cash balance.
+
+    Parameters:
+        open_, close (np.ndarray): Bar prices, shape (bars, symbols), NaN where a symbol has no bar.
+        signals (np.ndarray): +1/-1/0 orders placed at each bar's close, shape (bars, symbols).
+        weights (np.ndarray): Fraction of equity each symbol's order targets, shape (symbols,).
+        cash (float): Starting cash.
+        commission (float): Relative commission per fill.
+        size (float): Scales every order, backtesting.py's default is all of the target.
+
+    Returns:
+        dict: 'equity' (bars,), 'pnl' (bars, symbols) cumulative profit per symbol after
+              commissions, 'trades' (symbols,) closed trade counts.
+    """
+    bars, symbols = signals.shape
+    units = np.zeros(symbols)
+    entry = np.zeros(symbols)
+    realized = np.zeros(symbols)
+    pending = np.zeros(symbols, dtype='int8')
+    trades = np.zeros(symbols, dtype='int64')
+    last_close = np.full(symbols, np.nan)
+    equity = np.full(bars, float(cash))
+    pnl = np.zeros((bars, symbols))
+    alive = True
+
+    for i in range(bars):
+        price = open_[i]
+        fill = (pending != 0) & ~np.isnan(price)
+        if alive and fill.any():
+            # Every new order closes that symbol's open trade first
+            closing = fill & (units != 0)
+            realized[closing] += units[closing] * (price[closing] - entry[closing]) \
+                - np.abs(units[closing]) * price[closing] * commission
+            trades[closing] += 1
+            units[fill] = 0
+
+            marked = np.where(np.isnan(last_close), entry, last_close)
+            current = cash + realized.sum() + (units * (marked - entry)).sum()
+            free = current - (np.abs(units) * entry).sum()
+
+            # Whole units from each symbol's share of equity, scaled down to the free equity
+            budget = np.where(fill, current * weights * size, 0)
+            if budget.sum() > free:
+                budget *= max(free, 0) / budget.sum()
+            new_units = np.floor(budget[fill] / (price[fill] * (1 + commission)))
+            units[fill] = pending[fill] * new_units
+            entry[fill] = price[fill]
+            realized[fill] -= new_units * price[fill] * commission
+            pending[fill] = 0
+
+        last_close = np.where(np.isnan(close[i]), last_close, close[i])
+        marked = np.where(np.isnan(last_close), entry, last_close)
+        pnl[i] = realized + units * (marked - entry)
+        equity[i] = cash + pnl[i].sum()
+
+        # Out of money, backtesting.py stops trading and holds equity at 0
+        if alive and equity[i] <= 0:
+            alive = False
+            units[:] = 0
+            pending[:] = 0
+        if not alive:
+            pnl[i:] = pnl[i]
+            equity[i:] = 0
+            break
+
+        # Orders placed on this bar's close, symbols without a bar keep their pending order
+        placed = ~np.isnan(close[i])
+        pending[placed] = signals[i, placed]
+
+    return {'equity': equity, 'pnl': pnl, 'trades': trades}
+
+
+def backtest_portfolio(frames: dict, symbols_data: dict, sma_period: int = 20, weights: Optional[dict] = None,
+                       cash: float = 10_000, commission: float = 0.0025,
+                       default_thresholds: Optional[dict] = None) -> dict:
+    """
+    Backtests MeanReversionStrategy on every symbol at once with shared cash.
+
+    Parameters:
+        frames (dict): Symbol -> OHLCV DataFrame indexed by datetime, e.g. from fetch_universe_sync.
+        symbols_data (dict): Symbol -> {'buy_threshold_pct', 'sell_threshold_pct'}, as in meanrevback.
+        sma_period (int): SMA window for every symbol.
+        weights (dict, optional): Symbol -> fraction of equity per order, defaults to equal weights.
+        cash (float): Starting cash.
+        commission (float): Relative commission per fill.
+        default_thresholds (dict, optional): Thresholds for symbols missing from symbols_data,
+            defaults to MeanReversionStrategy's class defaults.
+
+    Returns:
+        dict: 'equity' portfolio equity Series, 'pnl' DataFrame of cumulative profit per symbol,
+              'attribution' DataFrame of each symbol's profit, share and trades,
+              'stats' Series of portfolio stats in backtesting.py's format.
+    """
+    from meanrevback import MeanReversionStrategy
+
+    if default_thresholds is None:
+        default_thresholds = {'buy_threshold_pct': MeanReversionStrategy.buy_threshold_pct,
+                              'sell_threshold_pct': MeanReversionStrategy.sell_threshold_pct}
+    symbols = list(frames)
+    panel = align_bars(frames)
+    index = pd.DatetimeIndex(panel['Close'].index)
+    open_ = panel['Open'].to_numpy(dtype='float64')
+    close = panel['Close'].to_numpy(dtype='float64')
+
+    thresholds = [symbols_data.get(symbol, default_thresholds) for symbol in symbols]
+    buy_pct = np.array([t['buy_threshold_pct'] for t in thresholds], dtype='float64')
+    sell_pct = np.array([t['sell_threshold_pct'] for t in thresholds], dtype='float64')
+    if weights is None:
+        weight = np.full(len(symbols), 1 / len(symbols))
+    else:
+        weight = np.array([weights.get(symbol, 0) for symbol in symbols], dtype='float64')
+
+    sma, tradable = sma_panel(frames, index, sma_period)
+    with np.errstate(invalid='ignore'):
+        buy = close < sma * (1 - buy_pct / 100)
+        sell = ~buy & (close > sma * (1 + sell_pct / 100))
+    signals = np.where(tradable, buy.astype('int8') - sell.astype('int8'), 0).astype('int8')
+
+    result = simulate_portfolio(open_, close, signals, weight, cash=cash, commission=commission)
+
+    equity = pd.Series(result['equity'], index=index, name='Equity')
+    pnl = pd.DataFrame(result['pnl'], index=index, columns=symbols)
+    final = pnl.iloc[-1]
+    total = final.sum()
+    allocated = cash * weight
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # A symbol with weight 0 has no allocation to return on
+        return_on_weight = np.where(allocated > 0, final.to_numpy() / allocated * 100, np.nan)
+    attribution = pd.DataFrame({
+        'Profit [$]': final,
+        'Share of Profit [%]': final / total * 100 if total else np.nan,
+        'Return on Weight [%]': return_on_weight,
+        '# Trades': result['trades'],
+        'Buy Threshold [%]': buy_pct,
+        'Sell Threshold [%]': sell_pct,
+    }, index=symbols)
+
+    stats = backtesting_stats(result['equity'][None, :], index).iloc[0].astype(object)  # Mixed types, like Backtest.run
+    stats['# Trades'] = int(result['trades'].sum())
+    return {'equity': equity, 'pnl': pnl, 'attribution': attribution, 'stats': stats}
+
+
+if __name__ == '__main__':
+    from async_fetch import fetch_universe_sync
+    from meanrevback import symbols_data, sma_period
+
+    universe = ['WIF/USD', 'POPCAT/USD', 'SOL/USD', 'TON/USD', 'PEPE/USD', 'CRO/USD',
+                'TAO/USD', 'KAS/USD', 'TIA/USD', 'BONK/USD', 'FLOKI/USD']
+    interval = 240  # 4-hour interval
+
+    print("Fetching OHLCV data from Kraken...")
+    frames = fetch_universe_sync(universe, interval)
+    result = backtest_portfolio(frames, symbols_data, sma_period=sma_period)
+
+    print("\nPortfolio Results:")
+    print(result['stats'])
+    print("\nPer-Symbol Attribution:")
+    print(result['attribution'])
@@ -0,0 +1,181 @@
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from backtesting import Backtest
+
+'''
+Per-bar profiling for backtesting.Strategy subclasses.
+
+profiled(Strategy) returns a subclass that times init and every next call, keyed by the bar
+index the call ran on. cost_growth fits per-bar time as a fixed cost plus a cost per bar of
+history. A strategy doing constant work per bar fits a flat line; one that reprocesses its
+whole history every bar (a quadratic backtest, like SMAStrategy rebuilding its rolling means in
+next) gets slower bar by bar. profile_strategy runs one backtest and flags a strategy when the
+fitted slope is both significant (min_t standard errors above zero) and large in absolute
+terms (min_us_per_1000_bars). A growth ratio is reported too but not used for the flag: a fixed
+cost of a few hundred microseconds per bar plus timer noise swing it too much between runs.
+SMAStrategy adds about 40 us per bar for every 1000 bars of history, strategies that use
+self.I well under 1.
+
+    report = profile_strategy(SMAStrategy, data, cash=1_000_000, commission=.002)
+    print(format_report(report))
+'''
+
+
+class StrategyProfile:
+    """Timings collected by a profiled strategy instance."""
+
+    def __init__(self):
+        self.init_seconds = 0.0
+        self.bars = []
+        self.next_seconds = []
+
+
+def profiled(strategy):
+    """Subclass of strategy that records init and per-bar next timings in self._profile."""
+
+    def init(self):
+        self._profile = StrategyProfile()
+        started = time.perf_counter()
+        strategy.init(self)
+        self._profile.init_seconds = time.perf_counter() - started
+
+    def next(self):
+        started = time.perf_counter()
+        strategy.next(self)
+        self._profile.next_seconds.append(time.perf_counter() - started)
+        self._profile.bars.append(len(self.data))
+
+    return type(f"Profiled{strategy.__name__}", (strategy,), {
+        'init': init,
+        'next': next,
+        '__module__': strategy.__module__,
+    })
+
+
+def cost_growth(bars, seconds, bins: int = 20) -> tuple:
+    """
+    Least-squares fit of per-bar time = fixed + slope * bar index.
+
+    Calls are grouped into bins of equal count and the median of each bin is fitted, so GC
+    pauses and the odd slow bar do not move the fit.
+
+    Returns:
+        tuple: (fixed seconds, seconds added per bar of history, standard error of that
+               slope from the residuals of the binned medians), NaN with too few calls.
+    """
+    bars = np.asarray(bars, dtype='float64')
+    seconds = np.asarray(seconds, dtype='float64')
+    if len(bars) < bins * 5:
+        return float('nan'), float('nan'), float('nan')
+    groups = np.array_split(np.argsort(bars, kind='stable'), bins)
+    x = np.array([np.median(bars[group]) for group in groups])
+    y = np.array([np.median(seconds[group]) for group in groups])
+    slope, fixed = np.polyfit(x, y, 1)
+    residuals = y - (fixed + slope * x)
+    spread = np.sum((x - x.mean()) ** 2)
+    stderr = np.sqrt(np.sum(residuals ** 2) / (bins - 2) / spread) if spread > 0 else float('nan')
+    return float(fixed), float(slope), float(stderr)
+
+
+def profile_strategy(strategy, data: pd.DataFrame, params: Optional[dict] = None, min_t: float = 5.0,
+                     min_us_per_1000_bars: float = 2.0, **backtest_kwargs) -> dict:
+    """
+    Backtests a profiled copy of strategy once and summarizes where the time went.
+
+    Parameters:
+        strategy (type): backtesting.Strategy subclass.
+        data (pd.DataFrame): OHLCV bars indexed by datetime.
+        params (dict, optional): Strategy parameters for Backtest.run.
+        min_t (float): Flag the strategy when the fitted slope is more than this many standard
+            errors above zero...
+        min_us_per_1000_bars (float): ...and adds at least this many microseconds per bar for
+            every 1000 bars of history, so a tiny but steady slope is not flagged.
+        **backtest_kwargs: Keyword arguments for Backtest (cash, commission, ...).
+
+    Returns:
+        dict: Timing summary, including the fitted 'us_per_1000_bars', its 'slope_t' and 'flagged'.
+    """
+    started = time.perf_counter()
+    stats = Backtest(data, profiled(strategy), **backtest_kwargs).run(**(params or {}))
+    total = time.perf_counter() - started
+
+    profile = stats['_strategy']._profile
+    seconds = np.asarray(profile.next_seconds)
+    bars = np.asarray(profile.bars)
+    fixed, slope, stderr = cost_growth(bars, seconds)
+    growth = float('nan')
+    if len(bars) and fixed + slope * bars[0] > 0:
+        growth = (fixed + slope * bars[-1]) / (fixed + slope * bars[0])
+    slope_t = slope / stderr if stderr > 0 else float('nan')
+
+    # Measured per-bar cost over the first and last tenth of the calls
+    tenth = max(1, len(seconds) // 10)
+    early = float(np.median(seconds[:tenth])) if len(seconds) else float('nan')
+    late = float(np.median(seconds[-tenth:])) if len(seconds) else float('nan')
+
+    return {
+        'strategy': strategy.__name__,
+        'bars': len(data),
+        'total_seconds': total,
+        'init_seconds': profile.init_seconds,
+        'next_seconds': float(seconds.sum()),
+        'next_calls': len(seconds),
+        'next_mean_us': float(seconds.mean() * 1e6) if len(seconds) else float('nan'),
+        'early_bar_us': early * 1e6,
+        'late_bar_us': late * 1e6,
+        'us_per_1000_bars': slope * 1e9,
+        'slope_t': slope_t,
+        'growth': growth,
+        'flagged': bool(slope_t > min_t and slope * 1e9 > min_us_per_1000_bars),
+        'timeline': pd.Series(seconds, index=bars, name='next_seconds'),
+    }
+
+
+def format_report(report: dict) -> str:
+    other = report['total_seconds'] - report['init_seconds'] - report['next_seconds']
+    lines = [
+        f"{report['strategy']} on {report['bars']} bars: {report['total_seconds']:.3f}s total",
+        f"  init: {report['init_seconds']:.4f}s",
+        f"  next: {report['next_seconds']:.4f}s over {report['next_calls']} calls, "
+        f"{report['next_mean_us']:.1f} us/bar",
+        f"  backtesting.py overhead: {other:.4f}s",
+        f"  per-bar cost: {report['early_bar_us']:.1f} us early, {report['late_bar_us']:.1f} us late, "
+        f"+{report['us_per_1000_bars']:.1f} us per 1000 bars of history (t={report['slope_t']:.1f}, "
+        f"{report['growth']:.2f}x over the run)",
+    ]
+    if report['flagged']:
+        lines.append("  WARNING: per-bar cost grows with history length, next() likely reprocesses "
+                     "the whole history every bar (move the work into init with self.I)")
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    import os
+    import sys
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ETHUSD'))
+    from ohlcv_loader import load_ohlcv
+    from smaopt import SMAStrategy
+    from meanrevback import MeanReversionStrategy
+    from highlowbreakopt import HighLowBreakLongOnly
+
+    data = load_ohlcv(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Data', 'XBTUSDT_60.csv'))
+    # Long enough that SMAStrategy's growth is well clear of its fixed cost per bar
+    data = data[['Open', 'High', 'Low', 'Close', 'Volume']].iloc[-10000:]
+
+    expected = {SMAStrategy: True, MeanReversionStrategy: False, HighLowBreakLongOnly: False}
+    wrong = []
+    for strategy, flag in expected.items():
+        for _ in range(3):
+            report = profile_strategy(strategy, data, cash=1_000_000, commission=.002)
+            if report['flagged'] != flag:
+                wrong.append(strategy.__name__)
+        print(format_report(report))
+        print()
+
+    # SMAStrategy must be flagged on every run and the others on none
+    if wrong:
+        print(f"Unexpected flag results: {', '.join(sorted(set(wrong)))}")
+        sys.exit(1)
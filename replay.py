@@ -0,0 +1,167 @@
+import itertools
+import logging
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+'''
+Local stand-in for a ccxt exchange that replays stored bars.
+
+ReplayExchange answers the ccxt calls the live bots make (fetch_ohlcv, fetch_balance,
+create_order, fetch_order, fetch_open_orders, cancel_order, public_get_time) from an OHLCV DataFrame, using a
+clock.SimulatedClock for "now". fetch_ohlcv returns the bars that started at or before the
+clock time, so the last row is the still-forming candle, like Kraken's. With 4h bars only
+its final values are known, so a bot woken a minute before the close sees the close a minute
+early.
+
+A limit order that is marketable against the last price fills at its limit price straight
+away. Otherwise it fills once a later bar, started before the current clock time, trades
+through its price. Every fill is recorded in ReplayExchange.fills, which diff_entries lines
+up against a backtest's trades.
+'''
+
+
+class ReplayExchange:
+    def __init__(self, bars: pd.DataFrame, clock, symbol: str = 'ETH/USD', balance: Optional[dict] = None,
+                 fee_rate: float = 0.0025):
+        bars = bars.rename(columns=str.lower)
+        self.clock = clock
+        self.symbol = symbol
+        self.fee_rate = fee_rate
+        self.times = pd.DatetimeIndex(bars.index).as_unit('ns').asi8
+        self.ohlcv = bars[['open', 'high', 'low', 'close', 'volume']].to_numpy(dtype='float64')
+        self.rows = np.column_stack([self.times // 1_000_000, self.ohlcv]).tolist()
+
+        base, quote = symbol.split('/')
+        self.base, self.quote = base, quote
+        self.balance = {quote: 10_000.0, base: 0.0, **(balance or {})}
+        self.orders = {}
+        self.fills = []
+        self._ids = itertools.count(1)
+
+    def _now_ns(self) -> int:
+        return int(self.clock.time() * 1_000_000_000)
+
+    def _current_bar(self) -> int:
+        """Position of the bar forming at the clock time, -1 before the first bar."""
+        return int(np.searchsorted(self.times, self._now_ns(), side='right')) - 1
+
+    def public_get_time(self) -> dict:
+        return {'error': [], 'result': {'unixtime': int(self.clock.time())}}
+
+    def fetch_ohlcv(self, symbol: str, timeframe: str = '1m', since: Optional[int] = None,
+                    limit: Optional[int] = None) -> list:
+        stop = self._current_bar() + 1
+        start = 0
+        if since is not None:
+            start = int(np.searchsorted(self.times, since * 1_000_000, side='left'))
+        if limit is not None:
+            start = max(start, stop - limit)
+        return self.rows[start:stop]
+
+    def fetch_balance(self) -> dict:
+        return {'free': dict(self.balance), 'total': dict(self.balance)}
+
+    def create_order(self, symbol: str, type: str, side: str, amount: float, price: Optional[float] = None,
+                     params: Optional[dict] = None) -> dict:
+        bar = self._current_bar()
+        order = {
+            'id': str(next(self._ids)),
+            'symbol': symbol,
+            'type': type,
+            'side': side,
+            'amount': amount,
+            'price': price,
+            'status': 'open',
+            'timestamp': self._now_ns() // 1_000_000,
+            'bar': bar,
+            'filled': 0.0,
+        }
+        self.orders[order['id']] = order
+
+        last = self.ohlcv[bar, 3]
+        if type == 'market' or (side == 'buy' and price >= last) or (side == 'sell' and price <= last):
+            self._fill(order, last if type == 'market' else price)
+        return dict(order)
+
+    def _fill(self, order: dict, price: float):
+        cost = order['amount'] * price
+        fee = cost * self.fee_rate
+        sign = 1 if order['side'] == 'buy' else -1
+        self.balance[self.base] += sign * order['amount']
+        self.balance[self.quote] -= sign * cost + fee
+        order.update(status='closed', filled=order['amount'], average=price)
+        self.fills.append({
+            'datetime': pd.Timestamp(self._now_ns()),
+            'bar_time': pd.Timestamp(self.times[self._current_bar()]),
+            'side': order['side'],
+            'price': price,
+            'amount': order['amount'],
+            'fee': fee,
+            'order_id': order['id'],
+        })
+
+    def fetch_order(self, id: str, symbol: Optional[str] = None) -> dict:
+        order = self.orders[id]
+        if order['status'] == 'open':
+            # Later bars that have started by now and traded through the limit price
+            later = slice(order['bar'] + 1, self._current_bar() + 1)
+            if order['side'] == 'buy':
+                touched = self.ohlcv[later, 2] <= order['price']
+            else:
+                touched = self.ohlcv[later, 1] >= order['price']
+            if touched.any():
+                self._fill(order, order['price'])
+        return dict(order)
+
+    def fetch_open_orders(self, symbol: Optional[str] = None, since: Optional[int] = None,
+                          limit: Optional[int] = None, params: Optional[dict] = None) -> list:
+        open_orders = []
+        for id, order in list(self.orders.items()):
+            if order['status'] == 'open' and (symbol is None or order['symbol'] == symbol):
+                order = self.fetch_order(id)
+                if order['status'] == 'open':
+                    open_orders.append(order)
+        return open_orders
+
+    def cancel_order(self, id: str, symbol: Optional[str] = None) -> dict:
+        order = self.orders[id]
+        if order['status'] == 'open':
+            order['status'] = 'canceled'
+        return dict(order)
+
+    def fills_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.fills, columns=['datetime', 'bar_time', 'side', 'price', 'amount', 'fee', 'order_id'])
+
+
+def diff_entries(fills: pd.DataFrame, trades: pd.DataFrame, bar_duration: pd.Timedelta) -> pd.DataFrame:
+    """
+    Lines up live-bot entries with backtest entries by the bar whose close triggered them.
+
+    The live bot buys at the signal bar's close, backtesting.py fills at the next bar's open,
+    so a backtest trade's signal bar is its EntryTime minus one bar.
+
+    Parameters:
+        fills (pd.DataFrame): ReplayExchange.fills_frame(), only buys are compared.
+        trades (pd.DataFrame): stats['_trades'] from Backtest.run.
+        bar_duration (pd.Timedelta): Length of one bar.
+
+    Returns:
+        pd.DataFrame: One row per signal bar with both prices and a Status of 'both',
+                      'replay only' or 'backtest only'.
+    """
+    replay = fills[fills['side'] == 'buy'].groupby('bar_time')['price'].first().rename('Replay Price')
+    backtest = trades.assign(signal=pd.DatetimeIndex(trades['EntryTime']) - bar_duration) \
+        .groupby('signal')['EntryPrice'].first().rename('Backtest Price')
+
+    diff = pd.concat([replay, backtest], axis=1).sort_index()
+    diff.index.name = 'Signal Bar'
+    diff['Status'] = np.select(
+        [diff['Replay Price'].notna() & diff['Backtest Price'].notna(), diff['Replay Price'].notna()],
+        ['both', 'replay only'],
+        'backtest only'
+    )
+    return diff
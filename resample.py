@@ -0,0 +1,93 @@
+import pandas as pd
+
+from ohlcv_store import OHLCVStore
+
+'''
+Builds higher timeframes from the finest bars in the OHLCVStore.
+
+Derived bars are cached as their own store partition (e.g. XBTUSDT/240_from_1) and only
+complete buckets are written, so each refresh reads the base bars after the last cached
+bucket and appends the newly completed ones. Timeframes are labelled in minutes like the
+Kraken CSVs ('30', '60', '240', '1440') and buckets are aligned to the epoch, which matches
+Kraken's 4h and daily candles.
+'''
+
+AGGREGATION = {
+    'Open': 'first',
+    'High': 'max',
+    'Low': 'min',
+    'Close': 'last',
+    'Volume': 'sum',
+    'Trades': 'sum',
+}
+
+
+def derived_timeframe(timeframe: str, base_timeframe: str) -> str:
+    """Store partition label for bars resampled from a base timeframe."""
+    return f"{timeframe}_from_{base_timeframe}"
+
+
+def resample_bars(bars: pd.DataFrame, timeframe: str) -> pd.DataFrame:
+    """
+    Aggregates bars into a higher timeframe.
+
+    Parameters:
+        bars (pd.DataFrame): Bars indexed by datetime with Open, High, Low, Close, Volume
+            and optionally Trades columns.
+        timeframe (str): Target timeframe in minutes (e.g., "240").
+
+    Returns:
+        pd.DataFrame: One row per bucket that contains at least one base bar, indexed by bucket start.
+    """
+    aggregation = {name: how for name, how in AGGREGATION.items() if name in bars.columns}
+    resampled = bars.resample(f"{int(timeframe)}min", origin='epoch', label='left', closed='left').agg(aggregation)
+
+    # Buckets with no base bars come back as NaN rows, Kraken simply omits those candles
+    resampled = resampled.dropna(subset=['Open'])
+    if 'Trades' in resampled.columns:
+        resampled['Trades'] = resampled['Trades'].astype('int64')
+    return resampled
+
+
+def update_resampled(store: OHLCVStore, symbol: str, base_timeframe: str, timeframe: str) -> int:
+    """
+    Appends every newly completed bucket of a derived timeframe to its cache partition.
+
+    A bucket is complete once the base bars reach its last base interval, so the forming
+    bucket is never frozen into the append-only cache.
+
+    Returns:
+        int: Number of derived bars appended.
+    """
+    if int(timeframe) % int(base_timeframe) != 0:
+        raise ValueError(f"Timeframe {timeframe} is not a multiple of base timeframe {base_timeframe}")
+
+    label = derived_timeframe(timeframe, base_timeframe)
+    bucket = pd.Timedelta(minutes=int(timeframe))
+    base_step = pd.Timedelta(minutes=int(base_timeframe))
+
+    last_bucket = store.last_timestamp(symbol, label)
+    last_base = store.last_timestamp(symbol, base_timeframe)
+    if last_base is None:
+        return 0
+
+    # Only read the base bars that fall after the last cached bucket
+    start = None if last_bucket is None else last_bucket + bucket
+    base = store.read(symbol, base_timeframe, start=start)
+    if base.empty:
+        return 0
+
+    resampled = resample_bars(base, timeframe)
+    complete = resampled.index + bucket - base_step <= last_base
+    return store.append(symbol, label, resampled[complete])
+
+
+def load_resampled(store: OHLCVStore, symbol: str, base_timeframe: str, timeframe: str, start=None, end=None) -> pd.DataFrame:
+    """Refreshes the cached derived timeframe and reads a date range from it."""
+    update_resampled(store, symbol, base_timeframe, timeframe)
+    return store.read(symbol, derived_timeframe(timeframe, base_timeframe), start, end)
+
+
+def update_all(store: OHLCVStore, symbol: str, base_timeframe: str, timeframes) -> dict:
+    """Refreshes several derived timeframes from one base partition, returning bars appended per timeframe."""
+    return {timeframe: update_resampled(store, symbol, base_timeframe, timeframe) for timeframe in timeframes}
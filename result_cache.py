@@ -0,0 +1,89 @@
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from indicator_cache import fingerprint
+
+'''
+Persistent backtest result cache.
+
+Each finished Backtest.run is stored in SQLite under a key made of the strategy class source,
+the parameter values, the Backtest keyword arguments (cash, commission, ...) and a fingerprint
+of the exact bars. Re-running an optimization skips every combination already stored, so an
+interrupted run resumes where it stopped and a widened parameter range only runs the new points.
+Editing the strategy or changing the data changes the key, so stale results are never reused.
+'''
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Data', 'results_cache.sqlite')
+
+
+def strategy_hash(strategy) -> str:
+    """Hash of the source of the strategy class and every parent class up to backtesting.Strategy."""
+    digest = hashlib.blake2b(digest_size=16)
+    for cls in strategy.__mro__:
+        if cls.__module__.startswith('backtesting') or cls is object:
+            break
+        try:
+            digest.update(inspect.getsource(cls).encode())
+        except (OSError, TypeError):
+            digest.update(cls.__qualname__.encode())
+    return digest.hexdigest()
+
+
+def data_fingerprint(data: pd.DataFrame) -> str:
+    columns = [data[name].to_numpy(dtype='float64') for name in ['Open', 'High', 'Low', 'Close', 'Volume'] if name in data]
+    return fingerprint(pd.DatetimeIndex(data.index).as_unit('ns').asi8, *columns)
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def params_key(params: dict) -> str:
+    return json.dumps(params, sort_keys=True, default=_json_default)
+
+
+class ResultCache:
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                run_key TEXT NOT NULL,
+                params TEXT NOT NULL,
+                stats BLOB NOT NULL,
+                PRIMARY KEY (run_key, params)
+            )
+        """)
+        self.connection.commit()
+
+    def run_key(self, strategy, data: pd.DataFrame, backtest_kwargs: dict) -> str:
+        """Key for one strategy version, dataset and Backtest configuration."""
+        kwargs = json.dumps(backtest_kwargs or {}, sort_keys=True, default=_json_default)
+        return f"{strategy.__qualname__}:{strategy_hash(strategy)}:{data_fingerprint(data)}:{kwargs}"
+
+    def get_many(self, run_key: str, grid: list) -> dict:
+        """Stored stats for the parameter dicts in grid, keyed by params_key."""
+        wanted = {params_key(params) for params in grid}
+        rows = self.connection.execute("SELECT params, stats FROM results WHERE run_key = ?", (run_key,))
+        return {key: pickle.loads(stats) for key, stats in rows if key in wanted}
+
+    def put(self, run_key: str, params: dict, stats: dict):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO results (run_key, params, stats) VALUES (?, ?, ?)",
+            (run_key, params_key(params), pickle.dumps(stats, protocol=pickle.HIGHEST_PROTOCOL))
+        )
+        # Commit every result so an interrupted optimization keeps everything finished so far
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
@@ -3,31 +3,37 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import ccxt
 import time
-import dontshare as d
 import logging
 from datetime import datetime
+from runtime import Strategy
 
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('positions.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
-# Initialize Kraken exchange with rate limiting enabled
-kraken = ccxt.kraken({
-    'apiKey': d.kraken_api_key,
-    'secret': d.kraken_secret_key,
-    'enableRateLimit': True,
-})
 
+def setup_logging():
+    # Only when run as a script, under the runtime its setup_logging applies
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('positions.log'),
+            logging.StreamHandler()
+        ]
+    )
 
-def print_account_balance():
+
+def kraken_exchange():
+    import dontshare as d  # API keys, only needed when run as a script
+    # Initialize Kraken exchange with rate limiting enabled
+    return ccxt.kraken({
+        'apiKey': d.kraken_api_key,
+        'secret': d.kraken_secret_key,
+        'enableRateLimit': True,
+    })
+
+
+def print_account_balance(kraken):
     try:
         
         logger.info("Attempting to fetch balance...")
@@ -46,7 +52,7 @@ def print_account_balance():
         logger.error(f"Error fetching balance: {str(e)}")
         logger.error(f"Error type: {type(e)}")  # Log the error type
 
-def print_open_positions():
+def print_open_positions(kraken):
     try:
         positions = kraken.fetch_positions()
         if positions:
@@ -63,7 +69,8 @@ def print_open_positions():
     except Exception as e:
         logger.error(f"Error fetching positions: {str(e)}")
 
-def risk_manager():
+def risk_manager(kraken=None):
+    kraken = kraken or kraken_exchange()
     logger.info("Risk manager started")
     
     while True:
@@ -84,9 +91,9 @@ def risk_manager():
             logger.info(f"\nChecking account status at {current_time}...")
             
             time.sleep(2)  # Add small delay between API calls
-            print_account_balance()
+            print_account_balance(kraken)
             time.sleep(2)  # Add small delay between API calls
-            print_open_positions()
+            print_open_positions(kraken)
             
             logger.info("Next update in 15 minutes...")
             time.sleep(900)  # Sleep for 900 seconds (15 minutes)
@@ -95,11 +102,40 @@ def risk_manager():
             logger.error(f"Error in risk manager: {str(e)}")
             time.sleep(60)  # Wait a minute before retrying
 
+class PositionMonitor(Strategy):
+    """risk_manager's 15 minute balance and position report as a runtime.Strategy."""
+
+    timer = 900
+
+    async def start(self):
+        await self.on_timer()
+
+    async def on_timer(self):
+        self.logger.info(f"Checking account status at {datetime.now()}...")
+        try:
+            balance = await self.exchange.fetch_balance({'type': 'spot'})
+            self.logger.info(f"USD Balance: {balance['total'].get('USD', 0)}")
+        except ccxt.BaseError as e:
+            self.logger.error(f"Error fetching balance: {str(e)}")
+
+        try:
+            positions = await self.exchange.fetch_positions()
+            if positions:
+                self.logger.info("Open Positions:")
+                for position in positions:
+                    self.logger.info(f"Symbol: {position['symbol']}, Amount: {position['amount']}, Side: {position['side']}")
+            else:
+                self.logger.info("No open positions.")
+        except ccxt.BaseError as e:
+            self.logger.error(f"Error fetching positions: {str(e)}")
+
 if __name__ == "__main__":
+    setup_logging()
     try:
         # Test API connection first
+        kraken = kraken_exchange()
         kraken.fetch_balance()
         logger.info("API connection successful")
-        risk_manager()
+        risk_manager(kraken)
     except Exception as e:
         logger.error(f"Failed to start risk manager: {str(e)}")
\ No newline at end of file
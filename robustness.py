@@ -0,0 +1,174 @@
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from metrics import bar_returns, max_drawdown, sharpe_ratio
+
+'''
+Bootstrap / Monte Carlo robustness checks for a trade log or return series.
+
+A backtest is one ordering of one sample of trades. Here thousands of alternative paths are
+generated at once as a paths x steps matrix and reduced to a distribution of final balance,
+max drawdown and Sharpe:
+
+    shuffle    the same trades in random order (final balance is unchanged, drawdown is not)
+    bootstrap  trades drawn with replacement
+    block      runs of consecutive trades/returns drawn with replacement, keeping streaks
+    noise      every trade/return perturbed by Gaussian noise scaled to its spread
+
+Values are dollar P&L per trade (fixed-size trades, like volbreak) or fractional returns with
+compounding=True (like a bar return series or backtesting's ReturnPct). Paths are processed in
+chunks so memory stays bounded for long return series.
+
+    samples = monte_carlo(trade_pnl(trade_log, fee_rate=0.0025), initial_balance=1000, seed=1)
+    print(summarize(samples))
+'''
+
+METHODS = ('shuffle', 'bootstrap', 'block', 'noise')
+
+
+def trade_pnl(trade_log: pd.DataFrame, fee_rate: float = 0.0) -> np.ndarray:
+    """
+    Dollar P&L per round trip, in order.
+
+    Accepts a volbreak trade log (alternating 'buy'/'sell' rows with price and amount, fees
+    charged on both fills at fee_rate) or backtesting.py's stats['_trades'] (its PnL column).
+    """
+    if trade_log is None or len(trade_log) == 0:
+        return np.empty(0)
+    if 'PnL' in trade_log:
+        return trade_log['PnL'].to_numpy(dtype='float64')
+
+    buys = trade_log[trade_log['type'] == 'buy']
+    sells = trade_log[trade_log['type'] == 'sell']
+    count = len(sells)
+    amount = sells['amount'].to_numpy(dtype='float64')
+    buy_price = buys['price'].to_numpy(dtype='float64')[:count]
+    sell_price = sells['price'].to_numpy(dtype='float64')
+    return amount * (sell_price * (1 - fee_rate) - buy_price * (1 + fee_rate))
+
+
+def resample_paths(values: np.ndarray, n_paths: int, method: str, rng: np.random.Generator,
+                   block: int = 10, noise: float = 0.5) -> np.ndarray:
+    """
+    Alternative sequences of values, shape (n_paths, len(values)).
+
+    Parameters:
+        values (np.ndarray): Per-trade P&L or per-period returns.
+        n_paths (int): Number of paths.
+        method (str): 'shuffle', 'bootstrap', 'block' or 'noise'.
+        rng (np.random.Generator): Random source.
+        block (int): Block length for 'block'.
+        noise (float): Noise standard deviation for 'noise', as a fraction of the values' std.
+    """
+    n = len(values)
+    if method == 'shuffle':
+        return rng.permuted(np.broadcast_to(values, (n_paths, n)), axis=1)
+    if method == 'bootstrap':
+        return values[rng.integers(0, n, size=(n_paths, n))]
+    if method == 'block':
+        block = max(1, min(block, n))
+        blocks = -(-n // block)
+        starts = rng.integers(0, n - block + 1, size=(n_paths, blocks, 1))
+        index = (starts + np.arange(block)).reshape(n_paths, blocks * block)[:, :n]
+        return values[index]
+    if method == 'noise':
+        return values + rng.normal(0.0, noise * values.std(), size=(n_paths, n))
+    raise ValueError(f"Unknown resampling method: {method}")
+
+
+def path_metrics(paths: np.ndarray, initial_balance: float, compounding: bool = False,
+                 periods_per_year: Optional[float] = None) -> dict:
+    """
+    Final balance, max drawdown [%] and Sharpe for every path.
+
+    Sharpe is metrics.sharpe_ratio of each step's return on the equity before it, annualized
+    with sqrt(periods_per_year) when given.
+    """
+    if compounding:
+        equity = initial_balance * np.cumprod(1 + paths, axis=1)
+    else:
+        equity = initial_balance + np.cumsum(paths, axis=1)
+    equity = np.hstack([np.full((len(paths), 1), float(initial_balance)), equity])
+
+    # Returns on the equity before each step, for compounding paths these are the values themselves
+    returns = paths if compounding else bar_returns(equity)
+    sharpe = sharpe_ratio(returns, periods_per_year)
+    max_drawdown_pct = max_drawdown(equity)
+
+    return {'final_balance': equity[:, -1], 'max_drawdown': max_drawdown_pct, 'sharpe': sharpe}
+
+
+def monte_carlo(values, initial_balance: float, n_paths: int = 10_000, methods=METHODS, compounding: bool = False,
+                block: int = 10, noise: float = 0.5, periods_per_year: Optional[float] = None,
+                seed: Optional[int] = None, max_elements: int = 20_000_000) -> pd.DataFrame:
+    """
+    Resamples values with each method and measures every path.
+
+    Parameters:
+        values (array-like): Per-trade dollar P&L, or per-period returns with compounding=True.
+        initial_balance (float): Starting equity.
+        n_paths (int): Paths per method.
+        methods (tuple): Any of 'shuffle', 'bootstrap', 'block', 'noise'.
+        compounding (bool): Treat values as fractional returns instead of dollar P&L.
+        block (int): Block length for the block bootstrap.
+        noise (float): Noise standard deviation as a fraction of the values' std.
+        periods_per_year (float, optional): Annualizes Sharpe when given.
+        seed (int, optional): Seed for reproducible paths.
+        max_elements (int): Largest paths x steps chunk generated at once.
+
+    Returns:
+        pd.DataFrame: One row per path with method, final_balance, max_drawdown and sharpe.
+    """
+    values = np.asarray(values, dtype='float64')
+    rng = np.random.default_rng(seed)
+    if len(values) == 0:
+        return pd.DataFrame(columns=['method', 'final_balance', 'max_drawdown', 'sharpe'])
+
+    chunk = max(1, max_elements // len(values))
+    frames = []
+    for method in methods:
+        for start in range(0, n_paths, chunk):
+            paths = resample_paths(values, min(chunk, n_paths - start), method, rng, block, noise)
+            metrics = path_metrics(paths, initial_balance, compounding, periods_per_year)
+            frames.append(pd.DataFrame({'method': method, **metrics}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def summarize(samples: pd.DataFrame, observed: Optional[dict] = None,
+              quantiles=(0.05, 0.25, 0.5, 0.75, 0.95)) -> pd.DataFrame:
+    """
+    Quantiles of each metric per method, optionally next to the observed backtest's values.
+
+    Parameters:
+        samples (pd.DataFrame): Output of monte_carlo.
+        observed (dict, optional): The original path's metrics, e.g. from path_metrics on the unshuffled values.
+        quantiles (tuple): Quantiles to report.
+
+    Returns:
+        pd.DataFrame: Indexed by (method, metric) with mean and quantile columns.
+    """
+    metrics = ['final_balance', 'max_drawdown', 'sharpe']
+    grouped = samples.groupby('method', sort=False)[metrics]
+    summary = grouped.quantile(list(quantiles)).unstack(level=-1)
+    summary = summary.stack(level=0, future_stack=True)
+    summary.columns = [f"p{int(q * 100)}" for q in quantiles]
+    summary.insert(0, 'mean', grouped.mean().stack())
+    summary.index.names = ['method', 'metric']
+    if observed is not None:
+        summary.insert(0, 'observed', [observed[metric] for metric in summary.index.get_level_values('metric')])
+    return summary
+
+
+def robustness_report(values, initial_balance: float, n_paths: int = 10_000, compounding: bool = False,
+                      periods_per_year: Optional[float] = None, seed: Optional[int] = None, **kwargs) -> pd.DataFrame:
+    """monte_carlo and summarize in one call, with the original sequence as the observed column."""
+    values = np.asarray(values, dtype='float64')
+    if len(values) == 0:
+        return pd.DataFrame()
+    observed = path_metrics(values[None, :], initial_balance, compounding, periods_per_year)
+    observed = {metric: value[0] for metric, value in observed.items()}
+    samples = monte_carlo(values, initial_balance, n_paths, compounding=compounding,
+                          periods_per_year=periods_per_year, seed=seed, **kwargs)
+    return summarize(samples, observed)
@@ -0,0 +1,331 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import inspect
+import logging
+import signal
+import sys
+from collections import defaultdict
+from typing import Optional
+
+from async_fetch import TokenBucket
+from order_manager import OrderManager
+from ws_feed import MarketDataFeed
+
+logger = logging.getLogger(__name__)
+
+'''
+Single-process asyncio runtime for the live strategies.
+
+Every strategy instance runs on one event loop, across any number of symbols and
+timeframes, and they all share:
+
+    - one exchange client, behind token bucket rate limiters for public and private calls,
+      with every call on a sync client made from one thread (SharedExchange),
+    - one websocket market data feed, subscribed once per symbol and interval,
+    - one OrderManager tracking every strategy's orders,
+    - one logging setup (setup_logging).
+
+A strategy subclasses Strategy, declares the symbols, candle interval and timer it needs and
+implements the handlers it uses. Each strategy gets its own event queue and worker task, so
+events reach it in order and a slow or failing strategy does not hold up the others.
+
+    runtime = Runtime(kraken_exchange())
+    runtime.add(HighLowBreakStrategy('ETH/USD'))
+    runtime.add(PositionMonitor())
+    runtime.run_forever()
+'''
+
+# ccxt methods that only read public market data, everything else is treated as private
+PUBLIC_METHODS = {'fetch_ohlcv', 'fetch_ticker', 'fetch_tickers', 'fetch_order_book', 'fetch_trades', 'fetch_time',
+                  'fetch_status', 'load_markets', 'fetch_markets', 'public_get_time'}
+# Order entry has its own per-pair limits on Kraken and does not count towards the REST counter
+ORDER_METHODS = {'create_order', 'cancel_order', 'edit_order', 'cancel_all_orders'}
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(name)s - %(message)s'
+
+
+def setup_logging(path: Optional[str] = 'runtime.log', level: int = logging.INFO):
+    """
+    Configures the root logger once for the whole process.
+
+    Call this before importing strategy modules, their own logging.basicConfig calls then do
+    nothing and every strategy logs to the same place.
+    """
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if path:
+        handlers.append(logging.FileHandler(path))
+    logging.basicConfig(level=level, format=LOG_FORMAT, handlers=handlers, force=True)
+
+
+class SharedExchange:
+    """
+    Async view of one exchange client shared by every strategy.
+
+    Public market data calls wait for limiter. Private account calls wait for private_limiter,
+    which defaults to Kraken's per-key REST counter on the starter tier (15 calls, decaying by
+    0.33 a second). Order entry and cancels only wait their turn.
+
+    Kraken's nonce in ccxt is the time in milliseconds, so private calls made at the same
+    moment from different threads can reach Kraken with equal or out-of-order nonces and be
+    rejected (EAPI:Invalid nonce), and a sync client's requests session is not thread safe.
+    So every method of a sync ccxt client runs on one worker thread, one call at a time, and
+    private coroutine methods of an async client are made one at a time behind a lock.
+    Attributes that are not methods (has, markets, ...) pass through.
+    """
+
+    def __init__(self, exchange, limiter: Optional[TokenBucket] = None,
+                 private_limiter: Optional[TokenBucket] = None):
+        self.exchange = exchange
+        self.limiter = limiter or TokenBucket()
+        self.private_limiter = private_limiter or TokenBucket(0.33, 15)
+        self.calls = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='exchange')
+        self._private_lock = None
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.exchange, name)
+        if not callable(attr):
+            return attr
+        public = name in PUBLIC_METHODS or name.startswith('public')
+        if public:
+            limiter = self.limiter
+        elif name in ORDER_METHODS:
+            limiter = None
+        else:
+            limiter = self.private_limiter
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            if limiter is not None:
+                await limiter.acquire()
+            self.calls += 1
+            if not inspect.iscoroutinefunction(attr):
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, functools.partial(attr, *args, **kwargs))
+            if public:
+                return await attr(*args, **kwargs)
+            if self._private_lock is None:
+                self._private_lock = asyncio.Lock()
+            async with self._private_lock:
+                return await attr(*args, **kwargs)
+
+        return call
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class Strategy:
+    """
+    Base class for strategies hosted by a Runtime.
+
+    Attributes:
+        symbols (tuple): Symbols whose market data this strategy receives.
+        interval (int, optional): Candle interval in minutes for on_candle, None for none.
+        book (bool): Receive top-of-book updates in on_book.
+        trades (bool): Receive public trades in on_trade.
+        timer (float, optional): Seconds between on_timer calls.
+    """
+
+    symbols = ()
+    interval = None
+    book = False
+    trades = False
+    timer = None
+
+    def __init__(self, name: Optional[str] = None):
+        self.name = name or type(self).__name__
+        self.runtime = None
+        self.logger = logging.getLogger(f"strategy.{self.name}")
+
+    @property
+    def exchange(self) -> SharedExchange:
+        return self.runtime.exchange
+
+    @property
+    def orders(self) -> OrderManager:
+        return self.runtime.orders
+
+    @property
+    def feed(self) -> MarketDataFeed:
+        return self.runtime.feed
+
+    async def start(self):
+        """Called once before any events, e.g. to seed indicators from history."""
+
+    async def stop(self):
+        """Called once on shutdown."""
+
+    async def on_candle(self, candle: dict):
+        pass
+
+    async def on_book(self, book: dict):
+        pass
+
+    async def on_trade(self, trade: dict):
+        pass
+
+    async def on_timer(self):
+        pass
+
+
+class Runtime:
+    def __init__(self, exchange, feed: Optional[MarketDataFeed] = None, orders: Optional[OrderManager] = None,
+                 limiter: Optional[TokenBucket] = None, private_limiter: Optional[TokenBucket] = None,
+                 queue_size: int = 10_000):
+        """
+        Parameters:
+            exchange: ccxt client (sync or async) or a stand-in such as replay.ReplayExchange.
+            feed (MarketDataFeed, optional): Market data feed, Kraken's public websocket by default.
+            orders (OrderManager, optional): Order tracker, one over the shared exchange by default.
+            limiter (TokenBucket, optional): Rate limiter for public REST calls.
+            private_limiter (TokenBucket, optional): Rate limiter for private REST calls other
+                than order entry, see SharedExchange.
+            queue_size (int): Events buffered per strategy. When a strategy falls this far
+                behind, its oldest queued event is dropped.
+        """
+        self.exchange = SharedExchange(exchange, limiter, private_limiter)
+        self.feed = feed or MarketDataFeed()
+        self.orders = orders or OrderManager(self.exchange)
+        self.queue_size = queue_size
+        self.strategies = []
+        self.dropped = defaultdict(int)
+
+        self._queues = {}
+        self._tasks = set()
+        self._routes = {'candle': defaultdict(list), 'book': defaultdict(list), 'trade': defaultdict(list)}
+        self._stopped = None
+
+    def add(self, strategy: Strategy) -> Strategy:
+        strategy.runtime = self
+        self.strategies.append(strategy)
+        for symbol in strategy.symbols:
+            if strategy.interval is not None:
+                self._routes['candle'][(symbol, strategy.interval)].append(strategy)
+            if strategy.book:
+                self._routes['book'][symbol].append(strategy)
+            if strategy.trades:
+                self._routes['trade'][symbol].append(strategy)
+        return strategy
+
+    def _subscribe(self):
+        """One feed subscription per channel, symbol and interval, whatever the strategy count."""
+        by_interval = defaultdict(set)
+        for symbol, interval in self._routes['candle']:
+            by_interval[interval].add(symbol)
+        for interval, symbols in by_interval.items():
+            self.feed.subscribe_ohlc(sorted(symbols), interval)
+        if self._routes['book']:
+            self.feed.subscribe_ticker(sorted(self._routes['book']))
+        if self._routes['trade']:
+            self.feed.subscribe_trades(sorted(self._routes['trade']))
+
+        self.feed.on_candle(lambda candle: self._route('candle', (candle['symbol'], candle['interval']), candle))
+        self.feed.on_book(lambda book: self._route('book', book['symbol'], book))
+        self.feed.on_trade(lambda trade: self._route('trade', trade['symbol'], trade))
+
+    def _route(self, kind: str, key, item: dict):
+        for strategy in self._routes[kind].get(key, ()):
+            self._enqueue(strategy, getattr(strategy, f"on_{kind}"), item)
+
+    def _enqueue(self, strategy: Strategy, handler, *args):
+        queue = self._queues[strategy.name]
+        if queue.full():
+            queue.get_nowait()
+            self.dropped[strategy.name] += 1
+        queue.put_nowait((handler, args))
+
+    async def _worker(self, strategy: Strategy):
+        queue = self._queues[strategy.name]
+        while True:
+            handler, args = await queue.get()
+            try:
+                await handler(*args)
+            except Exception as e:
+                strategy.logger.exception(f"Error in {handler.__name__}: {e}")
+
+    async def _timer(self, strategy: Strategy):
+        while True:
+            await asyncio.sleep(strategy.timer)
+            self._enqueue(strategy, strategy.on_timer)
+
+    def spawn(self, coroutine) -> asyncio.Task:
+        """Runs a coroutine as a task the runtime keeps track of, logs it if it fails."""
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Error in runtime task: {task.exception()}")
+
+    def stop(self):
+        if self._stopped is not None:
+            self._stopped.set()
+
+    async def run(self):
+        """Starts the feed, the order manager and every strategy, runs until stop() is called."""
+        names = [strategy.name for strategy in self.strategies]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Strategy names must be unique: {names}")
+        self._stopped = asyncio.Event()
+        self._queues = {name: asyncio.Queue(self.queue_size) for name in names}
+
+        for strategy in self.strategies:
+            await strategy.start()
+            logger.info(f"Started {strategy.name} on {', '.join(strategy.symbols) or 'no symbols'}")
+        self._subscribe()
+
+        tasks = [asyncio.ensure_future(self.feed.run()), asyncio.ensure_future(self.orders.run())]
+        for strategy in self.strategies:
+            tasks.append(asyncio.ensure_future(self._worker(strategy)))
+            if strategy.timer:
+                tasks.append(asyncio.ensure_future(self._timer(strategy)))
+
+        try:
+            await self._stopped.wait()
+        finally:
+            logger.info("Shutting down")
+            for strategy in self.strategies:
+                try:
+                    await strategy.stop()
+                except Exception as e:
+                    strategy.logger.error(f"Error stopping: {e}")
+            await self.feed.stop()
+            await self.orders.stop()
+            tasks.extend(self._tasks)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.exchange.close()
+
+    def run_forever(self):
+        """Runs on a new event loop and stops cleanly on SIGINT or SIGTERM."""
+        async def main():
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(sig, self.stop)
+            await self.run()
+
+        asyncio.run(main())
+
+
+if __name__ == '__main__':
+    import os
+    setup_logging(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'runtime.log'))
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ETHUSD'))
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'riskmanager'))
+    from ohlcv_store import OHLCVStore
+    from highlowbreaklive import HighLowBreakStrategy, kraken_exchange
+    from positions import PositionMonitor
+
+    runtime = Runtime(kraken_exchange())
+    store = OHLCVStore()
+    for symbol, amount in [('ETH/USD', 0.002), ('BTC/USD', 0.0001)]:
+        state_path = os.path.join(store.root, f"adx_{symbol.replace('/', '')}.json")
+        runtime.add(HighLowBreakStrategy(symbol, amount=amount, store=store, state_path=state_path))
+    runtime.add(PositionMonitor())
+    runtime.run_forever()
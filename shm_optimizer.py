@@ -0,0 +1,208 @@
+import gc
+import itertools
+import logging
+import multiprocessing
+import queue
+from multiprocessing import shared_memory
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from backtesting import Backtest
+
+from result_cache import ResultCache, params_key
+
+logger = logging.getLogger(__name__)
+
+'''
+Parallel optimizer with a shared-memory data plane.
+
+The OHLCV columns are copied once into named shared-memory buffers. Workers attach to them by
+name and wrap them in a DataFrame without copying, so only parameter dicts travel to the workers
+and only the scalar stats travel back over a result queue. Nothing relies on fork, so it works
+the same with the spawn start method (scripts using it need an if __name__ == '__main__' guard),
+and memory stays flat as worker count grows.
+'''
+
+
+class SharedFrame:
+    """A float64 OHLCV frame and its datetime index held in named shared memory."""
+
+    def __init__(self, descriptor: dict, blocks: list, owner: bool):
+        self.descriptor = descriptor
+        self._blocks = blocks
+        self._owner = owner
+
+    @classmethod
+    def create(cls, df: pd.DataFrame) -> 'SharedFrame':
+        values = np.ascontiguousarray(df.to_numpy(dtype='float64'))
+        index = pd.DatetimeIndex(df.index).as_unit('ns').asi8
+
+        values_block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        index_block = shared_memory.SharedMemory(create=True, size=max(index.nbytes, 1))
+        np.ndarray(values.shape, dtype='float64', buffer=values_block.buf)[:] = values
+        np.ndarray(index.shape, dtype='int64', buffer=index_block.buf)[:] = index
+
+        descriptor = {
+            'values': values_block.name,
+            'index': index_block.name,
+            'shape': values.shape,
+            'columns': list(df.columns),
+        }
+        return cls(descriptor, [values_block, index_block], owner=True)
+
+    @classmethod
+    def attach(cls, descriptor: dict) -> 'SharedFrame':
+        blocks = [shared_memory.SharedMemory(name=descriptor['values']),
+                  shared_memory.SharedMemory(name=descriptor['index'])]
+        return cls(descriptor, blocks, owner=False)
+
+    def frame(self) -> pd.DataFrame:
+        """DataFrame view over the shared buffers, no data is copied."""
+        shape = tuple(self.descriptor['shape'])
+        values = np.ndarray(shape, dtype='float64', buffer=self._blocks[0].buf)
+        index = np.ndarray((shape[0],), dtype='int64', buffer=self._blocks[1].buf)
+        return pd.DataFrame(values, index=pd.DatetimeIndex(index.view('datetime64[ns]'), name='datetime'),
+                            columns=self.descriptor['columns'], copy=False)
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+            if self._owner:
+                block.unlink()
+        self._blocks = []
+
+
+def _scalar_stats(stats: pd.Series) -> dict:
+    # _strategy, _equity_curve and _trades are large objects, only send the summary numbers back
+    return {key: value for key, value in stats.items() if not key.startswith('_')}
+
+
+def _worker(descriptor, strategy, backtest_kwargs, tasks, results):
+    shared = SharedFrame.attach(descriptor)
+    try:
+        backtest = Backtest(shared.frame(), strategy, **backtest_kwargs)
+        while True:
+            params = tasks.get()
+            if params is None:
+                break
+            try:
+                results.put((params, _scalar_stats(backtest.run(**params)), None))
+            except Exception as e:
+                results.put((params, None, repr(e)))
+    finally:
+        # Release the views before closing the mapping
+        backtest = None
+        gc.collect()
+        try:
+            shared.close()
+        except BufferError:
+            pass  # A view is still referenced, the mapping goes away with the process
+
+
+def param_grid(constraint=None, **params) -> list:
+    """Every combination of the parameter ranges as dicts, filtered by constraint like Backtest.optimize."""
+    names = list(params)
+    grid = [dict(zip(names, values)) for values in itertools.product(*(list(params[name]) for name in names))]
+    if constraint is not None:
+        grid = [p for p in grid if constraint(type('Params', (), p))]
+    return grid
+
+
+def run_grid(strategy, data: pd.DataFrame, grid: list, backtest_kwargs: Optional[dict] = None,
+             processes: Optional[int] = None, mp_context: Optional[str] = None):
+    """
+    Runs Backtest.run for every parameter dict in grid across worker processes.
+
+    Yields (params, stats) as results arrive, stats is a dict of the scalar backtest stats.
+    """
+    backtest_kwargs = backtest_kwargs or {}
+    if not grid:
+        return
+
+    context = multiprocessing.get_context(mp_context)
+    processes = min(processes or multiprocessing.cpu_count(), len(grid))
+    tasks = context.Queue()
+    results = context.Queue()
+
+    shared = SharedFrame.create(data)
+    workers = []
+    try:
+        for params in grid:
+            tasks.put(params)
+        for _ in range(processes):
+            tasks.put(None)
+
+        for _ in range(processes):
+            worker = context.Process(target=_worker, args=(shared.descriptor, strategy, backtest_kwargs, tasks, results),
+                                     daemon=True)
+            worker.start()
+            workers.append(worker)
+
+        remaining = len(grid)
+        while remaining:
+            try:
+                params, stats, error = results.get(timeout=1)
+            except queue.Empty:
+                dead = [w for w in workers if w.exitcode not in (None, 0)]
+                if dead:
+                    raise RuntimeError(f"Optimizer worker exited with code {dead[0].exitcode}")
+                continue
+            remaining -= 1
+            if error:
+                logger.error(f"Backtest failed for {params}: {error}")
+                continue
+            yield params, stats
+    finally:
+        for worker in workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        shared.close()
+
+
+def evaluate(strategy, data: pd.DataFrame, grid: list, backtest_kwargs: Optional[dict] = None,
+             processes: Optional[int] = None, mp_context: Optional[str] = None,
+             cache: Optional[ResultCache] = None) -> list:
+    """Runs every parameter dict in grid, reusing cached results, and returns one {**params, **stats} row each."""
+    rows = []
+    if cache is not None:
+        run_key = cache.run_key(strategy, data, backtest_kwargs)
+        done = cache.get_many(run_key, grid)
+        rows = [{**p, **done[params_key(p)]} for p in grid if params_key(p) in done]
+        grid = [p for p in grid if params_key(p) not in done]
+        logger.info(f"{len(rows)} combinations loaded from the result cache, {len(grid)} to run")
+
+    for p, stats in run_grid(strategy, data, grid, backtest_kwargs, processes, mp_context):
+        if cache is not None:
+            cache.put(run_key, p, stats)
+        rows.append({**p, **stats})
+    return rows
+
+
+def optimize(strategy, data: pd.DataFrame, backtest_kwargs: Optional[dict] = None, maximize: str = 'Sharpe Ratio',
+             constraint=None, processes: Optional[int] = None, mp_context: Optional[str] = None,
+             cache: Optional[ResultCache] = None, **params) -> pd.DataFrame:
+    """
+    Grid search like Backtest.optimize, run on a shared-memory worker pool.
+
+    Parameters:
+        strategy (type): backtesting.Strategy subclass, importable by the workers.
+        data (pd.DataFrame): OHLCV bars indexed by datetime.
+        backtest_kwargs (dict, optional): Keyword arguments for Backtest (cash, commission, ...).
+        maximize (str): Stats key to rank by, highest first.
+        constraint (callable, optional): Receives the params as attributes, return False to skip.
+        processes (int, optional): Worker count, defaults to every core.
+        mp_context (str, optional): multiprocessing start method, defaults to the platform's.
+        cache (ResultCache, optional): Skip combinations already stored and store new ones as they finish.
+        **params: Iterables of values for each strategy parameter.
+
+    Returns:
+        pd.DataFrame: One row per parameter set with its stats, best first.
+    """
+    grid = param_grid(constraint, **params)
+    rows = evaluate(strategy, data, grid, backtest_kwargs, processes, mp_context, cache)
+    if not rows:
+        return pd.DataFrame(columns=list(params))
+    results = pd.DataFrame(rows)
+    return results.sort_values(maximize, ascending=False, na_position='last').reset_index(drop=True)
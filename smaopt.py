@@ -1,10 +1,9 @@
-from backtesting import Backtest, Strategy
+from backtesting import Strategy
 from backtesting.lib import crossover
 import pandas as pd
-import multiprocessing
-
-# Set the multiprocessing start method to 'fork'
-multiprocessing.set_start_method('fork')
+from ohlcv_store import OHLCVStore
+from shm_optimizer import optimize
+from result_cache import ResultCache
 
 class SMAStrategy(Strategy):
     window_short = 13
@@ -39,29 +38,30 @@ class SMAStrategy(Strategy):
             self.position.close()
             self.in_trade = False
 
-data = pd.read_csv('/home/ebsung/quanttrading/Data/ETHUSD_30.csv')
-data['datetime'] = pd.to_datetime(data['datetime'], unit='s')
-data.set_index('datetime', inplace=True)
-data.sort_index(inplace=True)
-
-start_date = '2023-01-01'
-end_date = '2024-11-30'
-
-data = data.loc[start_date:end_date]
+if __name__ == '__main__':
+    start_date = '2023-01-01'
+    end_date = '2024-11-30'
 
-bt = Backtest(data, SMAStrategy, cash=100000, commission=0.0025)
+    # Load only the date range from the columnar store (ingests the CSV on first run)
+    data = OHLCVStore().load_range('ETHUSD', '30', start_date, end_date,
+                                   csv_path='/home/ebsung/quanttrading/Data/ETHUSD_30.csv')
 
-print("Optimization is starting...")
+    print("Optimization is starting...")
 
-# Optimization
-stats = bt.optimize(
-    window_short=range(5, 20, 5),
-    window_long=range(20, 50, 5),
-    stoploss_multiple=[0.01, 0.02, 0.03],
-    risk_reward_ratio=[2, 3, 4, 5],
-    maximize='Equity Final [$]'
-)
+    # Optimization, workers read the bars from shared memory so any start method works.
+    # Finished combinations are cached on disk, so re-runs only backtest new or unfinished ones.
+    results = optimize(
+        SMAStrategy,
+        data,
+        backtest_kwargs=dict(cash=100000, commission=0.0025),
+        cache=ResultCache(),
+        window_short=range(5, 20, 5),
+        window_long=range(20, 50, 5),
+        stoploss_multiple=[0.01, 0.02, 0.03],
+        risk_reward_ratio=[2, 3, 4, 5],
+        maximize='Equity Final [$]'
+    )
 
-print("Optimization completed.")
-print("Best parameters found:")
-print(stats['_strategy'])
\ No newline at end of file
+    print("Optimization completed.")
+    print("Best parameters found:")
+    print(results.iloc[0])
\ No newline at end of file
@@ -3,6 +3,7 @@ import ccxt
 import pandas as pd
 import time
 from datetime import datetime
+from async_fetch import fetch_universe_sync
 
 '''
 SYMBOLS TO TRADE:
@@ -34,4 +35,14 @@ max_slippage = 0.002
 order_timeout = 60
 
 minimum_usd_balance = 10
-min_data_points = 20
\ No newline at end of file
+min_data_points = 20
+
+def fetch_symbols_data(interval: int = 60) -> dict:
+    """Latest OHLCV for every symbol above, fetched concurrently through one session and rate limiter."""
+    return fetch_universe_sync(symbols, interval)
+
+
+if __name__ == '__main__':
+    universe = fetch_symbols_data(int(pd.Timedelta(timeframe).total_seconds() // 60))
+    for symbol, df in universe.items():
+        print(f"{symbol}: {len(df)} candles, last close {df['Close'].iloc[-1]}")
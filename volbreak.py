@@ -1,5 +1,8 @@
 import pandas as pd
 import numpy as np
+from ohlcv_store import OHLCVStore
+from metrics import equity_metrics, periods_per_year, trade_stats
+from robustness import robustness_report, trade_pnl
 
 def calculate_relative_volume(df):
     df['avg_volume'] = df['volume'].rolling(window=20).mean()
@@ -48,6 +51,100 @@ def backtest_strategy(df, rvol_threshold=3, initial_balance=1000, trade_amount=1
 
     return balance, pd.DataFrame(trade_log), equity_curve
 
+TRADE_DTYPE = np.dtype([('index', 'int64'), ('type', 'U4'), ('price', 'float64'), ('amount', 'float64')])
+
+def _first_exit(close, start, upper, lower, chunk=256):
+    # Scan forward in growing chunks so a short trade only touches a few bars
+    n = len(close)
+    while start < n:
+        stop = min(n, start + chunk)
+        segment = close[start:stop]
+        hits = np.flatnonzero((segment >= upper) | (segment <= lower))
+        if hits.size:
+            return start + hits[0]
+        start = stop
+        chunk *= 2
+    return -1
+
+def backtest_strategy_fast(df, rvol_threshold=3, initial_balance=1000, trade_amount=100, fee_rate=0.0025):
+    """
+    Array based version of backtest_strategy with the same rules and return values.
+
+    Entry candidates are computed for every bar at once, then each trade jumps straight to
+    its next candidate entry and scans forward for the doubling / -20% exit, so the Python
+    loop runs once per trade instead of once per bar.
+    """
+    close = df['close'].to_numpy(dtype='float64')
+    rvol = df['rvol'].to_numpy(dtype='float64')
+    n = len(close)
+
+    # Buy condition for every bar, skipping the first 20 periods for RVOL calculation
+    entries = np.zeros(n, dtype=bool)
+    if n > 20:
+        entries[20:] = (rvol[20:] > rvol_threshold) & (close[20:] > close[19:-1])
+    candidates = np.flatnonzero(entries)
+
+    trades = np.empty(2 * len(candidates), dtype=TRADE_DTYPE)
+    equity = np.empty(n, dtype='float64')
+    balance = initial_balance
+    position = 0
+    count = 0
+    flat_from = 0
+    search_from = 20
+
+    while True:
+        j = np.searchsorted(candidates, search_from)
+        if j >= len(candidates):
+            break
+        entry = candidates[j]
+        equity[flat_from:entry] = balance
+
+        price = close[entry]
+        position = trade_amount / price
+        balance -= trade_amount
+        balance -= trade_amount * fee_rate  # Apply fee
+        trades[count] = (entry, 'buy', price, position)
+        count += 1
+
+        exit_index = _first_exit(close, entry + 1, 2 * price, 0.8 * price)
+        if exit_index < 0:
+            equity[entry:] = balance + position * close[entry:]
+            flat_from = n
+            break
+
+        equity[entry:exit_index] = balance + position * close[entry:exit_index]
+        price = close[exit_index]
+        balance += position * price
+        balance -= position * price * fee_rate  # Apply fee
+        trades[count] = (exit_index, 'sell', price, position)
+        count += 1
+        position = 0
+
+        flat_from = exit_index
+        search_from = exit_index + 1
+
+    equity[flat_from:] = balance
+
+    # Final exit if position is still open
+    if position > 0:
+        balance += position * close[-1]
+        balance -= position * close[-1] * fee_rate
+        trades[count] = (n - 1, 'sell', close[-1], position)
+        count += 1
+        position = 0
+
+    trades = trades[:count]
+    if count == 0:
+        return balance, pd.DataFrame(), equity.tolist()
+
+    trade_log = pd.DataFrame({
+        'datetime': df['datetime'].to_numpy()[trades['index']],
+        'type': trades['type'],
+        'price': trades['price'],
+        'amount': trades['amount'],
+    })
+    return balance, trade_log, equity.tolist()
+
 def calculate_metrics(trade_log, equity_curve, initial_balance, df):
     if trade_log.empty:
         return {
@@ -69,28 +166,23 @@ def calculate_metrics(trade_log, equity_curve, initial_balance, df):
     buy_trades = trade_log[trade_log['type'] == 'buy']
     sell_trades = trade_log[trade_log['type'] == 'sell']
 
-    gains = []
-    losses = []
-    for i in range(len(sell_trades)):
-        buy_price = buy_trades.iloc[i]['price']
-        sell_price = sell_trades.iloc[i]['price']
-        profit = sell_price - buy_price
-        if profit > 0:
-            gains.append(profit / buy_price * 100)  # Convert to percentage
-        else:
-            losses.append(profit / buy_price * 100)  # Convert to percentage
-    
+    # Pair each sell with its buy and score the round trip in percent
     total_trades = len(sell_trades)
-    wins = len(gains)
-    losses_count = len(losses)
-
-    peak_equity = max(equity_curve)
-    trough_equity = min(equity_curve)
-    max_drawdown = (trough_equity - peak_equity) / peak_equity * 100
-
-    win_rate = wins / total_trades * 100 if total_trades > 0 else 0
-    avg_win = np.mean(gains) if gains else 0
-    avg_loss = np.mean(losses) if losses else 0
+    buy_prices = buy_trades['price'].to_numpy(dtype='float64')[:total_trades]
+    sell_prices = sell_trades['price'].to_numpy(dtype='float64')
+    trade_returns = (sell_prices - buy_prices) / buy_prices * 100
+    trades = trade_stats(trade_returns).iloc[0]
+    wins = int(trades['Wins'])
+    losses_count = int(trades['Losses'])
+
+    # Return-based metrics, annualized from the bar spacing
+    equity = np.asarray(equity_curve, dtype='float64')
+    performance = equity_metrics(np.append(initial_balance, equity), periods_per_year(df['datetime'])).iloc[0]
+    max_drawdown = performance['Max. Drawdown [%]']
+
+    win_rate = trades['Win Rate [%]'] if total_trades > 0 else 0
+    avg_win = trades['Avg. Win'] if wins else 0
+    avg_loss = trades['Avg. Loss'] if losses_count else 0
     total_return = (equity_curve[-1] - initial_balance) / initial_balance * 100
     final_balance = equity_curve[-1]
     
@@ -99,10 +191,9 @@ def calculate_metrics(trade_log, equity_curve, initial_balance, df):
     final_price = df['close'].iloc[-1]
     buy_and_hold_return = (final_price - initial_price) / initial_price * 100
 
-    sharpe_ratio = np.mean(equity_curve) / np.std(equity_curve) if np.std(equity_curve) > 0 else 0
-    downside = [min(0, x - np.mean(equity_curve)) for x in equity_curve]
-    sortino_ratio = np.mean(equity_curve) / np.std(downside) if np.std(downside) > 0 else 0
-    calmar_ratio = total_return / abs(max_drawdown) if max_drawdown < 0 else 0
+    sharpe_ratio = np.nan_to_num(performance['Sharpe Ratio'])
+    sortino_ratio = np.nan_to_num(performance['Sortino Ratio'])
+    calmar_ratio = np.nan_to_num(performance['Calmar Ratio'])
 
     return {
         'win_rate': f"{win_rate:.2f}%",
@@ -121,17 +212,16 @@ def calculate_metrics(trade_log, equity_curve, initial_balance, df):
     }
 
 def main():
-    # Load data from CSV instead of fetching from the exchange
+    # Load data from the local store instead of fetching from the exchange
     filename = '/Users/ethansung/quant/memebot/Data/XBTUSDT_60.csv'
-    df = pd.read_csv(filename)
-
-    # Ensure the datetime is in datetime format
-    df['datetime'] = pd.to_datetime(df['datetime'], unit='s')
 
-    # Filter data for a specific period
+    # Load only the bars for a specific period (ingests the CSV on first run)
     start_date = '2023-01-01'  # Example start date
     end_date = '2023-12-31'    # Example end date
-    df = df[(df['datetime'] >= start_date) & (df['datetime'] <= end_date)]
+    df = OHLCVStore().load_range('XBTUSDT', '60', start_date, end_date, csv_path=filename)
+
+    # The backtest expects lowercase columns and a datetime column
+    df = df.rename(columns=str.lower).reset_index()
 
     # Calculate relative volume
     df = calculate_relative_volume(df)
@@ -143,7 +233,7 @@ def main():
     print("Running backtest...")
 
     # Run backtest
-    final_balance, trade_log, equity_curve = backtest_strategy(df, initial_balance=initial_balance)
+    final_balance, trade_log, equity_curve = backtest_strategy_fast(df, initial_balance=initial_balance)
 
     # Calculate metrics
     metrics = calculate_metrics(trade_log, equity_curve, initial_balance, df)
@@ -152,5 +242,9 @@ def main():
         print(f"{key}: {value}")
     print("\n")
 
+    # Distribution of outcomes over 10,000 reshuffled / resampled trade sequences
+    print("Monte Carlo robustness (10,000 paths per method):")
+    print(robustness_report(trade_pnl(trade_log, fee_rate=0.0025), initial_balance, seed=42))
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,187 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from backtesting import Backtest
+
+import indicator_cache
+from shm_optimizer import SharedFrame, _scalar_stats, param_grid
+
+logger = logging.getLogger(__name__)
+
+'''
+Parallel walk-forward optimization.
+
+The history is split into rolling folds: optimize on a train window, then run the winning
+parameters once on the test window right after it, and step forward. Folds are independent, so
+each one is optimized in its own worker process. The bars are copied once into shared memory
+and every worker registers the full history with indicator_cache, so an indicator is computed
+once per worker on the whole history and each overlapping fold only slices it. That also means
+a test window starts with its indicators already warmed up by the bars before it, like a live
+bot would. The test equity curves are chained into one out-of-sample curve.
+
+    result = walk_forward(SMAStrategy, data, train='365D', test='90D',
+                          backtest_kwargs={'cash': 1_000_000, 'commission': 0.002},
+                          window_short=range(5, 50, 5), window_long=range(50, 200, 10),
+                          constraint=lambda p: p.window_short < p.window_long)
+'''
+
+_shared = None
+_data = None
+
+
+def walk_forward_folds(index: pd.DatetimeIndex, train: str, test: str, step: Optional[str] = None,
+                       min_bars: int = 50) -> list:
+    """
+    Rolling (train_start, train_end, test_end) bar positions, half open, stepping by step (defaults to test).
+
+    Parameters:
+        index (pd.DatetimeIndex): The bars' timestamps.
+        train, test, step (str): Window lengths as pandas offsets, e.g. '365D', '90D'.
+        min_bars (int): Folds with fewer train or test bars than this are skipped.
+
+    Returns:
+        list: (train_start, train_end, test_end) integer positions into index.
+    """
+    index = pd.DatetimeIndex(index)
+    train, test = pd.Timedelta(train), pd.Timedelta(test)
+    step = pd.Timedelta(step) if step else test
+
+    folds = []
+    start = index[0]
+    while start + train < index[-1]:
+        train_start = int(index.searchsorted(start))
+        train_end = int(index.searchsorted(start + train))
+        test_end = int(index.searchsorted(start + train + test))
+        if train_end - train_start >= min_bars and test_end - train_end >= min_bars:
+            folds.append((train_start, train_end, test_end))
+        start += step
+    return folds
+
+
+def _init_worker(descriptor):
+    global _shared, _data
+    _shared = SharedFrame.attach(descriptor)
+    _data = _shared.frame()
+    indicator_cache.register_base(_data)
+
+
+def _best_params(strategy, train: pd.DataFrame, grid: list, backtest_kwargs: dict, maximize: str):
+    backtest = Backtest(train, strategy, **backtest_kwargs)
+    best, best_stats, best_score = None, None, -np.inf
+    for params in grid:
+        try:
+            stats = backtest.run(**params)
+        except Exception as e:
+            logger.error(f"Backtest failed for {params}: {e!r}")
+            continue
+        score = stats[maximize]
+        if pd.isna(score):
+            score = -np.inf
+        if best is None or score > best_score:
+            best, best_stats, best_score = params, stats, score
+    return best, best_stats
+
+
+def _run_fold(strategy, fold: tuple, grid: list, backtest_kwargs: dict, maximize: str) -> dict:
+    train_start, train_end, test_end = fold
+    train = _data.iloc[train_start:train_end]
+    test = _data.iloc[train_end:test_end]
+
+    params, train_stats = _best_params(strategy, train, grid, backtest_kwargs, maximize)
+    if params is None:
+        return {'fold': fold, 'params': None}
+
+    test_stats = Backtest(test, strategy, **backtest_kwargs).run(**params)
+    return {
+        'fold': fold,
+        'params': params,
+        'train': _scalar_stats(train_stats),
+        'test': _scalar_stats(test_stats),
+        'equity': test_stats['_equity_curve']['Equity'],
+    }
+
+
+def stitch_equity(curves: list, cash: float) -> pd.Series:
+    """Chains each test window's equity curve onto the previous one's final balance."""
+    stitched = []
+    balance = float(cash)
+    for equity in curves:
+        scaled = equity / equity.iloc[0] * balance
+        stitched.append(scaled)
+        balance = scaled.iloc[-1]
+    if not stitched:
+        return pd.Series(dtype='float64', name='Equity')
+    return pd.concat(stitched).rename('Equity')
+
+
+def walk_forward(strategy, data: pd.DataFrame, train: str = '365D', test: str = '90D', step: Optional[str] = None,
+                 backtest_kwargs: Optional[dict] = None, maximize: str = 'Sharpe Ratio', constraint=None,
+                 processes: Optional[int] = None, mp_context: Optional[str] = None, min_bars: int = 50,
+                 **params) -> dict:
+    """
+    Walk-forward optimizes strategy, one fold per worker process.
+
+    Parameters:
+        strategy (type): backtesting.Strategy subclass, importable by the workers.
+        data (pd.DataFrame): OHLCV bars indexed by datetime.
+        train, test, step (str): Window lengths as pandas offsets, step defaults to test.
+        backtest_kwargs (dict, optional): Keyword arguments for Backtest (cash, commission, ...).
+        maximize (str): Stats key to pick each fold's parameters by. NaN scores rank last.
+        constraint (callable, optional): Receives the params as attributes, return False to skip.
+        processes (int, optional): Worker count, defaults to every core.
+        mp_context (str, optional): multiprocessing start method, defaults to the platform's.
+        min_bars (int): Folds with fewer train or test bars than this are skipped.
+        **params: Iterables of values for each strategy parameter.
+
+    Returns:
+        dict: 'folds' DataFrame with each fold's window, chosen params and train/test scores,
+              'equity' the stitched out-of-sample equity curve.
+    """
+    backtest_kwargs = backtest_kwargs or {}
+    grid = param_grid(constraint, **params)
+    folds = walk_forward_folds(data.index, train, test, step, min_bars)
+    logger.info(f"{len(folds)} folds, {len(grid)} parameter sets each")
+    if not folds or not grid:
+        return {'folds': pd.DataFrame(), 'equity': pd.Series(dtype='float64', name='Equity')}
+
+    context = multiprocessing.get_context(mp_context)
+    processes = min(processes or multiprocessing.cpu_count(), len(folds))
+    shared = SharedFrame.create(data)
+    try:
+        with ProcessPoolExecutor(processes, mp_context=context, initializer=_init_worker,
+                                 initargs=(shared.descriptor,)) as pool:
+            futures = [pool.submit(_run_fold, strategy, fold, grid, backtest_kwargs, maximize) for fold in folds]
+            results = [future.result() for future in futures]
+    finally:
+        shared.close()
+
+    rows = []
+    curves = []
+    for result in results:
+        train_start, train_end, test_end = result['fold']
+        if result['params'] is None:
+            logger.warning(f"No parameter set ran on the fold starting {data.index[train_start]}")
+            continue
+        rows.append({
+            'Train Start': data.index[train_start],
+            'Test Start': data.index[train_end],
+            'Test End': data.index[test_end - 1],
+            **result['params'],
+            f'Train {maximize}': result['train'][maximize],
+            f'Test {maximize}': result['test'][maximize],
+            'Test Return [%]': result['test']['Return [%]'],
+            'Test # Trades': result['test']['# Trades'],
+        })
+        if curves:
+            # Consecutive test windows overlap when step < test, the later fold takes over at its start
+            curves[-1] = curves[-1][curves[-1].index < data.index[train_end]]
+        curves.append(result['equity'])
+        logger.info(f"Fold {data.index[train_end]:%Y-%m-%d}: {result['params']}, "
+                    f"test {maximize} {result['test'][maximize]}")
+
+    equity = stitch_equity([curve for curve in curves if len(curve)], backtest_kwargs.get('cash', 10_000))
+    return {'folds': pd.DataFrame(rows), 'equity': equity}
@@ -0,0 +1,482 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Callable, Optional
+
+import aiohttp
+import pandas as pd
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+'''
+Streaming market data from Kraken's public websocket (v2) API.
+
+MarketDataFeed keeps one websocket open for OHLC, ticker and trade subscriptions. When the
+connection drops or goes quiet it reconnects with exponential backoff and sends every
+subscription again. Strategies register callbacks instead of polling REST:
+
+    on_candle(candle)  a candle closed: {'symbol', 'interval', 'timestamp' (ms), 'open', ...}
+    on_book(book)      top of book changed: {'symbol', 'bid', 'bid_qty', 'ask', 'ask_qty', 'last', ...}
+    on_trade(trade)    a public trade: {'symbol', 'side', 'price', 'qty', 'timestamp' (ms)}
+
+Callbacks can be plain functions or coroutine functions. Coroutines run as tasks so a slow
+strategy never stalls the reader. The latest values can also be read directly:
+feed.ticker(symbol) mirrors ccxt's fetch_ticker and feed.ohlcv(symbol, interval) mirrors
+fetch_ohlcv rows, last row forming.
+
+Kraken only sends an OHLC update when the candle changes, and does not order its ohlc and
+trade channels against each other. A candle is closed by whichever comes first: the first
+OHLC update of the next interval, the first trade of the symbol timestamped after its
+interval ends, or close_grace seconds after its interval ends. Trades are also folded into the
+forming candle's high, low and close, so a candle closed by a trade has every trade before it
+even if its last OHLC update is still on the way. on_candle callbacks run before on_trade for
+the trade that closed the candle. After a reconnect the OHLC snapshot fills in any candles
+closed while disconnected.
+
+LocalFeedServer speaks the same protocol from stored bars, for running bots offline:
+
+    server = LocalFeedServer(bars, symbol='ETH/USD', interval=240)
+    url = await server.start()
+    feed = MarketDataFeed(url, close_grace=None)
+'''
+
+KRAKEN_WS_URL = "wss://ws.kraken.com/v2"
+
+
+def _ms(timestamp: str) -> int:
+    """Kraken RFC 3339 timestamp to epoch milliseconds."""
+    return pd.Timestamp(timestamp).value // 1_000_000
+
+
+def _iso(ms: int) -> str:
+    return pd.Timestamp(ms, unit='ms').strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+class MarketDataFeed:
+    def __init__(self, url: str = KRAKEN_WS_URL, idle_timeout: float = 30, max_backoff: float = 30,
+                 close_grace: Optional[float] = 2.0, history: int = 720):
+        """
+        Parameters:
+            url (str): Websocket endpoint.
+            idle_timeout (float): Reconnect when nothing, not even a heartbeat, arrives for this long.
+            max_backoff (float): Longest wait between reconnect attempts in seconds.
+            close_grace (float, optional): Close a candle this many seconds after its interval
+                ends if no update for the next interval arrived. None only closes candles on
+                the next update, for replayed data whose timestamps are not wall-clock time.
+            history (int): Closed candles kept per symbol and interval.
+        """
+        self.url = url
+        self.idle_timeout = idle_timeout
+        self.max_backoff = max_backoff
+        self.close_grace = close_grace
+        self.history = history
+
+        self.subscriptions = []  # Subscribe params, sent again on every connect
+        self.books = {}
+        self.forming = {}        # (symbol, interval) -> candle being built
+        self.closed = {}         # (symbol, interval) -> deque of closed candles
+        self.seeded = set()      # Keys whose first OHLC snapshot has been taken as history
+        self.callbacks = {'candle': [], 'book': [], 'trade': []}
+        self.connected = asyncio.Event()
+        self.reconnects = 0
+        self.messages = 0
+        self.bad_messages = 0
+
+        self._ws = None
+        self._running = False
+        self._req_id = 0
+        self._tasks = set()
+
+    # Subscriptions and callbacks
+
+    def subscribe_ohlc(self, symbols, interval: int):
+        self._subscribe({'channel': 'ohlc', 'symbol': list(symbols), 'interval': interval})
+        for symbol in symbols:
+            self.closed.setdefault((symbol, interval), deque(maxlen=self.history))
+
+    def subscribe_ticker(self, symbols):
+        # bbo: an update on every best bid/offer change, not only after trades
+        self._subscribe({'channel': 'ticker', 'symbol': list(symbols), 'event_trigger': 'bbo'})
+
+    def subscribe_trades(self, symbols):
+        self._subscribe({'channel': 'trade', 'symbol': list(symbols), 'snapshot': False})
+
+    def _subscribe(self, params: dict):
+        self.subscriptions.append(params)
+        if self._ws is not None and not self._ws.closed:
+            self._spawn(self._send_subscribe(self._ws, params))
+
+    def on_candle(self, callback: Callable) -> Callable:
+        self.callbacks['candle'].append(callback)
+        return callback
+
+    def on_book(self, callback: Callable) -> Callable:
+        self.callbacks['book'].append(callback)
+        return callback
+
+    def on_trade(self, callback: Callable) -> Callable:
+        self.callbacks['trade'].append(callback)
+        return callback
+
+    # Latest state
+
+    def ticker(self, symbol: str) -> Optional[dict]:
+        return self.books.get(symbol)
+
+    def ohlcv(self, symbol: str, interval: int, limit: Optional[int] = None) -> list:
+        """[timestamp ms, open, high, low, close, volume] rows, the forming candle last."""
+        candles = list(self.closed.get((symbol, interval), ()))
+        if (symbol, interval) in self.forming:
+            candles.append(self.forming[(symbol, interval)])
+        if limit is not None:
+            candles = candles[-limit:]
+        return [[c['timestamp'], c['open'], c['high'], c['low'], c['close'], c['volume']] for c in candles]
+
+    # Connection
+
+    async def run(self):
+        """Connects and reads until stop() is called, reconnecting whenever the socket drops."""
+        self._running = True
+        backoff = 1.0
+        closer = self._spawn(self._close_stale_candles()) if self.close_grace is not None else None
+        try:
+            async with aiohttp.ClientSession() as session:
+                while self._running:
+                    try:
+                        async with session.ws_connect(self.url, heartbeat=self.idle_timeout / 2) as ws:
+                            self._ws = ws
+                            for params in self.subscriptions:
+                                await self._send_subscribe(ws, params)
+                            self.connected.set()
+                            backoff = 1.0
+                            await self._read(ws)
+                    except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                        logger.warning(f"Websocket error: {e}")
+                    finally:
+                        self._ws = None
+                        self.connected.clear()
+
+                    if self._running:
+                        self.reconnects += 1
+                        logger.info(f"Reconnecting in {backoff:.0f}s")
+                        await asyncio.sleep(backoff)
+                        backoff = min(backoff * 2, self.max_backoff)
+        finally:
+            if closer is not None:
+                closer.cancel()
+
+    async def stop(self):
+        self._running = False
+        if self._ws is not None:
+            await self._ws.close()
+
+    async def _send_subscribe(self, ws, params: dict):
+        self._req_id += 1
+        await ws.send_str(json.dumps({'method': 'subscribe', 'params': params, 'req_id': self._req_id}))
+
+    async def _read(self, ws):
+        while self._running:
+            msg = await ws.receive(timeout=self.idle_timeout)
+            if msg.type == aiohttp.WSMsgType.TEXT:
+                self.messages += 1
+                try:
+                    self.handle(json.loads(msg.data))
+                except Exception as e:
+                    # One malformed or unexpected message must not end the feed
+                    self.bad_messages += 1
+                    logger.error(f"Skipping message that could not be handled ({e!r}): {msg.data[:200]}")
+            elif msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSING,
+                              aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                logger.warning(f"Websocket closed: {msg.extra or ws.exception()}")
+                return
+
+    # Messages
+
+    def handle(self, message: dict):
+        """Applies one decoded message from the socket."""
+        channel = message.get('channel')
+        if channel == 'ohlc':
+            # The first snapshot is history, later ones fill in what closed while disconnected
+            snapshot = message['type'] == 'snapshot'
+            for candle in message['data']:
+                self._on_ohlc(candle, notify=not snapshot or (candle['symbol'], candle['interval']) in self.seeded)
+            if snapshot:
+                self.seeded.update((candle['symbol'], candle['interval']) for candle in message['data'])
+        elif channel == 'ticker':
+            for data in message['data']:
+                book = {
+                    'symbol': data['symbol'],
+                    'bid': data['bid'],
+                    'bid_qty': data['bid_qty'],
+                    'ask': data['ask'],
+                    'ask_qty': data['ask_qty'],
+                    'last': data['last'],
+                    'timestamp': int(time.time() * 1000),  # Ticker messages carry no time of their own
+                }
+                self.books[book['symbol']] = book
+                self._dispatch('book', book)
+        elif channel == 'trade':
+            for data in message['data']:
+                trade = {
+                    'symbol': data['symbol'],
+                    'side': data['side'],
+                    'price': data['price'],
+                    'qty': data['qty'],
+                    'timestamp': _ms(data['timestamp']),
+                }
+                self._on_trade(trade)
+                self._dispatch('trade', trade)
+        elif message.get('method') == 'subscribe' and not message.get('success', True):
+            logger.error(f"Subscription rejected: {message.get('error')}")
+
+    def _on_ohlc(self, data: dict, notify: bool = True):
+        key = (data['symbol'], data['interval'])
+        candle = {
+            'symbol': data['symbol'],
+            'interval': data['interval'],
+            'timestamp': _ms(data['interval_begin']),
+            'open': data['open'],
+            'high': data['high'],
+            'low': data['low'],
+            'close': data['close'],
+            'volume': data['volume'],
+        }
+        closed = self.closed.setdefault(key, deque(maxlen=self.history))
+        if closed and candle['timestamp'] <= closed[-1]['timestamp']:
+            return  # Already closed, e.g. repeated in a reconnect snapshot
+
+        forming = self.forming.get(key)
+        if forming is not None and candle['timestamp'] > forming['timestamp']:
+            self._close(key, notify=notify)
+        self.forming[key] = candle
+
+    def _on_trade(self, trade: dict):
+        for key, candle in list(self.forming.items()):
+            if key[0] != trade['symbol'] or trade['timestamp'] < candle['timestamp']:
+                continue
+            if trade['timestamp'] >= candle['timestamp'] + candle['interval'] * 60_000:
+                # The interval is over, don't wait for the next OHLC update to say so
+                self._close(key)
+            else:
+                # Volume is left to the OHLC updates, a trade may already be counted in one
+                candle['high'] = max(candle['high'], trade['price'])
+                candle['low'] = min(candle['low'], trade['price'])
+                candle['close'] = trade['price']
+
+    def _close(self, key: tuple, notify: bool = True):
+        candle = self.forming.pop(key)
+        self.closed[key].append(candle)
+        if notify:
+            self._dispatch('candle', candle)
+
+    async def _close_stale_candles(self):
+        """Closes candles whose interval ended close_grace seconds ago without a newer update."""
+        while True:
+            await asyncio.sleep(0.5)
+            now = time.time() * 1000
+            for key, candle in list(self.forming.items()):
+                if now >= candle['timestamp'] + candle['interval'] * 60_000 + self.close_grace * 1000:
+                    self._close(key)
+
+    def _dispatch(self, kind: str, item: dict):
+        for callback in self.callbacks[kind]:
+            try:
+                result = callback(item)
+                if asyncio.iscoroutine(result):
+                    self._spawn(result)
+            except Exception as e:
+                logger.error(f"Error in {kind} callback {callback.__name__}: {e}")
+
+    def _spawn(self, coroutine) -> asyncio.Task:
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Error in feed task: {task.exception()}")
+
+
+class LocalFeedServer:
+    """
+    Stand-in for Kraken's public websocket v2 endpoint that plays back stored bars.
+
+    For each bar it sends the candle, a ticker around its close and one trade at it. With
+    updates_per_bar > 1 the candle is sent part-built that many times, ending on its final
+    values, each update with ticks at the close so far. Kraken does not order its ohlc and
+    trade channels against each other, so ticks_first sends each update's ticks before the
+    candle: the new bar's first trade then arrives before any OHLC update of that bar, and
+    the client has to close the previous candle from the trade. The playback position is
+    shared by all connections, so a client that reconnects picks up where it left off after
+    an OHLC snapshot of the bars it already saw.
+
+    Parameters:
+        bars (pd.DataFrame): OHLCV bars indexed by datetime, any column case.
+        symbol (str): Symbol to serve.
+        interval (int): Candle interval in minutes reported in OHLC messages.
+        delay (float): Seconds between bars.
+        updates_per_bar (int): OHLC updates sent per bar.
+        drop_every (int, optional): Close the connection after every this many bars, to
+            exercise the client's reconnect.
+        spread (float): Relative bid/ask spread around the close.
+        ticks_first (bool): Send each update's ticker and trade before its candle.
+    """
+
+    def __init__(self, bars: pd.DataFrame, symbol: str = 'ETH/USD', interval: int = 240, delay: float = 0.0,
+                 updates_per_bar: int = 1, drop_every: Optional[int] = None, spread: float = 0.0005,
+                 snapshot: int = 50, ticks_first: bool = False, host: str = '127.0.0.1', port: int = 0):
+        bars = bars.rename(columns=str.lower)
+        self.symbol = symbol
+        self.interval = interval
+        self.delay = delay
+        self.updates_per_bar = updates_per_bar
+        self.drop_every = drop_every
+        self.spread = spread
+        self.snapshot = snapshot
+        self.ticks_first = ticks_first
+        self.host = host
+        self.port = port
+        self.times = (pd.DatetimeIndex(bars.index).as_unit('ns').asi8 // 1_000_000).tolist()
+        self.rows = bars[['open', 'high', 'low', 'close', 'volume']].to_numpy(dtype='float64').tolist()
+        self.position = 0
+        self.connections = 0
+        self.finished = asyncio.Event()
+        self._runner = None
+
+    async def start(self) -> str:
+        """Starts listening and returns the ws:// URL to connect to."""
+        app = web.Application()
+        app.router.add_get('/v2', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"ws://{self.host}:{port}/v2"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def _candle(self, i: int, part: int = None) -> dict:
+        open_, high, low, close, volume = self.rows[i]
+        if part is not None and part < self.updates_per_bar:
+            # Part-built candle: close moves from the open towards the final close
+            close = open_ + (close - open_) * part / self.updates_per_bar
+            high, low = max(open_, close), min(open_, close)
+            volume = volume * part / self.updates_per_bar
+        return {
+            'symbol': self.symbol,
+            'open': open_,
+            'high': high,
+            'low': low,
+            'close': close,
+            'volume': volume,
+            'vwap': close,
+            'trades': 1,
+            'interval_begin': _iso(self.times[i]),
+            'interval': self.interval,
+        }
+
+    async def _handle(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.connections += 1
+        channels = set()
+        playback = None
+        try:
+            async for msg in ws:
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    continue
+                request_msg = json.loads(msg.data)
+                if request_msg.get('method') != 'subscribe':
+                    continue
+                params = request_msg['params']
+                channels.add(params['channel'])
+                await ws.send_json({'method': 'subscribe', 'result': params, 'success': True,
+                                    'req_id': request_msg.get('req_id')})
+                if params['channel'] == 'ohlc':
+                    start = max(0, self.position - self.snapshot)
+                    await ws.send_json({'channel': 'ohlc', 'type': 'snapshot',
+                                        'data': [self._candle(i) for i in range(start, self.position)]})
+                if playback is None:
+                    playback = asyncio.ensure_future(self._play(ws, channels))
+        finally:
+            if playback is not None:
+                playback.cancel()
+        return ws
+
+    async def _play(self, ws, channels: set):
+        sent = 0
+        while self.position < len(self.rows):
+            i = self.position
+            for part in range(1, self.updates_per_bar + 1):
+                candle = self._candle(i, part)
+                if 'ohlc' in channels and not self.ticks_first:
+                    await ws.send_json({'channel': 'ohlc', 'type': 'update', 'data': [candle]})
+                # Ticks at the candle's close so far, inside the bar's interval
+                price = candle['close']
+                tick_ms = self.times[i] + self.interval * 60_000 * part // self.updates_per_bar - 1
+                if 'ticker' in channels:
+                    await ws.send_json({'channel': 'ticker', 'type': 'update', 'data': [{
+                        'symbol': self.symbol,
+                        'bid': price * (1 - self.spread / 2), 'bid_qty': 1.0,
+                        'ask': price * (1 + self.spread / 2), 'ask_qty': 1.0,
+                        'last': price, 'volume': candle['volume'],
+                    }]})
+                if 'trade' in channels:
+                    await ws.send_json({'channel': 'trade', 'type': 'update', 'data': [{
+                        'symbol': self.symbol, 'side': 'buy', 'price': price, 'qty': 1.0,
+                        'ord_type': 'market', 'trade_id': i * self.updates_per_bar + part,
+                        'timestamp': _iso(tick_ms),
+                    }]})
+                if 'ohlc' in channels and self.ticks_first:
+                    await ws.send_json({'channel': 'ohlc', 'type': 'update', 'data': [candle]})
+            self.position += 1
+            sent += 1
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            if self.drop_every and sent % self.drop_every == 0 and self.position < len(self.rows):
+                await ws.close()
+                return
+
+        self.finished.set()
+        while not ws.closed:
+            await ws.send_json({'channel': 'heartbeat'})
+            await asyncio.sleep(1)
+
+
+if __name__ == '__main__':
+    import os
+    from ohlcv_loader import load_ohlcv
+    from resample import resample_bars
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    async def demo():
+        bars = load_ohlcv(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Data', 'XBTUSDT_60.csv'))
+        bars = resample_bars(bars[['Open', 'High', 'Low', 'Close', 'Volume']].iloc[-2400:], '240')
+        server = LocalFeedServer(bars, symbol='XBT/USD', interval=240, updates_per_bar=3, drop_every=200)
+        feed = MarketDataFeed(await server.start(), close_grace=None)
+        feed.subscribe_ohlc(['XBT/USD'], 240)
+        feed.subscribe_ticker(['XBT/USD'])
+
+        candles = []
+        feed.on_candle(candles.append)
+        reader = asyncio.ensure_future(feed.run())
+        await server.finished.wait()
+        await asyncio.sleep(0.2)
+        await feed.stop()
+        await reader
+        await server.stop()
+
+        print(f"{len(candles)} closed candles of {len(bars)} bars over {server.connections} connections, "
+              f"{feed.messages} messages")
+        print(f"Top of book: {feed.ticker('XBT/USD')}")
+
+    asyncio.run(demo())